@@ -5,6 +5,10 @@ import os
 import sys
 import statistics
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import pop_time_window
+from zopen import zopen
+
 def MovingAverage_test(data):
     MA_data = []
     for column in data:
@@ -40,43 +44,55 @@ def MovingAverage(data, MA):
 
 
 def main():
-    print("\n==Usage : xvg_movingaverage.py inputfile outputfile MA ==")
-    print("==   eg : xvg_movingaverage.py rmsd.xvg  rmsd_MA.xvg 5 ==\n")
+    print("\n==Usage : xvg_movingaverage.py inputfile outputfile MA -b -e ==")
+    print("==   eg : xvg_movingaverage.py rmsd.xvg  rmsd_MA.xvg 5 -b1000 -e5000 ==\n")
+    begin, end, argv = pop_time_window(sys.argv)
     inputfile, outputfile = "", ""
     MA_num = 5
-    if len(sys.argv) == 2:
-        inputfile = sys.argv[1]
+    if len(argv) == 2:
+        inputfile = argv[1]
         outputfile = inputfile.split(".")[0] + "_out.xvg"
-    elif len(sys.argv) == 3:
-        inputfile = sys.argv[1]
-        outputfile = sys.argv[2]
-    elif len(sys.argv) == 4:
-        inputfile = sys.argv[1]
-        outputfile = sys.argv[2]
-        MA_num = int(sys.argv[3])
-    elif len(sys.argv) > 4:
+    elif len(argv) == 3:
+        inputfile = argv[1]
+        outputfile = argv[2]
+    elif len(argv) == 4:
+        inputfile = argv[1]
+        outputfile = argv[2]
+        MA_num = int(argv[3])
+    elif len(argv) > 4:
         print("> ERROR, too many input arguments !")
 
-    with open(inputfile, "r") as fo:
-        content = fo.read()
-    lines = content.strip("\n").split("\n")
     comments = []
-    if len(lines[-2].strip().split()) >= 1 and len(lines[-2].strip().split()) == len(lines[-3].strip().split()):
-        column_num = len(lines[-2].strip().split())
-    print("Number of columns -> ", column_num)
-    data = [[] for i in range(column_num)]
-    for line in lines:
-        if line[0] == '#' or line[0] == '@':
-            comments.append(line)
-        elif line[0] == ' ' and "time" in line and len(line.strip().split()) >5:
-            comments.append(line)
-        else:
-            items = line.strip().split()
-            if len(items) != column_num:
-                print("> ERROR, len(line) != column_num")
-                exit(0)
-            for i in range(column_num):
-                data[i].append(float(items[i]))
+    column_num = 0
+    data = []
+    with zopen(inputfile) as fo:
+        for line in fo:
+            line = line.rstrip("\n")
+            if line.strip() == "":
+                continue
+            if line[0] == '#' or line[0] == '@':
+                comments.append(line)
+            elif line[0] == ' ' and "time" in line and len(line.strip().split()) >5:
+                comments.append(line)
+            else:
+                items = line.strip().split()
+                # stop reading once later than -e
+                if end is not None and float(items[0]) > end:
+                    break
+                if begin is not None and float(items[0]) < begin:
+                    continue
+                if column_num == 0:
+                    column_num = len(items)
+                    print("Number of columns -> ", column_num)
+                    data = [[] for i in range(column_num)]
+                if len(items) != column_num:
+                    print("> ERROR, len(line) != column_num")
+                    exit(0)
+                for i in range(column_num):
+                    data[i].append(float(items[i]))
+    if column_num == 0:
+        print("> ERROR, no data in ", inputfile)
+        exit(0)
     # moving average
     data = MovingAverage(data, MA_num)
     # write outputfile
@@ -0,0 +1,208 @@
+## author : charlie
+## date : 20221019
+## usage : binary coordinate store of a trajectory, written once by
+##     gro2store.py from a text gro trajectory and memory-mapped when read
+##     md.store/ holds coords.npy (frames x atoms x 3, float32, nm),
+##     box.npy (frames x 9), time.npy (frames), topology.npy (resid,
+##     resname, atomname of every atom) and header.json
+##     groio.py reads a store as it reads a gro file, so the gro tools
+##     accept md.store in place of md.gro and slice frames and atoms
+##     without parsing any text
+
+import os
+import json
+import shutil
+import numpy as np
+
+VERSION = 1
+KIND = "coordinate store"
+TOPOLOGY = np.dtype([("resid", np.int32), ("resname", "U5"), ("atomname", "U5")])
+
+
+def is_store(path: str) -> bool:
+    """whether path is the directory of a coordinate store"""
+    try:
+        with open(os.path.join(path, "header.json"), "r") as fo:
+            return json.load(fo).get("kind") == KIND
+    except (OSError, ValueError):
+        return False
+
+
+def open_store(path: str) -> dict:
+    """header and memory-mapped arrays of a store, nothing is read until used
+
+    Returns {'header', 'coords', 'box', 'time', 'topology'}, slices of
+    coords are views of the file.
+    """
+    with open(os.path.join(path, "header.json"), "r") as fo:
+        header = json.load(fo)
+    if header.get("kind") != KIND or header.get("version") != VERSION:
+        print("ERROR -> {} is not a coordinate store of version {}".format(path, VERSION))
+        exit()
+    store = {"header": header}
+    for name in ("coords", "box", "time"):
+        store[name] = np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+    store["topology"] = np.load(os.path.join(path, "topology.npy"))
+    return store
+
+
+def topology_from_lines(lines: np.ndarray) -> np.ndarray:
+    """resid, resname and atomname of gro atom lines (bytes array)"""
+    fields = np.dtype(
+        {
+            "names": ["resid", "resname", "atomname"],
+            "formats": ["S5", "S5", "S5"],
+            "offsets": [0, 5, 10],
+            "itemsize": lines.dtype.itemsize,
+        }
+    )
+    view = lines.view(fields)
+    topology = np.zeros(lines.shape[0], dtype=TOPOLOGY)
+    topology["resid"] = view["resid"].astype(np.int32)
+    topology["resname"] = np.char.strip(view["resname"]).astype("U5")
+    topology["atomname"] = np.char.strip(view["atomname"]).astype("U5")
+    return topology
+
+
+def format_lines(topology: np.ndarray, atoms: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """gro atom lines of the selected atoms, as gmx writes them"""
+    return np.array(
+        [
+            "{:>5d}{:<5s}{:>5s}{:>5d}{:8.3f}{:8.3f}{:8.3f}".format(
+                top["resid"] % 100000, top["resname"], top["atomname"], (atom + 1) % 100000, *xyz
+            ).encode()
+            for top, atom, xyz in zip(topology[atoms], atoms, coords)
+        ]
+    )
+
+
+class StoreWriter:
+    """fill a new store chunk by chunk, the arrays are memory-mapped files
+
+    Everything is written into a temporary directory which is renamed to
+    path by close(), a reader never sees a half written store. Only an old
+    store is replaced, any other file or directory at path is refused.
+    """
+
+    def __init__(self, path: str, nframes: int, topology: np.ndarray, source: str = ""):
+        if os.path.exists(path) and not is_store(path):
+            print("ERROR -> {} exists and is not a coordinate store, choose another output".format(path))
+            exit()
+        self.path = path
+        self.temp = "{}.{}.tmp".format(path.rstrip(os.sep), os.getpid())
+        os.makedirs(self.temp)
+        natoms = topology.shape[0]
+        self.header = {
+            "kind": KIND,
+            "version": VERSION,
+            "frames": nframes,
+            "atoms": natoms,
+            "source": source,
+        }
+        open_memmap = np.lib.format.open_memmap
+        self.coords = open_memmap(os.path.join(self.temp, "coords.npy"), "w+", np.float32, (nframes, natoms, 3))
+        self.box = open_memmap(os.path.join(self.temp, "box.npy"), "w+", np.float32, (nframes, 9))
+        self.time = open_memmap(os.path.join(self.temp, "time.npy"), "w+", np.float64, (nframes,))
+        np.save(os.path.join(self.temp, "topology.npy"), topology)
+        self.count = 0
+
+    def add(self, times: np.ndarray, coords: np.ndarray, boxes: np.ndarray) -> None:
+        last = self.count + times.shape[0]
+        self.coords[self.count : last] = coords
+        self.box[self.count : last] = boxes
+        self.time[self.count : last] = times
+        self.count = last
+
+    def close(self) -> None:
+        if self.count != self.header["frames"]:
+            print("ERROR -> {} of {} frames written, store is not saved".format(self.count, self.header["frames"]))
+            self.abort()
+            exit()
+        for array in (self.coords, self.box, self.time):
+            array.flush()
+        del self.coords, self.box, self.time
+        with open(os.path.join(self.temp, "header.json"), "w") as fo:
+            json.dump(self.header, fo, indent=2)
+        if is_store(self.path):
+            shutil.rmtree(self.path)
+        elif os.path.exists(self.path):
+            print("ERROR -> {} has been created while writing, store is left in {}".format(self.path, self.temp))
+            exit()
+        os.rename(self.temp, self.path)
+
+    def abort(self) -> None:
+        shutil.rmtree(self.temp, ignore_errors=True)
+
+
+class StoreReader:
+    """read frames of a store in the same way as groio.GroReader reads a gro file
+
+    seek_frame takes the frame number, the offset of a store frame.
+    """
+
+    def __init__(self, path: str, atoms: list = None):
+        self.store = open_store(path)
+        self.natoms = self.store["header"]["atoms"]
+        self.atoms = None if atoms is None else np.asarray(atoms, dtype=int)
+        if self.atoms is not None and self.atoms.shape[0] != 0 and self.atoms.max() >= self.natoms:
+            print("ERROR -> atom {} is out of the {} atoms of {}".format(self.atoms.max() + 1, self.natoms, path))
+            exit()
+        self.frame = 0
+        self.last = None
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def seek_frame(self, frame: int) -> None:
+        self.frame = int(frame)
+
+    def read_frame(self) -> tuple:
+        """(time, coords, box) of the next frame, None after the last frame"""
+        if self.frame >= self.store["time"].shape[0]:
+            return None
+        frame = self.frame
+        self.frame += 1
+        atoms = np.arange(self.natoms) if self.atoms is None else self.atoms
+        coords = np.asarray(self.store["coords"][frame, atoms], dtype=np.float64)
+        self.last = (atoms, coords)
+        return float(self.store["time"][frame]), coords, np.asarray(self.store["box"][frame], dtype=np.float64)
+
+    @property
+    def lines(self) -> np.ndarray:
+        """gro atom lines of the last frame read, made only when asked"""
+        if self.last is None:
+            return None
+        return format_lines(self.store["topology"], *self.last)
+
+    def read_chunk(self, frames: np.ndarray) -> tuple:
+        """(times, coords, boxes) of frame numbers, sliced from the maps at once"""
+        frames = np.asarray(frames)
+        if frames.shape[0] != 0 and np.all(np.diff(frames) == 1):
+            ## contiguous frames are a view, only the selected atoms are copied
+            frames = slice(int(frames[0]), int(frames[-1]) + 1)
+            coords = self.store["coords"][frames]
+            if self.atoms is not None:
+                coords = coords[:, self.atoms]
+        elif self.atoms is not None:
+            ## frames and atoms in one step, never the whole frames
+            coords = self.store["coords"][frames[:, None], self.atoms]
+        else:
+            coords = self.store["coords"][frames]
+        return (
+            np.asarray(self.store["time"][frames], dtype=np.float64),
+            np.asarray(coords, dtype=np.float64),
+            np.asarray(self.store["box"][frames], dtype=np.float64),
+        )
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if frame == None:
+                return
+            yield frame
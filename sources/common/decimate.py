@@ -0,0 +1,117 @@
+## author : charlie
+## date : 20221019
+## usage : reduce long lines to a few points per pixel before plotting
+##     min-max keeps the minimum and maximum of each pixel column, so spikes
+##     are never lost; lttb (largest triangle three buckets) keeps the shape
+##     of the line with fewer points
+##     Bins gives min, mean and max of fixed x bins, chunk by chunk, for the
+##     terminal plots of plotille which draw every point in python
+
+import numpy as np
+
+
+def minmax(x: np.ndarray, y: np.ndarray, buckets: int) -> tuple:
+    """keep the first, last, min and max points of each of the buckets"""
+    n = x.shape[0]
+    per = -(-n // buckets)
+    pad = -n % per
+    ## the last bucket is padded by its own last value
+    block = np.append(y, np.full(pad, y[-1])).reshape(-1, per)
+    start = np.arange(0, n, per)
+    keep = [
+        np.array([0, n - 1]),
+        np.minimum(start + np.argmin(block, axis=1), n - 1),
+        np.minimum(start + np.argmax(block, axis=1), n - 1),
+    ]
+    keep = np.unique(np.concatenate(keep))
+    return x[keep], y[keep]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> tuple:
+    """largest triangle three buckets, the points are chosen bucket by bucket"""
+    n = x.shape[0]
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    keep = np.zeros(points, dtype=int)
+    keep[-1] = n - 1
+    selected = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < edges.shape[0]:
+            next_x = x[stop : edges[i + 2]].mean()
+            next_y = y[stop : edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[selected] - next_x) * (y[start:stop] - y[selected])
+            - (x[selected] - x[start:stop]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        keep[i + 1] = selected
+    return x[keep], y[keep]
+
+
+def decimate(x: np.ndarray, y: np.ndarray, pixels: float, method: str = "minmax") -> tuple:
+    """reduce a line to about 2 points per horizontal pixel
+
+    Lines shorter than 4 points per pixel are returned as they are, and
+    method 'raw' always returns all points.
+    """
+    buckets = max(int(pixels), 2)
+    if method == "raw" or x.shape[0] <= 4 * buckets:
+        return x, y
+    if method == "lttb":
+        return lttb(x, y, 2 * buckets)
+    return minmax(x, y, buckets)
+
+
+def figure_pixels(fig) -> float:
+    """width of matplotlib figure in pixels"""
+    return fig.get_figwidth() * fig.dpi
+
+
+def envelope(x: np.ndarray, low: np.ndarray, high: np.ndarray, pixels: float) -> tuple:
+    """reduce a band to one point per pixel column, min of low and max of high"""
+    buckets = max(int(pixels), 2)
+    n = x.shape[0]
+    if n <= 4 * buckets:
+        return x, low, high
+    per = -(-n // buckets)
+    pad = -n % per
+    ## the last bucket is padded by its own last value
+    low = np.append(low, np.full(pad, low[-1])).reshape(-1, per)
+    high = np.append(high, np.full(pad, high[-1])).reshape(-1, per)
+    return x[::per], low.min(axis=1), high.max(axis=1)
+
+
+class Bins:
+    """min, mean and max of y in fixed x bins, accumulated chunk by chunk"""
+
+    def __init__(self, low: float, high: float, bins: int, ncol: int = 1):
+        self.low = low
+        self.width = (high - low) / bins if high > low else 1.0
+        self.bins = bins
+        self.count = np.zeros(bins)
+        self.sum = np.zeros((bins, ncol))
+        self.min = np.full((bins, ncol), np.inf)
+        self.max = np.full((bins, ncol), -np.inf)
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        """add points of a chunk, y is a 2D array (points x ncol)"""
+        if x.shape[0] == 0:
+            return
+        index = np.clip(((x - self.low) / self.width).astype(int), 0, self.bins - 1)
+        ## x is ascending in most cases, so points of one bin are neighbours
+        ## and reduced in one call, ufunc.at keeps it right otherwise
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(index)) + 1])
+        which = index[starts]
+        np.add.at(self.count, which, np.diff(np.append(starts, x.shape[0])))
+        np.add.at(self.sum, which, np.add.reduceat(y, starts, axis=0))
+        np.minimum.at(self.min, which, np.minimum.reduceat(y, starts, axis=0))
+        np.maximum.at(self.max, which, np.maximum.reduceat(y, starts, axis=0))
+
+    def result(self) -> tuple:
+        """centers, min, mean, max of the bins which have points"""
+        filled = self.count > 0
+        centers = self.low + (np.arange(self.bins)[filled] + 0.5) * self.width
+        mean = self.sum[filled] / self.count[filled][:, None]
+        return centers, self.min[filled], mean, self.max[filled]
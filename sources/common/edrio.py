@@ -0,0 +1,258 @@
+## author : charlie
+## date : 20221019
+## usage : reader and writer of GROMACS energy files (.edr) in pure python
+##     the XDR layout follows enxio.cpp of GROMACS (energy file version 1
+##     to 5, single or double precision), so the terms of an edr file, energy
+##     group pairs like 'Coul-SR:Protein-LIG' included, are read into
+##     arrays directly, without `gmx energy` and its text xvg
+##     xvgio.py reads .edr files through it, so all xvg tools accept them
+
+import mmap
+import struct
+import numpy as np
+
+from zopen import zopen, is_compressed
+
+HEADER_MAGIC = -55555
+FRAME_MAGIC = -7777777
+VERSION = 5
+## the first real of a frame, tells the precision of the file
+FIRST_REAL = -2e10
+## sub-block types of xdr_datatype : int, float, double, int64, char, string
+SUB_SIZES = {0: 4, 1: 4, 2: 8, 3: 8, 4: 4}
+SUB_STRING = 5
+
+
+def is_edr(path: str) -> bool:
+    """whether the file starts with the magic number of an energy file
+
+    Files of version 1 have no magic number, they start with the number of
+    terms and the length of the first name, both small; no text file starts
+    with the zero bytes of such numbers.
+    """
+    with zopen(path, "rb") as fo:
+        head = fo.read(8)
+    if len(head) != 8:
+        return False
+    magic, length = struct.unpack(">iI", head)
+    return magic == HEADER_MAGIC or (0 < magic < 65536 and 0 < length < 1024)
+
+
+class EdrReader:
+    """walk through the XDR bytes of an edr file"""
+
+    def __init__(self, edrfile: str):
+        ## plain files are memory-mapped, reading the header touches only its pages
+        if is_compressed(edrfile):
+            with zopen(edrfile, "rb") as fo:
+                self.buf = fo.read()
+        else:
+            with open(edrfile, "rb") as fo:
+                self.buf = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pos = 0
+        self.edrfile = edrfile
+        (magic,) = self.unpack(">i")
+        if magic > 0:
+            ## version 1 has no magic number, it starts with the number of terms
+            self.version, nre = 1, magic
+        elif magic == HEADER_MAGIC:
+            self.version, nre = self.unpack(">ii")
+        else:
+            print("ERROR -> {} is not an energy file of GROMACS".format(edrfile))
+            exit()
+        if self.version > VERSION or self.version < 1:
+            print("ERROR -> energy file version {} of {} is not supported".format(self.version, edrfile))
+            exit()
+        self.names, self.units = [], []
+        for _ in range(nre):
+            self.names.append(self.string())
+            self.units.append(self.string() if self.version >= 2 else "kJ/mol")
+        self.start = self.pos
+        self.real = self.precision()
+
+    def unpack(self, fmt: str) -> tuple:
+        values = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def string(self) -> str:
+        """XDR string of names and units : uint length, bytes padded to 4"""
+        (length,) = self.unpack(">I")
+        if self.pos + length > len(self.buf):
+            print("ERROR -> {} is broken, string of {} bytes at byte {}".format(self.edrfile, length, self.pos))
+            exit()
+        text = bytes(self.buf[self.pos : self.pos + length]).decode(errors="replace")
+        self.pos += (length + 3) // 4 * 4
+        return text
+
+    def gmx_string(self) -> str:
+        """string of a sub-block : int length with the null, then an XDR string"""
+        self.pos += 4
+        return self.string()
+
+    def precision(self) -> str:
+        """'>f4' or '>f8' by the first real and the magic number of the first frame"""
+        if self.version == 1:
+            ## time (real) and step (int) come first, then the number of terms
+            if self.start + 16 <= len(self.buf):
+                if struct.unpack_from(">i", self.buf, self.start + 12)[0] == len(self.names):
+                    return ">f8"
+            return ">f4"
+        for real, size in ((">f4", 4), (">f8", 8)):
+            if self.start + size + 4 > len(self.buf):
+                break
+            first = np.frombuffer(self.buf, real, 1, self.start)[0]
+            magic = struct.unpack_from(">i", self.buf, self.start + size)[0]
+            if first < -1e10 and magic == FRAME_MAGIC:
+                return real
+        return ">f4"
+
+    def frames(self):
+        """yield (time, step, energies) of every frame, energies as a float64 array"""
+        real = self.real
+        rsize = 4 if real == ">f4" else 8
+        ## sub-block type of the reals in the blocks of version 1 to 3
+        sub_real = 1 if rsize == 4 else 2
+        nre_all = len(self.names)
+        self.pos = self.start
+        size = len(self.buf)
+        time = None
+        while self.pos + rsize + 4 <= size:
+            if self.version == 1:
+                ## no magic number, the frame starts with time (real) and step (int)
+                time = float(np.frombuffer(self.buf, real, 1, self.pos)[0])
+                self.pos += rsize
+                (step,) = self.unpack(">i")
+                version, nsum = 1, 0
+            else:
+                self.pos += rsize
+                magic, version = self.unpack(">ii")
+                if magic != FRAME_MAGIC:
+                    print("Warning -> {} is broken after time {}, stop reading".format(self.edrfile, time))
+                    return
+                time, step, nsum = self.unpack(">dqi")
+                if version >= 3:
+                    self.pos += 8
+                if version >= 5:
+                    self.pos += 8
+            ## ndisre is reserved from version 4 on
+            nre, ndisre, nblock = self.unpack(">iii")
+            subs = []
+            if version < 4 and ndisre > 0:
+                ## old style distance restraints : instantaneous and time averaged
+                subs += [(sub_real, ndisre), (sub_real, ndisre)]
+            for _ in range(nblock):
+                if version < 4:
+                    ## blocks of old files have a single sub-block of reals
+                    subs.append((sub_real, self.unpack(">i")[0]))
+                else:
+                    _, nsub = self.unpack(">ii")
+                    subs += [self.unpack(">ii") for _ in range(nsub)]
+            self.pos += 12
+            ## version 1 always writes e, average, sum and an unused real
+            nvalue = 4 if version == 1 else (3 if nsum > 0 else 1)
+            if self.pos + nre * rsize * nvalue > size:
+                print("Warning -> the last frame of {} is incomplete".format(self.edrfile))
+                return
+            ## only e of every term is kept, not the averages and sums
+            energies = np.frombuffer(self.buf, real, nvalue * nre, self.pos)[0::nvalue]
+            self.pos += nvalue * nre * rsize
+            for kind, nr in subs:
+                if kind == SUB_STRING:
+                    for _ in range(nr):
+                        self.gmx_string()
+                else:
+                    self.pos += SUB_SIZES[kind] * nr
+            if nre == nre_all:
+                yield time, step, energies.astype(np.float64)
+
+
+def read_edr_header(edrfile: str) -> tuple:
+    """(names, units) of the terms in edr file"""
+    reader = EdrReader(edrfile)
+    return reader.names, reader.units
+
+
+def iter_edr(edrfile: str, begin: float = None, end: float = None, columns: list = None, chunk: int = 100000):
+    """yield 2D arrays of at most chunk frames, time and the terms
+
+    columns counts the terms from 1 as the columns of the xvg written by
+    gmx energy would, column 0 is the time.
+    """
+    reader = EdrReader(edrfile)
+    keep = None if columns == None else np.array(columns, dtype=int) - 1
+    width = 1 + (len(reader.names) if keep is None else keep.shape[0])
+    rows = np.empty((chunk, width))
+    n = 0
+    for time, _, energies in reader.frames():
+        if end != None and time > end:
+            break
+        if begin != None and time < begin:
+            continue
+        rows[n, 0] = time
+        rows[n, 1:] = energies if keep is None else energies[keep]
+        n += 1
+        if n == chunk:
+            yield rows.copy()
+            n = 0
+    if n != 0:
+        yield rows[:n].copy()
+
+
+def readedr(edrfile: str, begin: float = None, end: float = None, terms: list = None) -> tuple:
+    """read the selected terms (all by default) of edr file
+
+    Returns (names, units, data), data column 0 is the time.
+    """
+    names, units = read_edr_header(edrfile)
+    columns = None
+    if terms != None:
+        missing = [t for t in terms if t not in names]
+        if len(missing) != 0:
+            print("ERROR -> no {} in {}".format(", ".join(missing), edrfile))
+            exit()
+        columns = [names.index(t) + 1 for t in terms]
+        names = [names[c - 1] for c in columns]
+        units = [units[c - 1] for c in columns]
+    chunks = list(iter_edr(edrfile, begin, end, columns))
+    data = np.concatenate(chunks) if len(chunks) != 0 else np.zeros((0, len(names) + 1))
+    return names, units, data
+
+
+def pack_string(text: str) -> bytes:
+    """XDR string of names and units, as read by EdrReader.string"""
+    raw = text.encode()
+    return struct.pack(">I", len(raw)) + raw + b"\0" * (-len(raw) % 4)
+
+
+def writeedr(
+    edrfile: str,
+    names: list,
+    units: list,
+    time: np.ndarray,
+    values: np.ndarray,
+    steps: np.ndarray = None,
+    double: bool = False,
+) -> None:
+    """write frames of energies as GROMACS does, no averages and no blocks
+
+    values is frames x terms. steps default to the frame index. Files are
+    read by gmx energy and by readedr.
+    """
+    real = ">f8" if double else ">f4"
+    rsize = 8 if double else 4
+    nre = len(names)
+    if steps is None:
+        steps = np.arange(time.shape[0])
+    with open(edrfile, "wb") as fo:
+        fo.write(struct.pack(">iii", HEADER_MAGIC, VERSION, nre))
+        for name, unit in zip(names, units):
+            fo.write(pack_string(name) + pack_string(unit))
+        first = np.array([FIRST_REAL], dtype=real).tobytes()
+        for i in range(time.shape[0]):
+            fo.write(first)
+            ## magic, version, time, step, nsum, nsteps, dt
+            fo.write(struct.pack(">iidqiqd", FRAME_MAGIC, VERSION, time[i], int(steps[i]), 0, 1, 0.0))
+            ## nre, reserved, nblock, e_size, reserved, reserved
+            fo.write(struct.pack(">iiiiii", nre, 0, 0, nre * rsize * 4, 0, 0))
+            fo.write(np.asarray(values[i], dtype=real).tobytes())
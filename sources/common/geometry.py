@@ -0,0 +1,109 @@
+## author : charlie
+## date : 20221019
+## usage : geometry of atom groups for all frames at once
+##     coordinates are stacked as (frames, atoms, 3) arrays, each function
+##     works on the whole stack with numpy, no loop over the frames
+##     used by pipi_distang_vec.py
+## command : python geometry.py 100000 1000000   (benchmark of the kernels)
+
+import sys
+import time
+import numpy as np
+
+
+def centroids(coords: np.ndarray) -> np.ndarray:
+    """(frames, atoms, 3) -> (frames, 3) geometric centers"""
+    return coords.mean(axis=1)
+
+
+def distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(frames, 3) and (frames, 3) -> (frames,) euclidean distances"""
+    diff = a - b
+    return np.sqrt(np.einsum("...i,...i->...", diff, diff))
+
+
+def plane_normals(coords: np.ndarray) -> np.ndarray:
+    """(frames, atoms, 3) -> (frames, 3) unit normals of the least-squares planes
+
+    The plane of each frame goes through the centroid and minimises the
+    squared distances of all atoms, its normal is the direction of least
+    spread: the eigenvector of the smallest eigenvalue of the 3x3 scatter
+    matrix, i.e. the last right singular vector of the centered coordinates.
+    np.linalg.eigh solves stacked 3x3 matrices one by one, so the smallest
+    eigenvalue is taken in closed form (trigonometric solution of the
+    characteristic cubic) and the normal is the longest cross product of two
+    rows of A - low * I, all on (frames,) arrays. The order of the atoms in
+    the group does not matter.
+    """
+    ## x, y and z as contiguous (frames, atoms) arrays, centered in each frame
+    x, y, z = np.ascontiguousarray(np.moveaxis(coords, -1, 0), dtype=float)
+    x, y, z = [c - c.mean(axis=1, keepdims=True) for c in (x, y, z)]
+    a00, a11, a22 = [np.einsum("fa,fa->f", c, c) for c in (x, y, z)]
+    a01, a02, a12 = [np.einsum("fa,fa->f", c, d) for c, d in ((x, y), (x, z), (y, z))]
+    ## eigenvalues q + 2p cos(phi + 2k pi / 3), the smallest with k = 1
+    q = (a00 + a11 + a22) / 3
+    b00, b11, b22 = a00 - q, a11 - q, a22 - q
+    p = np.sqrt((b00**2 + b11**2 + b22**2 + 2 * (a01**2 + a02**2 + a12**2)) / 6)
+    p = np.where(p > 0, p, 1.0)
+    det = b00 * (b11 * b22 - a12 * a12) - a01 * (a01 * b22 - a12 * a02) + a02 * (a01 * a12 - b11 * a02)
+    phi = np.arccos(np.clip(det / (2 * p**3), -1.0, 1.0)) / 3
+    low = q + 2 * p * np.cos(phi + 2 * np.pi / 3)
+    b00, b11, b22 = a00 - low, a11 - low, a22 - low
+    ## rows (b00, a01, a02), (a01, b11, a12), (a02, a12, b22), crossed pairwise
+    normal = np.stack([a01 * a12 - a02 * b11, a02 * a01 - b00 * a12, b00 * b11 - a01 * a01], axis=-1)
+    length = np.einsum("fi,fi->f", normal, normal)
+    for other in (
+        np.stack([a01 * b22 - a02 * a12, a02 * a02 - b00 * b22, b00 * a12 - a01 * a02], axis=-1),
+        np.stack([b11 * b22 - a12 * a12, a12 * a02 - a01 * b22, a01 * a12 - b11 * a02], axis=-1),
+    ):
+        other_length = np.einsum("fi,fi->f", other, other)
+        longer = other_length > length
+        normal[longer], length[longer] = other[longer], other_length[longer]
+    return normal / np.sqrt(length)[:, None]
+
+
+def mean_bond_vectors(coords: np.ndarray) -> np.ndarray:
+    """(frames, atoms, 3) -> (frames, 3) mean of the vectors between consecutive atoms
+
+    The sum of the consecutive vectors telescopes to last - first.
+    """
+    return (coords[:, -1] - coords[:, 0]) / (coords.shape[1] - 1)
+
+
+def vector_angles(u: np.ndarray, v: np.ndarray, fold: bool = True) -> np.ndarray:
+    """angles in degree between the rows of u and v, (frames, 3) or (3,)
+
+    With fold the angle between two lines is given, 180 - a if a > 90, as
+    the sign of a plane normal is arbitrary.
+    """
+    cos = np.einsum("...i,...i->...", u, v) / np.sqrt(
+        np.einsum("...i,...i->...", u, u) * np.einsum("...i,...i->...", v, v)
+    )
+    degree = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+    if fold:
+        degree = np.where(degree > 90, 180 - degree, degree)
+    return degree
+
+
+def benchmark(nframes: int, natoms: int = 6) -> tuple:
+    """time the kernels on random rings of nframes frames"""
+    rng = np.random.default_rng(0)
+    ring_1 = rng.normal(size=(nframes, natoms, 3))
+    ring_2 = rng.normal(size=(nframes, natoms, 3))
+    start = time.perf_counter()
+    dist = distances(centroids(ring_1), centroids(ring_2))
+    dist_time = time.perf_counter() - start
+    start = time.perf_counter()
+    ang = vector_angles(plane_normals(ring_1), plane_normals(ring_2))
+    ang_time = time.perf_counter() - start
+    print(
+        "Info -> {:>9} frames : distance {:8.3f} s, plane angle {:8.3f} s".format(
+            nframes, dist_time, ang_time
+        )
+    )
+    return dist, ang
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] if len(sys.argv) > 1 else ["100000", "1000000"]:
+        benchmark(int(float(arg)))
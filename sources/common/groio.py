@@ -0,0 +1,449 @@
+## author : charlie
+## date : 20221019
+## usage : streaming reader of gro files, one structure or a trajectory of
+##     many frames written by gmx trjconv, plain or compressed
+##     atom lines of a frame have the same width, so the line of atom i is
+##     at a known byte offset after the atom number line; only the lines of
+##     the selected atoms are read, the other atoms of the frame are skipped
+##     by seek, the memory used does not depend on the size of the file
+##     the byte offset, time and atom number of every frame are saved once in
+##     a sidecar .foo.gro.index.npz, for -b/-e/-skip and random access to
+##     frames; set environment variable GRO_INDEX=0 to disable it
+##     a binary coordinate store (coordstore.py) is read in place of a gro
+##     file by all functions here, frames and atoms sliced from its maps
+
+import os
+import re
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from zopen import zopen
+from xvgcache import digest
+from coordstore import is_store, open_store, StoreReader
+
+## columns of an atom line : resid, resname, atomname and atom number, 5 each
+ATOM_HEAD = 20
+## selected lines closer than this are read as one block
+GAP = 64
+TIME_PATTERN = re.compile(rb"t=\s*([-+0-9.eE]+)")
+INDEX_VERSION = 1
+
+
+def frame_time(title: bytes) -> float:
+    """time in the title line written by gmx, 't= 100.00000 step= 50000', nan if none"""
+    match = TIME_PATTERN.search(title)
+    if match == None:
+        return np.nan
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return np.nan
+
+
+def field_width(line: bytes) -> int:
+    """width of a coordinate, 8 for the %8.3f of gmx, more with -ndec"""
+    first = line.index(b".", ATOM_HEAD)
+    return line.index(b".", first + 1) - first
+
+
+def parse_box(line: bytes) -> np.ndarray:
+    """box line, 3 or 9 numbers, as 9 numbers v1(x) v2(y) v3(z) v1(y) v1(z) v2(x) v2(z) v3(x) v3(y)"""
+    values = [float(v) for v in line.split()]
+    if len(values) not in (3, 9):
+        raise ValueError("not a box line : {}".format(line))
+    return np.array(values + [0.0] * (9 - len(values)))
+
+
+def parse_atoms(lines: np.ndarray, width: int) -> np.ndarray:
+    """atom lines as a bytes array -> (atoms, 3) coordinates
+
+    The three fields of every line are viewed in place by offset and
+    converted at once, no line is split.
+    """
+    if lines.shape[0] == 0:
+        return np.zeros((0, 3))
+    if lines.dtype.itemsize < ATOM_HEAD + 3 * width:
+        print("ERROR -> atom lines are too short for coordinates : {}".format(lines[:1]))
+        exit()
+    fields = np.dtype(
+        {
+            "names": ["x", "y", "z"],
+            "formats": ["S{}".format(width)] * 3,
+            "offsets": [ATOM_HEAD, ATOM_HEAD + width, ATOM_HEAD + 2 * width],
+            "itemsize": lines.dtype.itemsize,
+        }
+    )
+    view = lines.view(fields)
+    return np.column_stack([view[k].astype(float) for k in ("x", "y", "z")]).reshape(-1, 3)
+
+
+def selection_blocks(atoms: np.ndarray) -> list:
+    """(first, last) positions of the runs of sorted atoms, gaps smaller than GAP joined"""
+    if atoms.shape[0] == 0:
+        return []
+    breaks = np.nonzero(np.diff(atoms) > GAP)[0]
+    firsts = np.append(atoms[0], atoms[breaks + 1])
+    lasts = np.append(atoms[breaks], atoms[-1])
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+class GroReader:
+    """read frames of gro file one after another
+
+    atoms are the positions (from 0) of the selected atoms in a frame, as
+    the index numbers of a ndx file minus 1; None selects all atoms. The
+    coordinates are returned in the order of atoms.
+    """
+
+    def __init__(self, grofile: str, atoms: list = None):
+        self.grofile = grofile
+        self.fo = zopen(grofile, "rb")
+        self.natoms = 0
+        ## atom lines of the last frame read, in the order of atoms
+        self.lines = None
+        self.atoms = None
+        if atoms is not None:
+            self.atoms = np.asarray(atoms, dtype=int)
+            ## read in file order, then put back into the order of atoms
+            self.sorted_atoms, self.order = np.unique(self.atoms, return_inverse=True)
+            self.blocks = selection_blocks(self.sorted_atoms)
+
+    def close(self) -> None:
+        self.fo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def seek_frame(self, offset: int) -> None:
+        """go to the frame starting at byte offset, from frame_index"""
+        self.fo.seek(offset)
+
+    def read_frame(self) -> tuple:
+        """(time, coords, box) of the next frame, None at the end of file"""
+        title = self.fo.readline()
+        if title.strip() == b"":
+            return None
+        try:
+            natoms = int(self.fo.readline())
+        except ValueError:
+            print("Warning -> {} is broken or incomplete after '{}', stop reading".format(self.grofile, title.strip().decode()))
+            return None
+        if self.atoms is not None and self.sorted_atoms.shape[0] != 0 and self.sorted_atoms[-1] >= natoms:
+            print("ERROR -> atom {} is out of the {} atoms of {}".format(self.sorted_atoms[-1] + 1, natoms, self.grofile))
+            exit()
+        self.natoms = natoms
+        start = self.fo.tell()
+        first = self.fo.readline()
+        try:
+            width = field_width(first)
+        except ValueError:
+            print("Warning -> {} is broken or incomplete after '{}', stop reading".format(self.grofile, title.strip().decode()))
+            return None
+        length = len(first)
+        ## only forward seeks, a compressed stream is decompressed once
+        end = start + natoms * length
+        lines = self.fixed_lines(start, natoms, length)
+        box = None
+        if lines is not None:
+            self.fo.seek(end - 1)
+            try:
+                if self.fo.read(1) == b"\n":
+                    box = parse_box(self.fo.readline())
+            except ValueError:
+                box = None
+        if box is None:
+            ## lines of different width, not written by gmx
+            self.fo.seek(start)
+            try:
+                lines, box = self.scan_lines(natoms)
+            except ValueError:
+                print("Warning -> {} is broken or incomplete after '{}', stop reading".format(self.grofile, title.strip().decode()))
+                return None
+        coords = parse_atoms(lines, width)
+        if self.atoms is not None:
+            coords, lines = coords[self.order], lines[self.order]
+        self.lines = lines
+        return frame_time(title), coords, box
+
+    def fixed_lines(self, start: int, natoms: int, length: int) -> np.ndarray:
+        """atom lines of the selection read by offset, None if the lines are not all of length"""
+        blocks = [(0, natoms - 1)] if self.atoms is None else self.blocks
+        lines = []
+        for first, last in blocks:
+            self.fo.seek(start + first * length)
+            raw = self.fo.read((last - first + 1) * length)
+            if len(raw) != (last - first + 1) * length or raw[length - 1 :: length].count(b"\n") != last - first + 1:
+                return None
+            block = np.frombuffer(raw, "S{}".format(length))
+            if self.atoms is None:
+                return block
+            lines.append(block[self.sorted_atoms[(self.sorted_atoms >= first) & (self.sorted_atoms <= last)] - first])
+        return np.concatenate(lines) if len(lines) != 0 else np.zeros(0, "S{}".format(length))
+
+    def scan_lines(self, natoms: int) -> tuple:
+        """atom lines of the selection and the box, line by line for lines of different width"""
+        wanted = None if self.atoms is None else set(self.sorted_atoms.tolist())
+        lines = []
+        for i in range(natoms):
+            line = self.fo.readline()
+            if line == b"":
+                raise ValueError("end of file in atom lines")
+            if wanted == None or i in wanted:
+                lines.append(line.rstrip(b"\r\n"))
+        return np.array(lines, dtype=bytes), parse_box(self.fo.readline())
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if frame == None:
+                return
+            yield frame
+
+
+def open_gro(grofile: str, atoms: list = None):
+    """GroReader of a gro file, or StoreReader of a coordinate store"""
+    if is_store(grofile):
+        return StoreReader(grofile, atoms)
+    return GroReader(grofile, atoms)
+
+
+def index_file(grofile: str) -> str:
+    """.foo.gro.index.npz next to foo.gro"""
+    path, name = os.path.split(os.path.abspath(grofile))
+    return os.path.join(path, "." + name + ".index.npz")
+
+
+def build_index(grofile: str) -> dict:
+    """byte offset, time and atom number of every frame, by reading only the frame edges"""
+    offsets, times, natoms = [], [], []
+    with GroReader(grofile, []) as reader:
+        while True:
+            offset = reader.fo.tell()
+            frame = reader.read_frame()
+            if frame == None:
+                break
+            offsets.append(offset)
+            times.append(frame[0])
+            natoms.append(reader.natoms)
+    return {
+        "offsets": np.array(offsets, dtype=np.int64),
+        "times": np.array(times, dtype=np.float64),
+        "natoms": np.array(natoms, dtype=np.int64),
+    }
+
+
+def load_index(grofile: str) -> dict:
+    """index of a valid sidecar, None if there is none
+
+    Valid while size and mtime of grofile are unchanged, or the digest of
+    its first and last MB if only mtime changed, as the xvg cache.
+    """
+    try:
+        with np.load(index_file(grofile)) as saved:
+            header = json.loads(str(saved["header"]))
+            index = {key: saved[key] for key in ("offsets", "times", "natoms")}
+    except (OSError, ValueError, KeyError):
+        return None
+    stat = os.stat(grofile)
+    if header.get("version") != INDEX_VERSION or header.get("size") != stat.st_size:
+        return None
+    if header.get("mtime_ns") != stat.st_mtime_ns and header.get("digest") != digest(grofile):
+        return None
+    return index
+
+
+def write_index(grofile: str, index: dict) -> None:
+    """save index as sidecar, silently skipped if the directory is not writable"""
+    stat = os.stat(grofile)
+    header = {
+        "version": INDEX_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest(grofile),
+    }
+    target = index_file(grofile)
+    ## written to a temporary file then renamed, a reader never sees half of it
+    temp = "{}.{}.tmp.npz".format(target[:-4], os.getpid())
+    try:
+        np.savez(temp, header=np.array(json.dumps(header)), **index)
+        os.replace(temp, target)
+    except OSError:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def frame_index(grofile: str) -> dict:
+    """{'offsets', 'times', 'natoms'} of the frames of grofile, from the sidecar or built once"""
+    if not os.path.exists(grofile):
+        print("ERROR -> no {} in current directory".format(grofile))
+        exit()
+    if is_store(grofile):
+        ## frames of a store are found by number, the offsets are the numbers
+        store = open_store(grofile)
+        nframes = store["time"].shape[0]
+        return {
+            "offsets": np.arange(nframes, dtype=np.int64),
+            "times": np.asarray(store["time"], dtype=np.float64),
+            "natoms": np.full(nframes, store["header"]["atoms"], dtype=np.int64),
+        }
+    enabled = os.environ.get("GRO_INDEX", "1") != "0"
+    index = load_index(grofile) if enabled else None
+    if index == None:
+        index = build_index(grofile)
+        if enabled:
+            write_index(grofile, index)
+    return index
+
+
+def select_frames(
+    index: dict, begin: float = None, end: float = None, skip: int = 1, by_frame: bool = False
+) -> np.ndarray:
+    """frame numbers (from 0) with begin <= time <= end, every skip-th of them
+
+    With by_frame, begin and end are frame numbers instead of times.
+    """
+    frames = np.arange(index["offsets"].shape[0])
+    key = frames
+    if not by_frame and (begin != None or end != None):
+        key = index["times"]
+        if np.isnan(key).any():
+            print("ERROR -> no time (t=) in the title lines of gro file, select by frame numbers")
+            exit()
+    keep = np.ones(frames.shape[0], dtype=bool)
+    if begin != None:
+        keep &= key >= begin
+    if end != None:
+        keep &= key <= end
+    return frames[keep][:: max(skip, 1)]
+
+
+def split_frames(frames: np.ndarray, parts: int) -> list:
+    """contiguous pieces of frames of about equal length, e.g. one for each worker"""
+    return [piece for piece in np.array_split(frames, max(parts, 1)) if piece.shape[0] != 0]
+
+
+def add_frame_arguments(parser) -> None:
+    """-begin, -end, -skip and -frame options of the scripts reading gro trajectories"""
+    parser.add_argument("-begin", type=float, help="first frame to read, time (ps) in title line, or frame number with -frame")
+    parser.add_argument("-end", type=float, help="last frame to read, time (ps) in title line, or frame number with -frame")
+    parser.add_argument("-skip", default=1, type=int, help="read only every skip-th frame, default 1")
+    parser.add_argument("-frame", action="store_true", help="-begin and -end are frame numbers counted from 0")
+
+
+def frames_from_args(grofile: str, args) -> np.ndarray:
+    """frame numbers selected by the options of add_frame_arguments, None for all frames"""
+    if args.begin == None and args.end == None and args.skip <= 1:
+        return None
+    frames = select_frames(frame_index(grofile), args.begin, args.end, args.skip, args.frame)
+    if frames.shape[0] == 0:
+        print("ERROR -> no frame of {} selected by -begin, -end and -skip".format(grofile))
+        exit()
+    print("Info -> {} frames selected from {}".format(frames.shape[0], grofile))
+    return frames
+
+
+def iter_gro(grofile: str, atoms: list = None, frames: list = None):
+    """yield (time, coords, box) of every frame, coords of the selected atoms only
+
+    frames (numbers from 0, ascending) selects frames by the frame index,
+    only those frames are read.
+    """
+    with open_gro(grofile, atoms) as reader:
+        if frames is None:
+            yield from reader
+            return
+        offsets = frame_index(grofile)["offsets"]
+        for frame in frames:
+            reader.seek_frame(offsets[frame])
+            yield reader.read_frame()
+
+
+def iter_gro_chunks(grofile: str, atoms: list = None, chunk: int = 10000, frames: list = None):
+    """yield (times, coords, boxes) of at most chunk frames, coords as (frames, atoms, 3)
+
+    The stacked coordinates go to the kernels of geometry.py directly.
+    Chunks of a coordinate store are sliced from its maps at once.
+    """
+    if is_store(grofile):
+        with StoreReader(grofile, atoms) as reader:
+            numbers = np.arange(reader.store["time"].shape[0]) if frames is None else np.asarray(frames)
+            for first in range(0, numbers.shape[0], chunk):
+                yield reader.read_chunk(numbers[first : first + chunk])
+        return
+    times, coords, boxes = [], [], []
+    for time, xyz, box in iter_gro(grofile, atoms, frames):
+        times.append(time)
+        coords.append(xyz)
+        boxes.append(box)
+        if len(times) == chunk:
+            yield np.array(times), np.array(coords), np.array(boxes)
+            times, coords, boxes = [], [], []
+    if len(times) != 0:
+        yield np.array(times), np.array(coords), np.array(boxes)
+
+
+def read_gro(grofile: str, atoms: list = None, frames: list = None) -> tuple:
+    """(times, coords, boxes) of all (or the selected) frames, for selections small enough to hold"""
+    chunks = list(iter_gro_chunks(grofile, atoms, frames=frames))
+    if len(chunks) == 0:
+        print("ERROR -> no frame found in {}".format(grofile))
+        exit()
+    return tuple(np.concatenate(part) for part in zip(*chunks))
+
+
+def map_piece(grofile: str, atoms: list, offsets: np.ndarray, func) -> np.ndarray:
+    """func of the coordinates of the frames at offsets, run in a worker
+
+    The offsets come from the frame index of the parent, a worker only
+    seeks and reads and never builds the index again.
+    """
+    with open_gro(grofile, atoms) as reader:
+        if is_store(grofile):
+            return func(reader.read_chunk(offsets)[1])
+        coords = []
+        for offset in offsets:
+            reader.seek_frame(offset)
+            coords.append(reader.read_frame()[1])
+    return func(np.array(coords))
+
+
+def map_frames(
+    grofile: str, atoms: list, func, frames: np.ndarray = None, workers: int = 1, chunk: int = 10000
+) -> tuple:
+    """apply func to the (frames, atoms, 3) coordinates of the selected atoms, chunk by chunk
+
+    func returns one row (or value) per frame. With workers > 1 the frames
+    are cut into contiguous pieces of at most chunk frames by the frame
+    index, each piece is read and computed by a pool of processes, and the
+    results are joined in frame order. func has to be picklable, a function
+    of a module or a functools.partial of one.
+
+    Returns (frame numbers, results).
+    """
+    if workers <= 1:
+        results, count = [], 0
+        for _, coords, _ in iter_gro_chunks(grofile, atoms, chunk, frames):
+            results.append(func(coords))
+            count += coords.shape[0]
+        if len(results) == 0:
+            print("ERROR -> no frame found in {}".format(grofile))
+            exit()
+        numbers = np.arange(count) if frames is None else np.asarray(frames)
+        return numbers, np.concatenate(results)
+    ## the index is built (or loaded) once here, the workers get the offsets
+    offsets = frame_index(grofile)["offsets"]
+    if frames is None:
+        frames = np.arange(offsets.shape[0])
+    pieces = split_frames(np.asarray(frames), max(workers, -(-len(frames) // chunk)))
+    if len(pieces) == 0:
+        print("ERROR -> no frame found in {}".format(grofile))
+        exit()
+    num = len(pieces)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(map_piece, [grofile] * num, [atoms] * num, [offsets[p] for p in pieces], [func] * num))
+    return np.concatenate(pieces), np.concatenate(results)
+
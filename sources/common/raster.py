@@ -0,0 +1,61 @@
+## author : charlie
+## date : 20221019
+## usage : density image of scatter points, for millions of points which are
+##     too slow and too large to draw by plt.scatter. The points are counted
+##     into the pixels of the axes by one bincount and drawn as one image,
+##     so the time is proportional to the number of points and the size of
+##     the output picture does not depend on it
+
+import numpy as np
+from matplotlib.colors import LogNorm, Normalize
+
+
+def rasterize(
+    x: np.ndarray, y: np.ndarray, width: int, height: int, xlim: tuple, ylim: tuple
+) -> np.ndarray:
+    """number of points in each pixel, image[iy, ix] (height x width)"""
+    inside = (x >= xlim[0]) & (x <= xlim[1]) & (y >= ylim[0]) & (y <= ylim[1])
+    xspan = xlim[1] - xlim[0] if xlim[1] > xlim[0] else 1.0
+    yspan = ylim[1] - ylim[0] if ylim[1] > ylim[0] else 1.0
+    ix = np.minimum(((x[inside] - xlim[0]) / xspan * width).astype(np.int64), width - 1)
+    iy = np.minimum(((y[inside] - ylim[0]) / yspan * height).astype(np.int64), height - 1)
+    return np.bincount(iy * width + ix, minlength=width * height).reshape(height, width)
+
+
+def limits(values: np.ndarray) -> tuple:
+    """range of values with 2% margin on both sides"""
+    low, high = float(np.min(values)), float(np.max(values))
+    margin = (high - low) * 0.02 if high > low else 0.5
+    return low - margin, high + margin
+
+
+def density_scatter(
+    ax, x: np.ndarray, y: np.ndarray, scale: str = "log", cmap: str = "viridis", dpi: float = None
+):
+    """draw x, y as a density image at the pixel size of ax, returns the image
+
+    scale is 'log' or 'linear' for the colors of point counts, empty pixels
+    are left transparent. dpi is the resolution the figure will be saved
+    at (savefig(dpi=...)), default the figure dpi as shown on screen.
+    """
+    ax.figure.canvas.draw_idle()
+    bbox = ax.get_window_extent()
+    ## the extent is in pixels at the figure dpi
+    zoom = 1.0 if dpi == None else dpi / ax.figure.dpi
+    width, height = max(int(round(bbox.width * zoom)), 1), max(int(round(bbox.height * zoom)), 1)
+    xlim, ylim = limits(x), limits(y)
+    image = rasterize(x, y, width, height, xlim, ylim)
+    if scale == "log":
+        norm = LogNorm(vmin=1, vmax=max(image.max(), 2))
+    else:
+        norm = Normalize(vmin=0, vmax=max(image.max(), 1))
+    artist = ax.imshow(
+        np.ma.masked_equal(image, 0),
+        origin="lower",
+        extent=(xlim[0], xlim[1], ylim[0], ylim[1]),
+        aspect="auto",
+        interpolation="nearest",
+        norm=norm,
+        cmap=cmap,
+    )
+    return artist
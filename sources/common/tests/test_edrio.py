@@ -0,0 +1,64 @@
+## author : charlie
+## date : 20221019
+## usage : python -m pytest sources/common/tests
+##     data/*.edr are energy files written by GROMACS (version 1, 3 and 5,
+##     the last with extra blocks), data/*.xvg are their `gmx energy` output
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import edrio
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+FILES = ["1.edr", "3.edr", "blocks.edr"]
+
+
+def gmx_energy(xvgfile: str) -> tuple:
+    """legends and data of the xvg written by gmx energy"""
+    legends = [line.split('"')[1] for line in open(xvgfile) if line.startswith("@ s")]
+    return legends, np.loadtxt(xvgfile, comments=["#", "@"])
+
+
+@pytest.mark.parametrize("name", FILES)
+def test_read_matches_gmx_energy(name):
+    edrfile = os.path.join(DATA, name)
+    legends, ref = gmx_energy(edrfile[:-4] + ".xvg")
+    assert edrio.is_edr(edrfile)
+    names, units, data = edrio.readedr(edrfile)
+    assert len(names) == len(units)
+    columns = [0] + [names.index(legend) + 1 for legend in legends]
+    assert data.shape[0] == ref.shape[0]
+    ## gmx energy prints 6 significant digits
+    np.testing.assert_allclose(data[:, columns], ref, rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("name", FILES)
+def test_write_read_round_trip(name, tmp_path):
+    names, units, data = edrio.readedr(os.path.join(DATA, name))
+    edrfile = str(tmp_path / "round.edr")
+    edrio.writeedr(edrfile, names, units, data[:, 0], data[:, 1:])
+    names_2, units_2, data_2 = edrio.readedr(edrfile)
+    assert names_2 == names and units_2 == units
+    ## time is written as double, the energies in single precision
+    np.testing.assert_array_equal(data_2[:, 0], data[:, 0])
+    np.testing.assert_array_equal(data_2[:, 1:], data[:, 1:].astype(np.float32))
+
+
+def test_header_layout_as_gromacs(tmp_path):
+    """the header written for the terms of a version 5 file is byte for byte the original"""
+    edrfile = os.path.join(DATA, "blocks.edr")
+    reader = edrio.EdrReader(edrfile)
+    assert reader.version == edrio.VERSION
+    names, units, data = edrio.readedr(edrfile)
+    header = bytes(reader.buf[: reader.start])
+    written = str(tmp_path / "header.edr")
+    edrio.writeedr(written, names, units, data[:1, 0], data[:1, 1:])
+    with open(written, "rb") as fo:
+        assert fo.read(len(header)) == header
+
+
+def test_text_is_not_edr():
+    assert not edrio.is_edr(os.path.join(DATA, "blocks.xvg"))
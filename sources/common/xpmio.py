@@ -0,0 +1,90 @@
+## author : charlie
+## date : 20221019
+## usage : writer of GROMACS style xpm files, which can be shown by
+##     xpm_show/xpm_show.py and xpm2png.py like those written by gmx
+##         sys.path.append(os.path.join(os.path.dirname(
+##             os.path.abspath(__file__)), "..", "common"))
+##         from xpmio import writexpm
+
+import time
+import numpy as np
+
+## characters for the pixels, without quote, backslash, comma, slash, star and space
+XPM_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!#$%&()+-.:;<=>?@[]^_{|}~"
+
+
+def gradient(low: str, high: str, levels: int) -> list:
+    """hex colors from low to high, linear in rgb"""
+    low_rgb = np.array([int(low[i : i + 2], 16) for i in (1, 3, 5)], dtype=float)
+    high_rgb = np.array([int(high[i : i + 2], 16) for i in (1, 3, 5)], dtype=float)
+    weight = np.linspace(0, 1, levels)[:, None]
+    rgb = np.rint(low_rgb + (high_rgb - low_rgb) * weight).astype(int)
+    return ["#{:02X}{:02X}{:02X}".format(*color) for color in rgb]
+
+
+def writexpm(
+    outputfile: str,
+    matrix: np.ndarray,
+    xaxis: np.ndarray,
+    yaxis: np.ndarray,
+    title: str = "",
+    legend: str = "",
+    xlabel: str = "",
+    ylabel: str = "",
+    levels: int = 100,
+    low_color: str = "#000000",
+    high_color: str = "#FFFFFF",
+    value_range: tuple = None,
+    source: str = "",
+) -> None:
+    """write matrix[ix, iy] into a Continuous xpm
+
+    xaxis and yaxis are the centers (len = width, height) or the edges
+    (len = width + 1, height + 1) of pixels. Values are mapped linearly onto
+    levels colors in value_range, default the min and max of matrix. As in
+    gmx, the first data row is the top of the picture (largest y).
+    """
+    width, height = matrix.shape
+    low, high = value_range if value_range != None else (float(np.min(matrix)), float(np.max(matrix)))
+    if high <= low:
+        high = low + 1.0
+    index = np.rint((np.clip(matrix, low, high) - low) / (high - low) * (levels - 1)).astype(int)
+
+    per_pixel = 1 if levels <= len(XPM_CHARS) else 2
+    if levels > len(XPM_CHARS) ** 2:
+        print("ERROR -> at most {} levels in xpm".format(len(XPM_CHARS) ** 2))
+        exit()
+    ## the first char changes fastest, as gmx does
+    codes = [
+        XPM_CHARS[i % len(XPM_CHARS)] + (XPM_CHARS[i // len(XPM_CHARS)] if per_pixel == 2 else "")
+        for i in range(levels)
+    ]
+    colors = gradient(low_color, high_color, levels)
+    notes = np.linspace(low, high, levels)
+
+    lines = [
+        "/* XPM */",
+        "/* This file is generated by {} at {} */".format(
+            source, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        ),
+        '/* title:   "{}" */'.format(title),
+        '/* legend:  "{}" */'.format(legend),
+        '/* x-label: "{}" */'.format(xlabel),
+        '/* y-label: "{}" */'.format(ylabel),
+        '/* type:    "Continuous" */',
+        "static char *gromacs_xpm[] = {",
+        '"{} {}   {} {}",'.format(width, height, levels, per_pixel),
+    ]
+    for code, color, note in zip(codes, colors, notes):
+        lines.append('"{} c {} " /* "{:.3g}" */,'.format(code, color, note))
+    for name, axis in (("x-axis", xaxis), ("y-axis", yaxis)):
+        for start in range(0, len(axis), 80):
+            lines.append(
+                "/* {}:  {} */".format(name, " ".join(["{:g}".format(v) for v in axis[start : start + 80]]))
+            )
+    table = np.array(codes)
+    rows = ['"' + "".join(table[index[:, iy]]) + '"' for iy in range(height - 1, -1, -1)]
+    lines.append(",\n".join(rows))
+    lines.append("};")
+    with open(outputfile, "w") as fo:
+        fo.write("\n".join(lines) + "\n")
@@ -0,0 +1,123 @@
+## author : charlie
+## date : 20221019
+## usage : sidecar binary cache of parsed xvg files, used by readxvg of xvgio.py
+##     the columns of foo.xvg are saved as .foo.xvg.cache/c0.npy, c1.npy, ...
+##     with header.json for legends and labels, and are memory-mapped when
+##     read again, so only the selected columns and time window are loaded
+##     set environment variable XVG_CACHE=0 to disable it
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+VERSION = 1
+DIGEST_BYTES = 1 << 20
+
+
+def enabled() -> bool:
+    return os.environ.get("XVG_CACHE", "1") != "0"
+
+
+def cache_dir(xvgfile: str) -> str:
+    """.foo.xvg.cache directory next to foo.xvg"""
+    path, name = os.path.split(os.path.abspath(xvgfile))
+    return os.path.join(path, "." + name + ".cache")
+
+
+def digest(xvgfile: str) -> str:
+    """blake2b of the first and last MB of file, cheap even for GB files"""
+    h = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(xvgfile)
+    with open(xvgfile, "rb") as fo:
+        h.update(fo.read(DIGEST_BYTES))
+        if size > DIGEST_BYTES:
+            fo.seek(max(DIGEST_BYTES, size - DIGEST_BYTES))
+            h.update(fo.read(DIGEST_BYTES))
+    return h.hexdigest()
+
+
+def load_cache(xvgfile: str) -> dict:
+    """header of a valid cache of xvgfile, None if there is no valid one
+
+    The cache is valid if size and mtime of xvgfile are unchanged. If only
+    mtime changed (touched, copied), the digest decides.
+    """
+    if not enabled():
+        return None
+    header_file = os.path.join(cache_dir(xvgfile), "header.json")
+    try:
+        with open(header_file, "r") as fo:
+            header = json.load(fo)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(xvgfile)
+    if header.get("version") != VERSION or header.get("size") != stat.st_size:
+        return None
+    if header.get("mtime_ns") != stat.st_mtime_ns:
+        if header.get("digest") != digest(xvgfile):
+            return None
+        header["mtime_ns"] = stat.st_mtime_ns
+        try:
+            with open(header_file, "w") as fo:
+                json.dump(header, fo, indent=2)
+        except OSError:
+            pass
+    return header
+
+
+def cache_column(xvgfile: str, column: int) -> np.ndarray:
+    """memory-mapped column of cache, nothing is read until it is used"""
+    return np.load(os.path.join(cache_dir(xvgfile), "c{}.npy".format(column)), mmap_mode="r")
+
+
+def read_cache(
+    xvgfile: str, header: dict, begin: float = None, end: float = None, columns: list = None
+) -> np.ndarray:
+    """2D array of time and selected columns in time window, from the cache"""
+    keep = [0] + (list(range(1, header["columns"])) if columns == None else list(columns))
+    time = cache_column(xvgfile, 0)
+    start, stop = 0, time.shape[0]
+    if begin != None:
+        start = np.searchsorted(time, begin, side="left")
+    if end != None:
+        stop = np.searchsorted(time, end, side="right")
+    data = np.empty((max(stop - start, 0), len(keep)), dtype=np.float64)
+    for index, c in enumerate(keep):
+        data[:, index] = cache_column(xvgfile, c)[start:stop]
+    return data
+
+
+def write_cache(xvgfile: str, title: str, xlabel: str, ylabel: str, legends: list, data: np.ndarray) -> None:
+    """save parsed xvg as cache, silently skipped if the directory is not writable"""
+    if not enabled():
+        return
+    stat = os.stat(xvgfile)
+    header = {
+        "version": VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": digest(xvgfile),
+        "title": title,
+        "xlabel": xlabel,
+        "ylabel": ylabel,
+        "legends": legends,
+        "rows": data.shape[0],
+        "columns": data.shape[1],
+    }
+    target = cache_dir(xvgfile)
+    ## written into a temporary directory first, then renamed, so a reader
+    ## never sees a half written cache
+    temp = "{}.{}.tmp".format(target, os.getpid())
+    try:
+        os.makedirs(temp, exist_ok=True)
+        for c in range(data.shape[1]):
+            np.save(os.path.join(temp, "c{}.npy".format(c)), np.ascontiguousarray(data[:, c]))
+        with open(os.path.join(temp, "header.json"), "w") as fo:
+            json.dump(header, fo, indent=2)
+        if os.path.exists(target):
+            shutil.rmtree(target, ignore_errors=True)
+        os.rename(temp, target)
+    except OSError:
+        shutil.rmtree(temp, ignore_errors=True)
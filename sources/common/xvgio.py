@@ -0,0 +1,548 @@
+## author : charlie
+## date : 20221019
+## usage : array-based reader and writer of xvg files shared by the xvg tools
+##     other scripts in sources/ could import it by:
+##         sys.path.append(os.path.join(os.path.dirname(
+##             os.path.abspath(__file__)), "..", "common"))
+##         from xvgio import readxvg, writexvg
+##     time window (-b/-e) of all xvg tools is selected here, by early stop
+##     when reading the file or by binary search on the time column of array
+##     parsed files are cached as binary columns by xvgcache.py, later reads
+##     only load the selected columns and time window from the cache
+##     gzip, bzip2 and xz compressed xvg files are read as they are, by zopen.py
+##     GROMACS energy files (.edr) are read by edrio.py as if they were the xvg
+##     of all terms written by gmx energy
+
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import xvgcache
+from zopen import zopen, is_compressed
+import edrio
+
+
+def parse_label(line: str) -> str:
+    """get the string between the quotes of a @ line"""
+    items = line.strip().split('"')
+    if len(items) < 3:
+        return "Null"
+    return items[1]
+
+
+def parse_header(line: str, column_num: int) -> list:
+    """parse the title line of formatted xvg file into legends"""
+    ## titles like 'LJ (SR)    Disper. corr.' are split by two spaces
+    legends = [item.strip() for item in line.split("  ") if item.strip() != ""]
+    if len(legends) == column_num:
+        return legends
+    ## titles like 'LJ(SR) Disper.corr.', merge '(SR)' into former one
+    legends = []
+    for item in line.split():
+        if item[0] == "(" and len(legends) != 0:
+            legends[-1] += item
+        else:
+            legends.append(item)
+    if len(legends) == column_num:
+        return legends
+    return []
+
+
+def is_data_line(line: str) -> bool:
+    """whether the stripped line starts with a number"""
+    return line[0].isdigit() or line[0] in "-+."
+
+
+def pop_time_window(cmds: list) -> tuple:
+    """take -b/-e time options out of command list
+
+    Both '-b1000' and '-b 1000' are accepted. Returns (begin, end, cmds left),
+    begin and end are None if not specified.
+    """
+    window = {"-b": None, "-e": None}
+    cmds_left = []
+    index = 0
+    while index < len(cmds):
+        cmd = cmds[index]
+        if cmd[:2] in window.keys():
+            value = cmd[2:]
+            if value == "" and index + 1 < len(cmds):
+                index += 1
+                value = cmds[index]
+            try:
+                window[cmd[:2]] = float(value)
+            except ValueError:
+                print("ERROR -> wrong time for {} : {}".format(cmd[:2], value))
+                exit()
+        else:
+            cmds_left.append(cmd)
+        index += 1
+    return window["-b"], window["-e"], cmds_left
+
+
+def select_time(data: np.ndarray, begin: float = None, end: float = None) -> np.ndarray:
+    """rows of data with begin <= time <= end, by binary search on column 0"""
+    start, stop = 0, data.shape[0]
+    if begin != None:
+        start = np.searchsorted(data[:, 0], begin, side="left")
+    if end != None:
+        stop = np.searchsorted(data[:, 0], end, side="right")
+    return data[start:stop]
+
+
+def column_number(xvgfile: str) -> int:
+    """number of columns of xvg file, only the lines before first data line are read"""
+    if not os.path.exists(xvgfile):
+        print("ERROR -> no {} in current directory".format(xvgfile))
+        exit()
+    if edrio.is_edr(xvgfile):
+        return len(edrio.read_edr_header(xvgfile)[0]) + 1
+    with zopen(xvgfile) as fo:
+        for line in fo:
+            line_s = line.strip()
+            if line_s != "" and is_data_line(line_s):
+                return len(line_s.split())
+    return 0
+
+
+def check_columns(xvgfile: str, columns: list, column_num: int) -> None:
+    """exit if any of the selected columns is not in file"""
+    if columns != None and len(columns) != 0 and max(columns) >= column_num:
+        print(
+            "ERROR -> column {} is out of range, {} has {} columns".format(
+                max(columns), xvgfile, column_num
+            )
+        )
+        exit()
+
+
+def time_range(xvgfile: str) -> tuple:
+    """time of the first and the last data line, the file is read from both ends only
+
+    Compressed files are read through, unless they are cached.
+    """
+    header = xvgcache.load_cache(xvgfile)
+    if header != None and header["rows"] > 0:
+        time = xvgcache.cache_column(xvgfile, 0)
+        return float(time[0]), float(time[-1])
+    if edrio.is_edr(xvgfile):
+        first, last = None, None
+        for data in edrio.iter_edr(xvgfile, columns=[]):
+            first = data[0, 0] if first == None else first
+            last = data[-1, 0]
+        if first == None:
+            print("ERROR -> no data found in {}".format(xvgfile))
+            exit()
+        return float(first), float(last)
+    first = None
+    with zopen(xvgfile) as fo:
+        for line in fo:
+            line_s = line.strip()
+            if line_s != "" and line_s[0] not in "#&@" and is_data_line(line_s):
+                first = float(line_s.split()[0])
+                break
+    if first == None:
+        print("ERROR -> no data found in {}".format(xvgfile))
+        exit()
+    if is_compressed(xvgfile):
+        ## a compressed stream can not seek backward, it is read to the end
+        last = first
+        for data in iter_xvg(xvgfile, columns=[]):
+            last = float(data[-1, 0])
+        return first, last
+    ## read blocks backwards until a complete data line is found
+    size = os.path.getsize(xvgfile)
+    block = 65536
+    with open(xvgfile, "rb") as fo:
+        while True:
+            start = max(size - block, 0)
+            fo.seek(start)
+            lines = fo.read(size - start).decode("utf-8", "ignore").splitlines()
+            if start != 0:
+                lines = lines[1:]
+            for line in reversed(lines):
+                line_s = line.strip()
+                if line_s != "" and line_s[0] not in "#&@" and is_data_line(line_s):
+                    return first, float(line_s.split()[0])
+            if start == 0:
+                return first, first
+            block *= 4
+
+
+def read_header(xvgfile: str) -> tuple:
+    """read title, xlabel, ylabel and legends of xvg file, up to the first data line
+
+    Both xvg generated by GROMACS (legends in '@ s0 legend' lines) and xvg
+    formatted by xvgformat.py or energy_compute.py (legends in a title line)
+    are supported. legends[0] is for the time column.
+
+    Returns (title, xlabel, ylabel, legends).
+    """
+    if not os.path.exists(xvgfile):
+        print("ERROR -> no {} in current directory".format(xvgfile))
+        exit()
+
+    if edrio.is_edr(xvgfile):
+        return "GROMACS Energies", "Time (ps)", "(kJ/mol)", ["time"] + edrio.read_edr_header(xvgfile)[0]
+
+    title, xlabel, ylabel = "Null", "Null", "Null"
+    set_legends, header_line = [], ""
+    column_num = 0
+    with zopen(xvgfile) as fo:
+        for line in fo:
+            line_s = line.strip()
+            if line_s == "" or line_s[0] in "#&":
+                continue
+            if line_s[0] == "@":
+                if "legend" in line_s and line_s.startswith("@ s"):
+                    set_legends.append(parse_label(line_s))
+                elif "title" in line_s and "subtitle" not in line_s:
+                    title = parse_label(line_s)
+                elif "xaxis" in line_s and "label" in line_s:
+                    xlabel = parse_label(line_s)
+                elif "yaxis" in line_s and "label" in line_s:
+                    ylabel = parse_label(line_s)
+                continue
+            if not is_data_line(line_s):
+                header_line = line_s
+                continue
+            column_num = len(line_s.split())
+            break
+
+    legends = []
+    if header_line != "":
+        legends = parse_header(header_line, column_num)
+    if len(legends) == 0:
+        if len(set_legends) == 0 and column_num == 2 and ylabel != "Null":
+            set_legends = [ylabel]
+        legends = ["time"] + set_legends[: column_num - 1]
+        legends += ["no-legend"] * (column_num - len(legends))
+
+    return title, xlabel, ylabel, legends
+
+
+def iter_xvg(
+    xvgfile: str, begin: float = None, end: float = None, columns: list = None, chunk: int = 100000
+):
+    """yield the data of xvg file as 2D arrays of at most chunk rows
+
+    Only rows with begin <= time <= end are kept. Time is assumed to be in
+    ascending order, so reading stops at the first row later than end.
+
+    If columns (e.g. [2, 5]) is given, only time and these columns are split,
+    converted and stored, in the given order.
+    """
+    if not os.path.exists(xvgfile):
+        print("ERROR -> no {} in current directory".format(xvgfile))
+        exit()
+
+    header = xvgcache.load_cache(xvgfile)
+    if header != None:
+        check_columns(xvgfile, columns, header["columns"])
+        time = xvgcache.cache_column(xvgfile, 0)
+        start, stop = 0, time.shape[0]
+        if begin != None:
+            start = np.searchsorted(time, begin, side="left")
+        if end != None:
+            stop = np.searchsorted(time, end, side="right")
+        keep = [0] + (list(range(1, header["columns"])) if columns == None else list(columns))
+        mapped = [xvgcache.cache_column(xvgfile, c) for c in keep]
+        for first in range(start, stop, chunk):
+            last = min(first + chunk, stop)
+            yield np.column_stack([column[first:last] for column in mapped])
+        return
+
+    if edrio.is_edr(xvgfile):
+        check_columns(xvgfile, columns, column_number(xvgfile))
+        yield from edrio.iter_edr(xvgfile, begin, end, columns, chunk)
+        return
+
+    rows = []
+    column_num = 0
+    windowed = begin != None or end != None
+    keep = None if columns == None else [0] + list(columns)
+    with zopen(xvgfile) as fo:
+        for line in fo:
+            line_s = line.strip()
+            if line_s == "" or line_s[0] in "#&@" or not is_data_line(line_s):
+                continue
+            if column_num == 0:
+                column_num = len(line_s.split())
+                check_columns(xvgfile, columns, column_num)
+                if keep == list(range(column_num)):
+                    keep = None
+            if keep != None:
+                ## the part after the last selected column is left unsplit
+                items = line_s.split(None, max(keep) + 1)
+            elif windowed:
+                items = line_s.split(None, 1)
+            if windowed:
+                time_now = float(items[0])
+                if end != None and time_now > end:
+                    break
+                if begin != None and time_now < begin:
+                    continue
+            if keep == None:
+                rows.append(line_s)
+            elif len(items) > max(keep):
+                rows.append(" ".join([items[c] for c in keep]))
+            else:
+                print("Warning -> skip line with wrong column number : {}".format(line_s))
+            if len(rows) == chunk:
+                yield rows2array(rows)
+                rows = []
+    if len(rows) != 0:
+        yield rows2array(rows)
+
+
+def readxvg(
+    xvgfile: str, begin: float = None, end: float = None, columns: list = None
+) -> tuple:
+    """read xvg file into a 2D numpy array (rows x columns)
+
+    Column 0 is the time column. The header is read by read_header, the time
+    window and column selection are done by iter_xvg.
+
+    The first read of the whole file (no -b/-e) saves it by xvgcache, later
+    calls read the time window and columns from the memory-mapped cache.
+    A windowed read without a cache streams only the window and stops at
+    end, it does not parse the rest of the file to build the cache.
+
+    Returns (title, xlabel, ylabel, legends, data).
+    """
+    header = xvgcache.load_cache(xvgfile)
+    if header != None:
+        check_columns(xvgfile, columns, header["columns"])
+        title, xlabel, ylabel = header["title"], header["xlabel"], header["ylabel"]
+        legends = header["legends"]
+        data = xvgcache.read_cache(xvgfile, header, begin, end, columns)
+    elif xvgcache.enabled() and begin == None and end == None:
+        title, xlabel, ylabel, legends = read_header(xvgfile)
+        check_columns(xvgfile, columns, len(legends))
+        chunks = list(iter_xvg(xvgfile))
+        if len(chunks) != 0:
+            data = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+            xvgcache.write_cache(xvgfile, title, xlabel, ylabel, legends, data)
+            if columns != None:
+                data = data[:, [0] + list(columns)]
+        else:
+            data = np.empty((0, 0))
+    else:
+        title, xlabel, ylabel, legends = read_header(xvgfile)
+        chunks = list(iter_xvg(xvgfile, begin, end, columns))
+        data = np.concatenate(chunks) if len(chunks) != 0 else np.empty((0, 0))
+    if data.shape[0] == 0 and (begin != None or end != None):
+        print("ERROR -> no data found in {} between -b and -e".format(xvgfile))
+        exit()
+    elif data.shape[0] == 0:
+        print("ERROR -> no data found in {}".format(xvgfile))
+        exit()
+
+    if columns != None:
+        legends = [legends[c] for c in [0] + list(columns)]
+
+    return title, xlabel, ylabel, legends, data
+
+
+def readxvg_many(
+    xvgfiles: list, begin: float = None, end: float = None, columns: list = None, workers: int = None
+) -> list:
+    """read several xvg files by a pool of processes, results are in input order
+
+    Each result is (title, xlabel, ylabel, legends, data) as readxvg.
+    """
+    for xvgfile in xvgfiles:
+        if not os.path.exists(xvgfile):
+            print("ERROR -> no {} in current directory".format(xvgfile))
+            exit()
+    if workers == None:
+        workers = min(len(xvgfiles), os.cpu_count() or 1)
+    if workers <= 1:
+        return [readxvg(xvgfile, begin, end, columns) for xvgfile in xvgfiles]
+    num = len(xvgfiles)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(readxvg, xvgfiles, [begin] * num, [end] * num, [columns] * num))
+
+
+def sort_time(data: np.ndarray) -> np.ndarray:
+    """sort rows by time, for repeated times (restarted runs) the last row is kept"""
+    if data.shape[0] < 2 or np.all(np.diff(data[:, 0]) > 0):
+        return data
+    ## reverse so that np.unique keeps the last occurrence
+    _, index = np.unique(data[::-1, 0], return_index=True)
+    return data[::-1][index]
+
+
+def align_time(data_lis: list, interp: bool = False, tolerance: float = None) -> np.ndarray:
+    """put 2D arrays of several files onto one common time axis
+
+    The time points of the file with the largest time step, inside the time
+    range shared by all files, are used as the common axis. By default they
+    are matched to the nearest time of every file (binary search on the
+    sorted time columns), and only the times found in all files within
+    tolerance are kept. With interp, all files are linearly interpolated
+    onto the common axis instead.
+
+    Returns 2D array: time, columns of file 1, columns of file 2, ...
+    """
+    data_lis = [sort_time(data) for data in data_lis]
+    steps = [np.median(np.diff(data[:, 0])) if data.shape[0] > 1 else 0.0 for data in data_lis]
+    if tolerance == None:
+        positive = [step for step in steps if step > 0]
+        tolerance = 0.25 * min(positive) if len(positive) != 0 else 1e-6
+    start = max([data[0, 0] for data in data_lis]) - tolerance
+    stop = min([data[-1, 0] for data in data_lis]) + tolerance
+    axis = data_lis[int(np.argmax(steps))][:, 0]
+    axis = axis[(axis >= start) & (axis <= stop)]
+
+    if interp:
+        parts = [
+            np.column_stack([np.interp(axis, data[:, 0], data[:, c]) for c in range(1, data.shape[1])])
+            for data in data_lis
+        ]
+        return np.column_stack([axis] + parts)
+
+    matched = np.ones(axis.shape[0], dtype=bool)
+    nearest_lis = []
+    for data in data_lis:
+        file_time = data[:, 0]
+        right = np.clip(np.searchsorted(file_time, axis), 0, file_time.shape[0] - 1)
+        left = np.clip(right - 1, 0, file_time.shape[0] - 1)
+        nearest = np.where(
+            np.abs(file_time[left] - axis) <= np.abs(file_time[right] - axis), left, right
+        )
+        matched &= np.abs(file_time[nearest] - axis) <= tolerance
+        nearest_lis.append(nearest)
+    parts = [data[nearest[matched], 1:] for data, nearest in zip(data_lis, nearest_lis)]
+    return np.column_stack([axis[matched]] + parts)
+
+
+class UnsortedTime(Exception):
+    """time of an input file is not strictly increasing"""
+
+
+def common_rows(times: list) -> list:
+    """indexes of the rows of each sorted time array whose time is in all of them"""
+    common = times[0]
+    for t in times[1:]:
+        common = np.intersect1d(common, t, assume_unique=True)
+    return [np.searchsorted(t, common) for t in times]
+
+
+def lockstep(
+    filename_lis: list, columns_lis: list, begin: float = None, end: float = None, chunk: int = 100000, dropped: list = None
+):
+    """merge-join the files on time while reading them chunk by chunk
+
+    Each file is read by iter_xvg with only its matched columns, so memory
+    stays at a few chunks whatever the length of the run. Rows are joined
+    up to the earliest last time in the buffers, later rows wait for the
+    next chunks. Frames missing in any file are dropped and counted in
+    dropped. Raises UnsortedTime if the time of a file goes backward.
+
+    Yields (time, [columns of file 1, columns of file 2, ...]), e.g. the
+    terms of prolig, pro and lig in energy_compute.py.
+    """
+    if dropped == None:
+        dropped = [0] * len(filename_lis)
+    readers = [iter_xvg(f, begin, end, c, chunk) for f, c in zip(filename_lis, columns_lis)]
+    buffers = [np.zeros((0, len(c) + 1)) for c in columns_lis]
+    last_time = [-np.inf] * len(readers)
+    finished = [False] * len(readers)
+    while True:
+        for i, reader in enumerate(readers):
+            if buffers[i].shape[0] == 0 and not finished[i]:
+                data = next(reader, None)
+                if data is None:
+                    finished[i] = True
+                    continue
+                if data[0, 0] <= last_time[i] or np.any(np.diff(data[:, 0]) <= 0):
+                    raise UnsortedTime(filename_lis[i])
+                last_time[i] = data[-1, 0]
+                buffers[i] = data
+        if any([finished[i] and buffers[i].shape[0] == 0 for i in range(len(readers))]):
+            ## no more frames could be in all files, the rest is counted only
+            for i, reader in enumerate(readers):
+                dropped[i] += buffers[i].shape[0] + sum([d.shape[0] for d in reader])
+            return
+        horizon = min([b[-1, 0] for b in buffers])
+        taken = []
+        for i in range(len(buffers)):
+            stop = np.searchsorted(buffers[i][:, 0], horizon, side="right")
+            taken.append(buffers[i][:stop])
+            buffers[i] = buffers[i][stop:]
+        rows = common_rows([t[:, 0] for t in taken])
+        for i in range(len(taken)):
+            dropped[i] += taken[i].shape[0] - rows[i].shape[0]
+        if rows[0].shape[0] != 0:
+            yield taken[0][rows[0], 0], [t[r, 1:] for t, r in zip(taken, rows)]
+
+
+def memory_join(
+    filename_lis: list, columns_lis: list, begin: float = None, end: float = None, chunk: int = 100000, dropped: list = None
+):
+    """join files which are not in time order, all read into memory
+
+    Rows are sorted by time and for repeated times (restarts) the last one
+    is kept, then the common times are found by searchsorted.
+    """
+    if dropped == None:
+        dropped = [0] * len(filename_lis)
+    data_lis = [sort_time(readxvg(f, begin, end, c)[4]) for f, c in zip(filename_lis, columns_lis)]
+    rows = common_rows([data[:, 0] for data in data_lis])
+    for i in range(len(data_lis)):
+        dropped[i] += data_lis[i].shape[0] - rows[i].shape[0]
+    for first in range(0, rows[0].shape[0], chunk):
+        index = [r[first : first + chunk] for r in rows]
+        yield data_lis[0][index[0], 0], [d[r, 1:] for d, r in zip(data_lis, index)]
+
+
+def rows2array(rows: list) -> np.ndarray:
+    """convert data lines into a 2D float array in one shot"""
+    column_num = len(rows[0].split())
+    values = np.fromstring(" ".join(rows), dtype=np.float64, sep=" ")
+    if values.size == column_num * len(rows):
+        return values.reshape(len(rows), column_num)
+    ## some lines are broken, parse line by line and drop them
+    data = []
+    for row in rows:
+        items = row.split()
+        if len(items) != column_num:
+            print("Warning -> skip line with wrong column number : {}".format(row))
+            continue
+        data.append([float(item) for item in items])
+    return np.array(data, dtype=np.float64).reshape(-1, column_num)
+
+
+def writexvg(
+    outputfile: str,
+    data: np.ndarray,
+    legends: list,
+    title: str = "Null",
+    xlabel: str = "Time (ps)",
+    ylabel: str = "Null",
+    source: str = "",
+    fmt: str = "%16.6f",
+) -> None:
+    """write 2D array into xvg file with GROMACS style @ lines"""
+    with open(outputfile, "w") as fo:
+        write_header(fo, legends, title, xlabel, ylabel, source)
+        np.savetxt(fo, data, fmt=fmt, delimiter=" ")
+
+
+def write_header(
+    fo, legends: list, title: str = "Null", xlabel: str = "Time (ps)", ylabel: str = "Null", source: str = ""
+) -> None:
+    """write GROMACS style @ lines into an opened file, data could be appended by chunks"""
+    lines = [
+        "# this file is generated by {} at {}".format(
+            source, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        ),
+        '@    title "{}"'.format(title),
+        '@    xaxis  label "{}"'.format(xlabel),
+        '@    yaxis  label "{}"'.format(ylabel),
+        "@TYPE xy",
+    ]
+    for index, legend in enumerate(legends[1:]):
+        lines.append('@ s{} legend "{}"'.format(index, legend))
+    fo.write("\n".join(lines) + "\n")
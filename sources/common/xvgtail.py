@@ -0,0 +1,116 @@
+## author : charlie
+## date : 20221019
+## usage : follow an xvg file which is still written by a running mdrun
+##     XvgTail keeps the byte offset of the last complete line it has read,
+##     so every poll parses only the lines appended since the last one;
+##     RunningStats and TrailingMean are updated with the new rows only
+
+import os
+import numpy as np
+
+from xvgio import is_data_line, rows2array
+
+
+class XvgTail:
+    """new complete data lines of a growing xvg file, poll by poll"""
+
+    def __init__(self, xvgfile: str, columns: list = None):
+        self.xvgfile = xvgfile
+        self.columns = columns
+        self.offset = 0
+        self.column_num = 0
+
+    def poll(self) -> np.ndarray:
+        """rows appended since the last poll, time and the selected columns
+
+        A line without its newline yet is left for the next poll. If the
+        file became shorter (mdrun restarted without -append), it is read
+        again from the beginning.
+        """
+        size = os.path.getsize(self.xvgfile)
+        if size < self.offset:
+            print("Info -> {} became shorter, read it from the beginning".format(self.xvgfile))
+            self.offset = 0
+        if size == self.offset:
+            return self.empty()
+        with open(self.xvgfile, "rb") as fo:
+            fo.seek(self.offset)
+            chunk = fo.read(size - self.offset)
+        last = chunk.rfind(b"\n")
+        if last < 0:
+            return self.empty()
+        self.offset += last + 1
+
+        rows = []
+        for line in chunk[: last + 1].decode(errors="replace").splitlines():
+            line = line.strip()
+            if line != "" and is_data_line(line):
+                rows.append(line)
+        if len(rows) == 0:
+            ## only comments or @ lines were appended, e.g. the header of a restarted file
+            return self.empty()
+        if self.column_num != 0 and len(rows[0].split()) != self.column_num:
+            ## rows2array takes the column number from the first row
+            print("Warning -> skip line with wrong column number : {}".format(rows[0]))
+            rows = rows[1:]
+        if len(rows) == 0:
+            return self.empty()
+        data = rows2array(rows)
+        if self.column_num == 0:
+            self.column_num = data.shape[1]
+        if self.columns != None:
+            data = data[:, [0] + self.columns]
+        return data
+
+    def empty(self) -> np.ndarray:
+        width = 1 + len(self.columns) if self.columns != None else max(self.column_num, 1)
+        return np.zeros((0, width))
+
+
+class RunningStats:
+    """count, mean, SD, min and max of columns, merged chunk by chunk"""
+
+    def __init__(self, ncol: int):
+        self.count = 0
+        self.mean = np.zeros(ncol)
+        self.m2 = np.zeros(ncol)
+        self.min = np.full(ncol, np.inf)
+        self.max = np.full(ncol, -np.inf)
+
+    def add(self, values: np.ndarray) -> None:
+        """merge the moments of a chunk (Chan et al.), O(rows of chunk)"""
+        n = values.shape[0]
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta**2 * self.count * n / total
+        self.count = total
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / self.count) if self.count > 0 else np.zeros_like(self.mean)
+
+
+class TrailingMean:
+    """mean of the last window rows, for every new row"""
+
+    def __init__(self, ncol: int, window: int):
+        self.window = window
+        ## the last window rows are kept, nothing older is needed
+        self.tail = np.zeros((0, ncol))
+
+    def add(self, values: np.ndarray) -> np.ndarray:
+        """trailing means of the new rows, fewer rows while the window fills up"""
+        if values.shape[0] == 0:
+            return values
+        joined = np.vstack([self.tail, values])
+        sums = np.vstack([np.zeros((1, joined.shape[1])), np.cumsum(joined, axis=0)])
+        stop = np.arange(self.tail.shape[0] + 1, joined.shape[0] + 1)
+        start = np.maximum(stop - self.window, 0)
+        self.tail = joined[-self.window :]
+        return (sums[stop] - sums[start]) / (stop - start)[:, None]
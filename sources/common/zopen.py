@@ -0,0 +1,70 @@
+## author : charlie
+## date : 20221019
+## usage : open plain or compressed (gzip, bzip2, xz) files in the same way
+##     the compression is detected by the magic bytes at the beginning of
+##     the file, not by the extension, and the content is decompressed while
+##     it is read, so archived foo.xvg.gz can be given to any reader
+
+import os
+import io
+import bz2
+import gzip
+import lzma
+
+## magic bytes at the beginning of compressed files
+MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bzip2"),
+    (b"\xfd7zXZ\x00", "xz"),
+]
+SUFFIXES = [".gz", ".bz2", ".xz"]
+## decompressed data is read in big blocks, fewer calls into the decompressor
+BUFFER = 1 << 20
+
+
+def compression(path: str) -> str:
+    """'gzip', 'bzip2', 'xz' or '' for a plain file"""
+    with open(path, "rb") as fo:
+        head = fo.read(6)
+    for magic, name in MAGIC:
+        if head.startswith(magic):
+            return name
+    return ""
+
+
+def is_compressed(path: str) -> bool:
+    return compression(path) != ""
+
+
+def zopen(path: str, mode: str = "r", encoding: str = None):
+    """open a plain or compressed file for reading, 'r' for text or 'rb' for bytes
+
+    Plain files are opened by the builtin open, so they can still seek
+    backward; compressed files are decompressed as a stream.
+    """
+    kind = compression(path)
+    if kind == "":
+        return open(path, mode, encoding=encoding)
+    if kind == "gzip":
+        raw = gzip.GzipFile(path, "rb")
+    elif kind == "bzip2":
+        raw = bz2.BZ2File(path, "rb")
+    else:
+        raw = lzma.LZMAFile(path, "rb")
+    stream = io.BufferedReader(raw, BUFFER)
+    if "b" in mode:
+        return stream
+    text = io.TextIOWrapper(stream, encoding=encoding)
+    ## the text layer asks 8 KB at a time by default, too small for a decompressor
+    text._CHUNK_SIZE = BUFFER
+    return text
+
+
+def resolve(path: str) -> str:
+    """path itself if it exists, otherwise the first of path.gz, path.bz2, path.xz"""
+    if os.path.exists(path):
+        return path
+    for suffix in SUFFIXES:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
@@ -0,0 +1,79 @@
+## author : charlie
+## date : 20221019
+## usage : write terms of a GROMACS energy file (.edr) into xvg without
+##     `gmx energy`, the terms are given by name or pattern instead of
+##     typing their numbers interactively
+## command : python edr2xvg.py -f ener.edr -t "LJ (SR)" "Coul*Protein-LIG" -o energy.xvg
+
+import os
+import sys
+import fnmatch
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from edrio import read_edr_header, readedr, is_edr
+from xvgio import writexvg
+
+
+def select_terms(names: list, patterns: list) -> list:
+    """names matching any of the patterns (* and ? as in shell), in file order"""
+    selected = []
+    for pattern in patterns:
+        matched = [n for n in names if n == pattern or fnmatch.fnmatchcase(n, pattern)]
+        if len(matched) == 0:
+            print("ERROR -> no term matches {}, list the terms by -l".format(pattern))
+            exit()
+        selected += [n for n in matched if n not in selected]
+    return [n for n in names if n in selected]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write terms of GROMACS energy file into xvg")
+    parser.add_argument("-f", "--inputfile", help="input your edr file")
+    parser.add_argument("-l", "--list", action="store_true", help="list the terms of edr file")
+    parser.add_argument(
+        "-t", "--terms", nargs="*", help="names or patterns of terms, eg. -t Potential 'Coul-SR:*', default all"
+    )
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument("-o", "--outputfile", default="energy.xvg", help="output xvg file, default energy.xvg")
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your edr file by -f")
+        exit()
+    if not os.path.exists(args.inputfile):
+        print("ERROR -> no {} in current directory".format(args.inputfile))
+        exit()
+    if not is_edr(args.inputfile):
+        print("ERROR -> {} is not a GROMACS energy file".format(args.inputfile))
+        exit()
+
+    names, units = read_edr_header(args.inputfile)
+    if args.list:
+        for i, (name, unit) in enumerate(zip(names, units)):
+            print("{:>4}  {:<32} {}".format(i + 1, name, unit))
+        print("Good Day !")
+        return
+
+    terms = select_terms(names, args.terms) if args.terms != None else names
+    terms, units, data = readedr(args.inputfile, args.begin, args.end, terms)
+    if data.shape[0] == 0:
+        print("ERROR -> no frame found in {}".format(args.inputfile))
+        exit()
+    ylabel = "(" + units[0] + ")" if len(set(units)) == 1 else ""
+    writexvg(
+        args.outputfile,
+        data,
+        ["time"] + terms,
+        title="GROMACS Energies",
+        xlabel="Time (ps)",
+        ylabel=ylabel,
+        source="edr2xvg.py from " + args.inputfile,
+    )
+    print("Info -> {} frames of {} terms have been written to {}".format(data.shape[0], len(terms), args.outputfile))
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+## author : charlie
+## date : 20221019
+## usage : interaction energies of many ligands in one run, for MD based
+##     rescoring of a ligand library; the prolig/pro/lig triples are found
+##     by a file name pattern and computed in a process pool without any
+##     plot, then summarized in one table with mean, SD and block error of
+##     every term of every ligand
+## command : python energy_batch.py -p "*/%.xvg" -b 1000 -j 8 -o energy_summary.csv
+
+import os
+import re
+import sys
+import glob
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgtail import RunningStats
+from energy_compute import DERIVED, prepare, stream_energy, parse_derived
+from energy_compute import write_results_header, write_results_rows
+
+PARTS = ["prolig", "pro", "lig"]
+
+
+def find_triples(pattern: str) -> list:
+    """(ligand, [prolig, pro, lig]) of every prolig file matching the pattern
+
+    '%' in the pattern stands for prolig, pro or lig and '*' for the name
+    of the ligand, e.g. '*/%.xvg' for one directory per ligand or
+    '%_*.xvg' for prolig_lig01.xvg, pro_lig01.xvg, lig_lig01.xvg.
+    """
+    if "%" not in pattern or "*" not in pattern:
+        print("ERROR -> the pattern needs both % (prolig, pro, lig) and * (ligand name)")
+        exit()
+    prolig_pattern = pattern.replace("%", "prolig")
+    regex = re.compile(re.escape(prolig_pattern).replace(r"\*", "(.*?)") + "$")
+    triples = []
+    for prolig in sorted(glob.glob(prolig_pattern)):
+        match = regex.match(prolig)
+        if match == None:
+            continue
+        names = iter(match.groups())
+        filled = re.sub(r"\*", lambda _: next(names), pattern)
+        files = [filled.replace("%", part) for part in PARTS]
+        missing = [f for f in files if not os.path.exists(f)]
+        if len(missing) != 0:
+            print("Warning -> skip {}, no {}".format(prolig, ", ".join(missing)))
+            continue
+        triples.append(("_".join(match.groups()), files))
+    return triples
+
+
+class BlockSums:
+    """cumulative sums at every stride rows, for block averages of a stream
+
+    The stride doubles whenever more than 2 * limit marks are kept, so the
+    memory does not grow with the run and the block edges are placed to
+    within 1 / limit of the series.
+    """
+
+    def __init__(self, ncol: int, limit: int = 1000):
+        self.limit = limit
+        self.stride = 1
+        self.count = 0
+        self.total = np.zeros(ncol)
+        self.rows = np.zeros(1, dtype=int)
+        self.sums = np.zeros((1, ncol))
+
+    def add(self, values: np.ndarray) -> None:
+        if values.shape[0] == 0:
+            return
+        sums = self.total + np.cumsum(values, axis=0)
+        rows = self.count + np.arange(1, values.shape[0] + 1)
+        keep = rows % self.stride == 0
+        self.rows = np.append(self.rows, rows[keep])
+        self.sums = np.vstack([self.sums, sums[keep]])
+        self.count, self.total = int(rows[-1]), sums[-1]
+        while self.rows.shape[0] > 2 * self.limit:
+            self.rows, self.sums = self.rows[::2], self.sums[::2]
+            self.stride *= 2
+
+    def error(self, blocks: int) -> np.ndarray:
+        """standard error of the mean from the means of blocks of about equal size"""
+        if blocks < 2 or self.count < blocks:
+            return np.full(self.total.shape[0], np.nan)
+        rows = np.append(self.rows, self.count)
+        sums = np.vstack([self.sums, self.total])
+        wanted = np.arange(blocks + 1) * self.count / blocks
+        index = np.unique(np.abs(rows[:, None] - wanted).argmin(axis=0))
+        means = np.diff(sums[index], axis=0) / np.diff(rows[index])[:, None]
+        return means.std(axis=0, ddof=1) / np.sqrt(means.shape[0])
+
+
+class Summary:
+    """running statistics of the energies, and the series file if asked"""
+
+    def __init__(self, ncol: int, outputfile: str, legends: list, files: list):
+        self.ncol = ncol
+        self.outputfile = outputfile
+        self.legends = legends
+        self.files = files
+        self.fo = None
+
+    def reset(self) -> None:
+        self.stats = RunningStats(self.ncol)
+        self.blocks = BlockSums(self.ncol)
+        if self.outputfile != None:
+            if self.fo != None:
+                self.fo.close()
+            self.fo = open(self.outputfile, "w")
+            write_results_header(self.fo, self.outputfile, ["time"] + self.legends, self.files)
+
+    def add(self, time: np.ndarray, values: np.ndarray) -> None:
+        self.stats.add(values)
+        self.blocks.add(values)
+        if self.fo != None:
+            write_results_rows(self.fo, np.column_stack([time, values]))
+
+    def close(self) -> None:
+        if self.fo != None:
+            self.fo.close()
+
+
+def run_ligand(ligand: str, files: list, begin: float, end: float, derived: list, blocks: int, series: str):
+    """statistics of one ligand, the files are streamed chunk by chunk, None if they do not fit"""
+    summary = None
+    try:
+        prepared = prepare(files, derived)
+        if prepared != None:
+            legends, columns_lis, masks = prepared[3:]
+            outputfile = None
+            if series != None:
+                outputfile = os.path.join(series, "energy_results_" + ligand + ".xvg")
+            summary = Summary(len(legends), outputfile, legends, files)
+            stream_energy(files, columns_lis, masks, summary, begin, end)
+            summary.close()
+    except SystemExit:
+        ## readxvg exits on unreadable files, only this ligand is given up
+        summary = None
+    if summary == None or summary.stats.count == 0:
+        print("Warning -> {} is skipped".format(ligand))
+        return None
+    return (
+        ligand,
+        summary.stats.count,
+        legends,
+        summary.stats.mean,
+        summary.stats.std(),
+        summary.blocks.error(blocks),
+    )
+
+
+def write_summary(outputfile: str, stats: list) -> list:
+    """csv with ligand, frames and mean, SD, error of every term, union of terms"""
+    terms = []
+    for _, _, legends, _, _, _ in stats:
+        terms += [t for t in legends if t not in terms]
+    with open(outputfile, "w") as fo:
+        fo.write("ligand,frames")
+        for t in terms:
+            fo.write(",{0} mean,{0} SD,{0} error".format(t.replace(",", " ")))
+        fo.write("\n")
+        for ligand, frames, legends, mean, sd, err in stats:
+            fo.write("{},{}".format(ligand, frames))
+            for t in terms:
+                if t in legends:
+                    i = legends.index(t)
+                    fo.write(",{:.4f},{:.4f},{:.4f}".format(mean[i], sd[i], err[i]))
+                else:
+                    fo.write(",,,")
+            fo.write("\n")
+    return terms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interaction energies of a ligand library in batch, no plot")
+    parser.add_argument(
+        "-p",
+        "--pattern",
+        default="*/%.xvg",
+        help="file name pattern, %% for prolig/pro/lig, * for ligand name, default */%%.xvg",
+    )
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument("-nb", "--blocks", default=5, type=int, help="blocks of the block averaged error, default 5")
+    parser.add_argument("-d", "--derived", nargs="*", help="more derived sums, eg. -d PAIR14=LJ-14+Coulomb-14")
+    parser.add_argument("-j", "--jobs", default=os.cpu_count(), type=int, help="number of processes, default all cpus")
+    parser.add_argument(
+        "-o", "--outputfile", default="energy_summary.csv", help="summary table, default energy_summary.csv"
+    )
+    parser.add_argument("-s", "--series", help="also write the time series of every ligand into this directory")
+    parser.add_argument(
+        "-sort", default="ETOTAL", help="term to sort the printed ligands by, default ETOTAL"
+    )
+    args = parser.parse_args()
+
+    derived = list(DERIVED)
+    for d in args.derived if args.derived != None else []:
+        derived.append(parse_derived("-d" + d))
+    triples = find_triples(args.pattern)
+    if len(triples) == 0:
+        print("ERROR -> no prolig file matches {}".format(args.pattern.replace("%", "prolig")))
+        exit()
+    print("Info -> {} ligands found by {}".format(len(triples), args.pattern))
+    if args.series != None:
+        os.makedirs(args.series, exist_ok=True)
+
+    jobs = [(ligand, files, args.begin, args.end, derived, args.blocks, args.series) for ligand, files in triples]
+    if args.jobs <= 1 or len(jobs) == 1:
+        stats = [run_ligand(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            stats = list(pool.map(run_ligand, *zip(*jobs)))
+    stats = [s for s in stats if s != None]
+    if len(stats) == 0:
+        print("ERROR -> no ligand could be computed")
+        exit()
+
+    write_summary(args.outputfile, stats)
+    print("Info -> summary of {} ligands has been written to {}".format(len(stats), args.outputfile))
+
+    ## ligands ranked by the chosen term, lowest (strongest) first
+    ranked = [s for s in stats if args.sort in s[2]]
+    ranked.sort(key=lambda s: s[3][s[2].index(args.sort)])
+    print("{:>24} {:>8} {:>14} {:>12} {:>12}".format("ligand", "frames", args.sort + " mean", "SD", "error"))
+    for ligand, frames, legends, mean, sd, err in ranked:
+        i = legends.index(args.sort)
+        print("{:>24} {:>8} {:>14.4f} {:>12.4f} {:>12.4f}".format(ligand[:24], frames, mean[i], sd[i], err[i]))
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
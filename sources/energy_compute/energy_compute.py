@@ -2,27 +2,33 @@
 # author : charlie
 # time : 20200712
 # command : python3 energy_compute.py prolig.xvg pro.xvg lig.xvg -foutput
+#           add '-b1000 -e5000' to compute the data from 1000 to 5000 ps only
 # usage :
 # 用于计算蛋白配体之间的相互作用，计算方法参考Jerkwin博客：
 #     https://jerkwin.github.io/2019/09/06/使用GROMACS计算分子间相互作用/
 # 通过 E = prolig - pro - lig 求得能量
 # 
 # 输入一共需要三个文件：蛋白配体的能量xvg文件，蛋白的能量xvg文件，配体的能量xvg文件
-# 每个输入文件需要包含四列能量数据，用于各项能量以及总库伦势能和总能量的计算
-# 要求四列能量数据的顺序为 
-### LJ-SR  | Disper.corr. | Coulomb-SR | Coul.-recip.
+# 能量项按图例名称匹配（忽略大小写、空格和标点），列的数量和顺序不限，
+# 三个文件共有的能量项都会计算，例如
+### LJ (SR) | Disper. corr. | Coulomb (SR) | Coul. recip. | LJ-14 | Coulomb-14
 # 
-# 生成数据文件的各列名如下
-### LJ-SR  | Disper.corr. | Coulomb-SR | Coul.-recip. | ETOTAL | COULOMB | LJ_total
+# 之后按 DERIVED 的定义求和，默认生成
+### ETOTAL（所有项） | COULOMB（Coul开头的项） | LJ_total（LJ和Disper开头的项）
+# 加 '-dNAME=LJ-14+Coulomb-14' 可以自定义求和项
 # 结果文件 energy_results_output.xvg 可以用 xvgshow.py 可视化
 #################################################
 
 import os
 import sys
+import numpy as np
 import seaborn as sns
 from matplotlib import pyplot as plt
 from matplotlib import pylab as pylab
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg, read_header, pop_time_window, lockstep, memory_join, UnsortedTime
+
 # 绘图控制参数
 myparams = {
     'axes.labelsize': '12',
@@ -36,102 +42,213 @@ pylab.rcParams.update(myparams)
 # matplotlib.style.use('ggplot')
 
 
-def cols_num_gen(cols):
-    for i in range(1, len(cols)+1):
-        yield i
+## derived sums : name and the terms summed into it, matched by term_key,
+## 'coul*' is every term beginning with coul, an empty list sums all terms
+DERIVED = [
+    ("ETOTAL", []),
+    ("COULOMB", ["coul*"]),
+    ("LJ_total", ["lj*", "disper*"]),
+]
+
+
+def term_key(name):
+    """key of an energy term for matching, 'Coul. recip.' -> 'coulrecip'"""
+    return "".join([c for c in name.lower() if c.isalnum()])
+
+
+def match_terms(legends_lis, filename_lis):
+    """columns of the terms found in all files, in the order of the first file"""
+    keys_lis = [[term_key(name) for name in legends[1:]] for legends in legends_lis]
+    names, columns_lis = [], [[] for _ in legends_lis]
+    for i, key in enumerate(keys_lis[0]):
+        if key in keys_lis[0][:i]:
+            print("Warning -> {} appears twice in {}, use the first one".format(
+                legends_lis[0][i + 1], filename_lis[0]))
+            continue
+        missing = [f for f, keys in zip(filename_lis, keys_lis) if key not in keys]
+        if len(missing) != 0:
+            print("Warning -> {} is not in {}, skip it".format(legends_lis[0][i + 1], ", ".join(missing)))
+            continue
+        names.append(legends_lis[0][i + 1])
+        for columns, keys in zip(columns_lis, keys_lis):
+            columns.append(keys.index(key) + 1)
+    return names, columns_lis
+
+
+def part_match(key, part):
+    if part.endswith("*"):
+        return key.startswith(term_key(part))
+    return key == term_key(part)
+
+
+def derived_masks(keys, derived):
+    """boolean matrix of terms x derived sums, which terms go into each sum"""
+    masks = np.zeros((len(keys), len(derived)), dtype=bool)
+    for j, (name, parts) in enumerate(derived):
+        for i, key in enumerate(keys):
+            masks[i, j] = len(parts) == 0 or any([part_match(key, p) for p in parts])
+        if not masks[:, j].any():
+            print("Warning -> no term found for {}, it is 0".format(name))
+    return masks
+
+
+def derived_sums(energy, masks):
+    """one row sum over the selected columns for each derived sum"""
+    if masks.shape[1] == 0:
+        return np.zeros((energy.shape[0], 0))
+    return np.column_stack([energy[:, masks[:, j]].sum(axis=1) for j in range(masks.shape[1])])
+
+
+def parse_derived(option):
+    """-dNAME=term1+term2 -> (NAME, [term1, term2])"""
+    name, _, terms = option[2:].partition("=")
+    if name == "" or terms == "":
+        print("ERROR -> wrong derived sum {}, use -dNAME=term1+term2".format(option))
+        exit()
+    return name, terms.split("+")
+
+
+def interaction(prolig, pro, lig):
+    """E = prolig - pro - lig for all matched terms at once"""
+    return prolig - (pro + lig)
+
+
+def prepare(filename_lis, derived=DERIVED):
+    """headers of the files, matched terms and derived sums
+
+    Returns (title, xlabel, ylabel, legends, columns_lis, masks), None if no
+    term is found in all files.
+    """
+    headers = [read_header(filename) for filename in filename_lis]
+    names, columns_lis = match_terms([header[3] for header in headers], filename_lis)
+    if len(names) == 0:
+        print("Wrong, no energy term found in all of the three files! ")
+        return None
+    keys = [term_key(name) for name in names]
+    masks = derived_masks(keys, derived)
+    legends = names + [name for name, _ in derived]
+    return headers[0][0], headers[0][1], headers[0][2], legends, columns_lis, masks
+
+
+def stream_energy(filename_lis, columns_lis, masks, consumer, begin=None, end=None, chunk=100000):
+    """feed (time, values) chunks of the interaction energies to consumer.add
+
+    The files are merge-joined on time while streaming; if any of them is
+    not in time order, consumer.reset() is called and they are joined in
+    memory instead. Frames not in all of the files are reported.
+    """
+    for join in (lockstep, memory_join):
+        dropped = [0] * len(filename_lis)
+        consumer.reset()
+        try:
+            for time, (prolig, pro, lig) in join(filename_lis, columns_lis, begin, end, chunk, dropped):
+                energy = interaction(prolig, pro, lig)
+                consumer.add(time, np.column_stack([energy, derived_sums(energy, masks)]))
+            break
+        except UnsortedTime as error:
+            print("Info -> time of {} is not in order, join the files in memory".format(error))
+    for filename, num in zip(filename_lis, dropped):
+        if num != 0:
+            print("Warning -> {} frames of {} are dropped, not in all of the files".format(num, filename))
+
+
+class Collect:
+    """keep all chunks, for writing and plotting the whole series"""
+
+    def reset(self):
+        self.chunks = []
+
+    def add(self, time, values):
+        self.chunks.append(np.column_stack([time, values]))
+
+    def result(self, ncol):
+        if len(self.chunks) == 0:
+            return np.zeros((0, ncol + 1))
+        return np.vstack(self.chunks)
+
+
+def compute_energy(filename_lis, begin=None, end=None, derived=DERIVED, chunk=100000):
+    """interaction energies and derived sums from the prolig, pro and lig files
+
+    Returns (title, xlabel, ylabel, time, values, legends), values holds the
+    matched terms then the derived sums. None if the files do not fit.
+    """
+    prepared = prepare(filename_lis, derived)
+    if prepared == None:
+        return None
+    title, xlabel, ylabel, legends, columns_lis, masks = prepared
+    collect = Collect()
+    stream_energy(filename_lis, columns_lis, masks, collect, begin, end, chunk)
+    data = collect.result(len(legends))
+    if data.shape[0] == 0:
+        print("Wrong, no frame found in all of the three files! ")
+        return None
+    return title, xlabel, ylabel, data[:, 0], data[:, 1:], legends
+
+
+def write_results_header(fo, outputfile, legends, filename_lis):
+    fo.write("## " + outputfile + " generated from ")
+    fo.write(filename_lis[0] + ', ' + filename_lis[1] + ' and ' + filename_lis[2] + '\n')
+    fo.write(" " + "".join(["{:>16} ".format(l.replace(' ', '')) for l in legends]) + "\n")
 
 
-def picture_oneplot(title, xlabel, ylabel, data, cols):
-    legend_lis = []
-    for i in cols:
-        legend_lis.append(data[i][0])
-        plt.plot(data[0][1:], data[i][1:])
+def write_results_rows(fo, data):
+    np.savetxt(fo, data, fmt=" " + " ".join(["%16.4f"] * data.shape[1]) + " ")
+
+
+def write_results(outputfile, time, values, legends, filename_lis):
+    """text table with one legend line, read by xvgshow.py and xvg_compare.py"""
+    with open(outputfile, 'w') as fo:
+        write_results_header(fo, outputfile, legends, filename_lis)
+        write_results_rows(fo, np.column_stack([time, values]))
+
+
+def picture_oneplot(title, xlabel, ylabel, time, values, legends):
+    for i in range(values.shape[1]):
+        plt.plot(time, values[:, i])
 
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
-    plt.legend(labels=legend_lis, loc='best').get_frame().set_linewidth(0.0)
+    plt.legend(labels=legends, loc='best').get_frame().set_linewidth(0.0)
     plt.show()
 
 
-def picture_subplot(title, xlabel, ylabel, data, cols):
+def picture_subplot(title, xlabel, ylabel, time, values, legends):
+    num = values.shape[1]
     ylabel_li = ylabel.split(',')
     ylabel_use = []
-    if len(ylabel_li) != len(cols):
-        ylabel_use = [ylabel for i in range(len(cols))]
+    if len(ylabel_li) != num:
+        ylabel_use = [ylabel for i in range(num)]
     else:
         ylabel_use = ylabel_li
 
-    plot_num = cols_num_gen(cols)
-    print("data length -> {}".format(len(data[0]) ))
-    for i in cols:
-        ax = plt.subplot(len(cols), 1, next(plot_num))
-        ax.plot(data[0][1:], data[i][1:])
-        if i == cols[-1]:
+    print("data length -> {}".format(time.shape[0] + 1))
+    for i in range(num):
+        ax = plt.subplot(num, 1, i + 1)
+        ax.plot(time, values[:, i])
+        if i == num - 1:
             plt.xlabel(xlabel)
-        ax.set_ylabel(ylabel_use[i-1])
-        if i != cols[-1]:
+        ax.set_ylabel(ylabel_use[i])
+        if i != num - 1:
             ax.set_xticks([])
-        legend_lis = []
-        legend_lis.append(data[i][0])
-        ax.legend(labels=legend_lis, loc='best').get_frame().set_linewidth(0.0)
-        if i == cols[0]:
+        ax.legend(labels=[legends[i]], loc='best').get_frame().set_linewidth(0.0)
+        if i == 0:
             plt.title(title)
     plt.show()
 
 
-def xvg_deal(filename):
-    with open(filename, 'r') as fo:
-        content = fo.read()
-    line_list = content.strip('\n').split('\n')
-    column_num = len(line_list[-1].split())
-    data = []
-    for i in range(column_num):
-        data.append([])
-    data[0].append('time')
-
-    for line in line_list:
-        if line[0] == "@":
-            if "title" in line:
-                title_line = line.strip('"')
-                if '"' in title_line:
-                    title = title_line.split('"')[-1]
-                else:
-                    title = 'Null'
-            elif "xaxis" in line:
-                xlabel_line = line.strip('"')
-                if '"' in xlabel_line:
-                    xlabel = xlabel_line.split('"')[-1]
-                else:
-                    xlabel = 'Null'
-            elif "yaxis" in line:
-                ylabel_line = line.strip('"')
-                if '"' in ylabel_line:
-                    ylabel = ylabel_line.split('"')[-1]
-                else:
-                    ylabel = 'Null'
-            elif "legend" in line and "@ s" in line:
-                legend = line.strip('"').split('"')[-1]
-                for i in range(1, column_num):
-                    if len(data[i]) == 0:
-                        data[i].append(legend)
-                        break
-
-        elif line[0] != '#' and line[0] != '@':
-            num_list = line.strip().split()
-            for i in range(column_num):
-                if len(data[i]) == 0:
-                    data[i].append('no-legend')
-                data[i].append(float(num_list[i]))
-
-    return title, xlabel, ylabel, data
-
-
 def energy_compute():
+    begin, end, argv = pop_time_window(sys.argv)
+    derived = list(DERIVED)
+    for c in argv[:]:
+        if c[:2] == "-d":
+            derived.append(parse_derived(c))
+            argv.remove(c)
     try:
-        pro_lig_file = sys.argv[1]
-        pro_file = sys.argv[2]
-        lig_file = sys.argv[3]
+        pro_lig_file = argv[1]
+        pro_file = argv[2]
+        lig_file = argv[3]
     except:
         print("No input filename! \n prolig pro lig")
         return 
@@ -139,83 +256,33 @@ def energy_compute():
         filename_output = ""
         plotmode = '-s'
         try:
-            if sys.argv[4] == '-o' or sys.argv[4] == '-s':
-                plotmode = sys.argv[4]
-            elif '-f' in sys.argv[4]:
-                filename_output = sys.argv[4][2:]
+            if argv[4] == '-o' or argv[4] == '-s':
+                plotmode = argv[4]
+            elif '-f' in argv[4]:
+                filename_output = argv[4][2:]
             else:
                 print("wrong plotmode, using '-s' ")
         except:
             pass 
 
-        if os.path.exists(pro_lig_file):
-            pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, pro_lig_data = xvg_deal(pro_lig_file)
-        else:
-            print("pro_lig_file not exists in this directory ")
-            return 
-        if os.path.exists(pro_file):
-            pro_title, pro_xlabel, pro_ylabel, pro_data = xvg_deal(pro_file)
-        else:
-            print("pro_file not exists in this directory ")
-            return 
-        if os.path.exists(lig_file):
-            lig_title, lig_xlabel, lig_ylabel, lig_data = xvg_deal(lig_file)
-        else:
-            print("lig_file not exists in this directory ")
-            return 
-        
-        if len(pro_lig_data) != 5 or len(pro_data) != 5 or len(lig_data) != 5:
-            print( "Wrong, data columns not equal to 5! ")
-            print("Each file must contain 5 columns: ")
-            print("    | LJ-SR | Disper.corr. | Coulomb-SR | Coul.-recip. |" )
+        filename_lis = [pro_lig_file, pro_file, lig_file]
+        for filename, name in zip(filename_lis, ["pro_lig_file", "pro_file", "lig_file"]):
+            if not os.path.exists(filename):
+                print(name + " not exists in this directory ")
+                return 
+        result = compute_energy(filename_lis, begin, end, derived)
+        if result == None:
             return 
+        pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, time, values, legends = result
+
+        outputfile = "energy_results_" + filename_output + ".xvg"
+        write_results(outputfile, time, values, ["time"] + legends, filename_lis)
 
-        final_data = pro_lig_data
-        for i in range(1, len( final_data)):
-            for j in range(1, len(final_data[i])):
-                final_data[i][j] -= pro_data[i][j] + lig_data[i][j]
-                # print(final_data[i][j], pro_data[i][j], lig_data[i][j])
-
-        # ETOTAL
-        final_data.append([0 for x in range(len(final_data[0]))])
-        final_data[-1][0] = "ETOTAL"
-        for j in range(1, len(final_data[0])):
-            for i in range(1, len(final_data)-1):
-                final_data[-1][j] += final_data[i][j]
-
-        # COULOMB
-        final_data.append([0 for x in range(len(final_data[0]))])
-        final_data[-1][0] = "COULOMB"
-        for j in range(1, len(final_data[0])):
-            for i in [ 3, 4 ]: 
-                final_data[-1][j] += final_data[i][j]
-
-        # LJ_total
-        final_data.append([0 for x in range(len(final_data[0]))])
-        final_data[-1][0] = "LJ_total"
-        for j in range(1, len(final_data[0])):
-            for i in [ 1, 2 ]: 
-                final_data[-1][j] += final_data[i][j]
-
-        with open("energy_results_" + filename_output + ".xvg", 'w') as fo:
-            fo.write("## energy_results_" + filename_output + ".xvg generated from ")
-            fo.write(pro_lig_file + ', ' + pro_file + ' and ' + lig_file + '\n')
-            for j in range(len(final_data[0])):
-                line_str = ' '
-                for i in range(len(final_data)):
-                    if j == 0 : # title line
-                        line_str += "{:>16} ".format(
-                            final_data[i][j].replace(' ', '')) 
-                    if j > 0: # for data
-                        line_str += "{:>16.4f} ".format(final_data[i][j])
-                fo.write(line_str + '\n')
-
-        cols = [ i for i in range(1, len(final_data))]
         pro_lig_title += " generated from energy_compute.py "
         if plotmode == '-s':
-            picture_subplot(pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, final_data, cols)
+            picture_subplot(pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, time, values, legends)
         elif plotmode == '-o':
-            picture_oneplot(pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, final_data, cols)
+            picture_oneplot(pro_lig_title, pro_lig_xlabel, pro_lig_ylabel, time, values, legends)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,192 @@
+## author : charlie
+## date : 20221019
+## usage : interaction energy matrix of energy groups, e.g. residue x ligand
+##     or residue x residue, from one edr (or the xvg of gmx energy) of a run
+##     with many energygrps; the pair terms 'Coul-SR:A-B', 'LJ-SR:A-B', ...
+##     are E(A+B) - E(A) - E(B) already, they are gathered into a
+##     frames x terms x pairs array chunk by chunk, summed over the terms
+##     and averaged over time, then written as xpm for xpm_show.py
+## command : python energy_matrix.py -f rerun.edr -y LIG -o energy_matrix.xpm
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg
+from xpmio import writexpm
+
+
+def energy_groups(names: list) -> list:
+    """groups of the self pair terms 'term:A-A', in order of appearance"""
+    groups = []
+    for name in names:
+        term, sep, pair = name.partition(":")
+        half = (len(pair) - 1) // 2
+        if sep != "" and len(pair) % 2 == 1 and pair[half] == "-" and pair[:half] == pair[half + 1 :]:
+            if pair[:half] not in groups:
+                groups.append(pair[:half])
+    return groups
+
+
+def parse_pair(name: str, groups: list) -> tuple:
+    """'Coul-SR:Protein-LIG' -> ('Coul-SR', 'Protein', 'LIG'), None if not a pair of groups"""
+    term, sep, pair = name.partition(":")
+    if sep == "":
+        return None
+    for k in range(len(pair)):
+        if pair[k] == "-" and pair[:k] in groups and pair[k + 1 :] in groups:
+            return term, pair[:k], pair[k + 1 :]
+    return None
+
+
+def pair_index(legends: list, groups: list, xgroups: list, ygroups: list, terms: list) -> tuple:
+    """columns of the pair terms as a terms x pairs index, and the (ix, iy) of each pair
+
+    Pairs are the cells of the x groups against the y groups, A-B and B-A
+    are the same pair. Missing terms point to column -1.
+    """
+    found = {}
+    for c, name in enumerate(legends):
+        parsed = parse_pair(name, groups)
+        if parsed != None:
+            found[parsed] = c
+    if terms == None:
+        terms = []
+        for term, _, _ in found.keys():
+            if term not in terms:
+                terms.append(term)
+    cells, index = [], []
+    for ix, a in enumerate(xgroups):
+        for iy, b in enumerate(ygroups):
+            cols = [found.get((t, a, b), found.get((t, b, a), -1)) for t in terms]
+            if max(cols) < 0:
+                continue
+            cells.append((ix, iy))
+            index.append(cols)
+    return terms, np.array(cells, dtype=int).reshape(-1, 2), np.array(index, dtype=int).reshape(-1, len(terms)).T
+
+
+def average_matrix(inputfile: str, index: np.ndarray, begin: float, end: float, chunk: int) -> tuple:
+    """time average of every term of every pair, (terms x pairs) and frames
+
+    Only the pair columns are read. Each chunk is gathered into a
+    frames x terms x pairs array, missing terms read as 0.
+    """
+    used = sorted(set(index[index >= 0].tolist()))
+    ## position of every column in the chunk, column -1 goes to a zero column
+    position = np.full(max(used) + 2, len(used) + 1)
+    position[used] = np.arange(1, len(used) + 1)
+    gather = position[index]
+    total = np.zeros(index.shape)
+    frames = 0
+    for data in iter_xvg(inputfile, begin, end, used, chunk):
+        padded = np.column_stack([data, np.zeros(data.shape[0])])
+        total += padded[:, gather].sum(axis=0)
+        frames += data.shape[0]
+    return total / max(frames, 1), frames
+
+
+def write_csv(outputfile: str, xgroups: list, ygroups: list, matrix: np.ndarray) -> None:
+    with open(outputfile, "w") as fo:
+        fo.write("group," + ",".join(ygroups) + "\n")
+        for ix, a in enumerate(xgroups):
+            fo.write(a + "," + ",".join(["{:.4f}".format(v) for v in matrix[ix]]) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Interaction energy matrix of energy groups from pair terms, written as xpm"
+    )
+    parser.add_argument("-f", "--inputfile", help="edr file, or xvg of gmx energy with the pair terms")
+    parser.add_argument("-x", "--xgroups", nargs="*", help="groups on x axis, default all but rest")
+    parser.add_argument("-y", "--ygroups", nargs="*", help="groups on y axis, eg. -y LIG, default as x")
+    parser.add_argument(
+        "-t", "--terms", nargs="*", help="terms summed, eg. -t Coul-SR LJ-SR, default all pair terms"
+    )
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument("-diag", action="store_true", help="keep the energies inside each group")
+    parser.add_argument(
+        "-o", "--outputfile", default="energy_matrix.xpm", help="output xpm, default energy_matrix.xpm"
+    )
+    parser.add_argument("-nl", "--nlevels", default=100, type=int, help="number of colors in xpm, default 100")
+    parser.add_argument("-n", "--top", default=10, type=int, help="number of strongest pairs printed, default 10")
+    parser.add_argument("-chunk", default=10000, type=int, help="frames read at once, default 10000")
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your edr or xvg file by -f")
+        exit()
+    if os.path.exists(args.outputfile):
+        print("ERROR -> {} already exists".format(args.outputfile))
+        exit()
+    legends = read_header(args.inputfile)[3]
+    groups = energy_groups(legends)
+    if len(groups) == 0:
+        print("ERROR -> no energy group pair term like 'Coul-SR:A-A' in {}".format(args.inputfile))
+        exit()
+    xgroups = args.xgroups if args.xgroups != None else [g for g in groups if g != "rest"]
+    ygroups = args.ygroups if args.ygroups != None else xgroups
+    for g in xgroups + ygroups:
+        if g not in groups:
+            print("ERROR -> no group {}, groups are {}".format(g, " ".join(groups)))
+            exit()
+
+    terms, cells, index = pair_index(legends, groups, xgroups, ygroups, args.terms)
+    if cells.shape[0] == 0:
+        print("ERROR -> no pair term of the groups found")
+        exit()
+    print("Info -> {} x {} groups, terms : {}".format(len(xgroups), len(ygroups), " + ".join(terms)))
+    means, frames = average_matrix(args.inputfile, index, args.begin, args.end, args.chunk)
+    if frames == 0:
+        print("ERROR -> no frame found in {}".format(args.inputfile))
+        exit()
+
+    matrix = np.zeros((len(xgroups), len(ygroups)))
+    matrix[cells[:, 0], cells[:, 1]] = means.sum(axis=0)
+    if not args.diag:
+        for ix, a in enumerate(xgroups):
+            if a in ygroups:
+                matrix[ix, ygroups.index(a)] = 0.0
+
+    writexpm(
+        args.outputfile,
+        matrix,
+        np.arange(1, len(xgroups) + 1),
+        np.arange(1, len(ygroups) + 1),
+        title="Interaction energy",
+        legend="E (kJ/mol)",
+        xlabel="group",
+        ylabel="group",
+        levels=args.nlevels,
+        low_color="#0000FF",
+        high_color="#FFFFFF",
+        source="energy_matrix.py from " + args.inputfile,
+    )
+    csvfile = os.path.splitext(args.outputfile)[0] + ".csv"
+    write_csv(csvfile, xgroups, ygroups, matrix)
+    print("Info -> average of {} frames written to {} and {}".format(frames, args.outputfile, csvfile))
+    print("Info -> axis number : group, x : {}".format(" ".join(["{}:{}".format(i + 1, g) for i, g in enumerate(xgroups)])))
+    if ygroups != xgroups:
+        print("Info -> axis number : group, y : {}".format(" ".join(["{}:{}".format(i + 1, g) for i, g in enumerate(ygroups)])))
+
+    ## strongest pairs, each pair once when both axes are the same groups
+    order = np.argsort(matrix, axis=None)
+    print("{:>16} {:>16} {:>14}".format("x group", "y group", "E (kJ/mol)"))
+    shown = []
+    for k in order:
+        ix, iy = np.unravel_index(k, matrix.shape)
+        pair = tuple(sorted([xgroups[ix], ygroups[iy]]))
+        if matrix[ix, iy] == 0.0 or pair in shown:
+            continue
+        shown.append(pair)
+        print("{:>16} {:>16} {:>14.4f}".format(xgroups[ix], ygroups[iy], matrix[ix, iy]))
+        if len(shown) == args.top:
+            break
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
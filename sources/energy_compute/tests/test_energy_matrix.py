@@ -0,0 +1,54 @@
+## author : charlie
+## date : 20221019
+## usage : python -m pytest sources/energy_compute/tests
+##     irregular.edr (in common/tests/data) is an energy file written by
+##     GROMACS with the energy groups water, DPPC, DUPC, CHOL and HCO, and
+##     irregular.xvg all its terms written by `gmx energy`
+
+import os
+import sys
+import subprocess
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "..", "energy_matrix.py")
+DATA = os.path.join(HERE, "..", "..", "common", "tests", "data")
+
+
+def read_csv(csvfile: str) -> tuple:
+    with open(csvfile) as fo:
+        lines = [line.strip().split(",") for line in fo]
+    return lines[0][1:], [line[0] for line in lines[1:]], np.array([line[1:] for line in lines[1:]], dtype=float)
+
+
+def gmx_energy_pairs() -> dict:
+    """time average of Coul-SR + LJ-SR of every group pair, from the xvg of gmx energy"""
+    xvgfile = os.path.join(DATA, "irregular.xvg")
+    legends = [line.split('"')[1] for line in open(xvgfile) if line.startswith("@ s")]
+    data = np.loadtxt(xvgfile, comments=["#", "@"])
+    pairs = {}
+    for c, name in enumerate(legends):
+        term, _, pair = name.partition(":")
+        if term in ("Coul-SR", "LJ-SR"):
+            pairs[pair] = pairs.get(pair, 0.0) + data[:, c + 1].mean()
+    return pairs
+
+
+@pytest.mark.parametrize("name", ["irregular.edr", "irregular.xvg"])
+def test_matrix_matches_gmx_energy(name, tmp_path):
+    env = dict(os.environ, XVG_CACHE="0")
+    subprocess.run(
+        [sys.executable, SCRIPT, "-f", os.path.join(DATA, name), "-diag", "-o", str(tmp_path / "m.xpm")],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        env=env,
+    )
+    ygroups, xgroups, matrix = read_csv(str(tmp_path / "m.csv"))
+    assert xgroups == ["water", "DPPC", "DUPC", "CHOL", "HCO"] and ygroups == xgroups
+    pairs = gmx_energy_pairs()
+    for ix, a in enumerate(xgroups):
+        for iy, b in enumerate(ygroups):
+            expected = pairs.get("{}-{}".format(a, b), pairs.get("{}-{}".format(b, a)))
+            ## the csv keeps 4 decimals, gmx energy 6 significant digits
+            assert matrix[ix, iy] == pytest.approx(expected, rel=1e-5, abs=1e-3)
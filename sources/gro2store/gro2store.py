@@ -0,0 +1,83 @@
+## author : charlie
+## date : 20221019
+## usage : convert a text gro trajectory into a binary coordinate store
+##     once, the gro tools then read md.store in place of md.gro and slice
+##     frames and atoms from memory-mapped arrays instead of parsing text
+## command : python gro2store.py -f md.gro -o md.store -skip 10
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import resolve
+from groio import GroReader, frame_index, select_frames, add_frame_arguments, iter_gro_chunks
+from coordstore import is_store, topology_from_lines, StoreWriter
+
+
+def store_name(grofile: str) -> str:
+    """md.gro, md.gro.gz -> md.store"""
+    name = os.path.basename(grofile)
+    for suffix in (".gz", ".bz2", ".xz", ".gro"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return os.path.join(os.path.dirname(grofile), name + ".store")
+
+
+def read_topology(grofile: str) -> np.ndarray:
+    """resid, resname and atomname of all atoms, from the first frame"""
+    with GroReader(grofile) as reader:
+        if reader.read_frame() == None:
+            print("ERROR -> no frame found in {}".format(grofile))
+            exit()
+        return topology_from_lines(reader.lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert gro trajectory into a memory-mapped coordinate store")
+    parser.add_argument("-f", "--inputfile", help="input your gro file, or gro.gz")
+    parser.add_argument("-o", "--outputfile", help="output store directory, default md.store for md.gro")
+    parser.add_argument("-chunk", type=int, default=1000, help="frames converted at a time, default 1000")
+    add_frame_arguments(parser)
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your gro file by -f")
+        exit()
+    grofile = resolve(args.inputfile)
+    if not os.path.exists(grofile):
+        print("ERROR -> no {} in current directory".format(args.inputfile))
+        exit()
+    if is_store(grofile):
+        print("ERROR -> {} is a coordinate store already".format(grofile))
+        exit()
+    outputfile = args.outputfile if args.outputfile != None else store_name(grofile)
+
+    index = frame_index(grofile)
+    if index["natoms"].shape[0] == 0:
+        print("ERROR -> no frame found in {}".format(grofile))
+        exit()
+    if np.any(index["natoms"] != index["natoms"][0]):
+        print("ERROR -> frames of {} have different numbers of atoms".format(grofile))
+        exit()
+    frames = select_frames(index, args.begin, args.end, args.skip, args.frame)
+    if frames.shape[0] == 0:
+        print("ERROR -> no frame of {} selected by -begin, -end and -skip".format(grofile))
+        exit()
+
+    topology = read_topology(grofile)
+    writer = StoreWriter(outputfile, frames.shape[0], topology, source=os.path.basename(grofile))
+    try:
+        for times, coords, boxes in iter_gro_chunks(grofile, chunk=args.chunk, frames=frames):
+            writer.add(times, coords, boxes)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    print("Info -> {} frames of {} atoms have been written to {}".format(frames.shape[0], topology.shape[0], outputfile))
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 # author: charlie
 
 import os
+import sys
 import subprocess
 import xml.etree.ElementTree as ET
 from matplotlib import pyplot as plt
 import seaborn as sns
 sns.set_style("darkgrid")
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen, resolve
+
 
 def write_logfile(line):
 	with open("analysis_deep.runlog", 'a') as fo:
@@ -40,13 +44,13 @@ def data_dump(lis_data, filename):
 def make_complex(protein_file, ligand_list):
 	complex_files = []
 	for ligand_file in ligand_list:
-		with open(ligand_file, 'r') as fo:
+		with zopen(resolve(ligand_file)) as fo:
 			contents = fo.read()
 		ligand_content = []
 		for line in contents.strip().split('\n'):
 			if line[:4] == 'ATOM':
 				ligand_content.append(line)
-		with open(protein_file, 'r') as fo:
+		with zopen(resolve(protein_file)) as fo:
 			protein_content = fo.read()
 		complex_content = protein_content + '\n' + '\n'.join(ligand_content)
 		complex_file = 'complex_' + ligand_file
@@ -1,8 +1,12 @@
 # author : charlie
 
 import os
+import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen
+
 
 def write_aminos_log(line):
     with open("bond_per_amino.aminolog", 'a') as fo:
@@ -15,7 +19,7 @@ def write_ligands_log(line):
 
 
 def load_data(filename):
-    with open(filename, 'r') as fo:
+    with zopen(filename) as fo:
         file_content = fo.read()
     data = []
     file_lines = file_content.strip().strip('\n').split('\n')
@@ -1,9 +1,13 @@
 # author : charlie
 
 import os 
+import sys
 import time
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen, resolve
+
 
 def write_aminos_log(line):
 	with open("bond_per_amino.aminolog", 'a') as fo:
@@ -16,7 +20,7 @@ def write_ligands_log(line):
 
 
 def load_data(filename):
-	with open(filename, 'r') as fo:
+	with zopen(resolve(filename)) as fo:
 		file_content = fo.read()
 	data = []
 	file_lines = file_content.strip().strip('\n').split('\n')
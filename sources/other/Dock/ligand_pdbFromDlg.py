@@ -2,8 +2,12 @@
 
 import os
 import re
+import sys
 import subprocess
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen, resolve
+
 
 def fetch_EFEB(ligand):
 	energy = re.findall(r"Estimated Free Energy of Binding    =.*?kcal/mol  \[=", ligand )
@@ -51,11 +55,23 @@ def write_pdb(content, num):
 	print("done")
 
 
+def dlg2pdbqt(dlgfile, pdbqtfile):
+	# keep the DOCKED lines without 'DOCKED: ', as grep '^DOCKED' | cut -c9-
+	# dock.dlg.gz, .bz2 or .xz is read directly
+	with zopen(dlgfile) as fo, open(pdbqtfile, 'w') as fw:
+		for line in fo:
+			if line.startswith('DOCKED'):
+				fw.write(line[8:])
+
+
 def main():
 	# convert dlg to pdbqt
-	status, output = subprocess.getstatusoutput("grep '^DOCKED' dock.dlg | cut -c9- > results_dock.pdbqt")
-	print("converting dlg to pdbqt : " + str(status))
-	print(output)
+	dlgfile = resolve('dock.dlg')
+	if not os.path.exists(dlgfile):
+		print("no dock.dlg in current directory")
+		exit()
+	dlg2pdbqt(dlgfile, 'results_dock.pdbqt')
+	print("converting " + dlgfile + " to pdbqt : done")
 	
 	with open('results_dock.pdbqt', 'r') as fo:
 	    content = fo.read()
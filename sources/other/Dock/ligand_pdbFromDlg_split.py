@@ -2,8 +2,12 @@
 
 import os
 import re
+import sys
 import subprocess
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen, resolve
+
 
 def fetch_EFEB(ligand):
 	energy = re.findall(r"Estimated Free Energy of Binding    =   .*?kcal/mol  \[=", ligand )
@@ -48,7 +52,7 @@ def write_pdb(content, num):
 
 
 def main():
-	with open('results_dock.pdbqt', 'r') as fo:
+	with zopen(resolve('results_dock.pdbqt')) as fo:
 	    content = fo.read()
 	    
 	models = re.findall(r"ENETIC ALGORITHM DOCKED STATE[\s\S]*?ENDMDL", content)
@@ -2,8 +2,12 @@
 # roc test 
 
 import os
+import sys
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen
+
 
 def y():
 	for i in range(1000):
@@ -19,7 +23,7 @@ roc_dic = {}
 yie = y()
 for filename in os.listdir():
 	if '.log' in filename and filename[0] == 't':
-		with open(filename, 'r') as fo:
+		with zopen(filename) as fo:
 			content = fo.read()
 		lines = content.strip().split('\n')
 		for i in range(-10, -1):
@@ -28,7 +32,7 @@ for filename in os.listdir():
 			p += 1
 
 	elif '.log' in filename and filename[0] == 'f':
-		with open(filename, 'r') as fo:
+		with zopen(filename) as fo:
 			content = fo.read()
 		lines = content.strip().split('\n')
 		for i in range(-10, -1):
@@ -7,9 +7,13 @@ from matplotlib.ticker import LinearLocator, FormatStrFormatter
 import numpy as np
 import matplotlib.mlab as mlab
 from matplotlib import pylab as pylab
+import os
 import sys
 from scipy import interpolate
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import zopen
+
 
 myparams = {
 	'axes.labelsize': '12',
@@ -25,7 +29,7 @@ pylab.rcParams.update(myparams)
 
 
 def getdata(filename):
-	with open(filename, 'r') as fo:
+	with zopen(filename) as fo:
 		content = fo.read()
 
 	x, y, z = [], [], []
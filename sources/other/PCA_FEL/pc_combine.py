@@ -1,14 +1,65 @@
 # author : charlie
 # date : 20210904
+# usage : combine pc1.xvg and pc2.xvg into the input of gmx sham
+#     add '-ppc12.png' to draw PC1 against PC2 as a density scatter, frames are
+#     counted into pixels, fast and small picture for millions of frames
 
 import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from xvgio import pop_time_window
+from zopen import zopen
+
+DPI = 300
+
+
+def read_pc(file, begin, end):
+    data = []
+    with zopen(file) as fo:
+        for li in fo:
+            li = li.strip()
+            if li == "" or li[0] == '@' or li[0] == '&' or li[0] == '#':
+                continue
+            items = li.split()
+            # stop reading once later than -e
+            if end != None and float(items[0]) > end:
+                break
+            if begin != None and float(items[0]) < begin:
+                continue
+            data.append(items)
+    return data
+
+
+def scatter_png(pairs, pngfile):
+    # numpy and matplotlib are only needed for -p
+    import numpy as np
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    from raster import density_scatter
+    values = np.array(pairs, dtype=float).reshape(-1, 2)
+    x, y = values[:, 0], values[:, 1]
+    fig, ax = plt.subplots()
+    # one pixel of the image for each pixel of the saved png
+    image = density_scatter(ax, x, y, dpi=DPI)
+    fig.colorbar(image, ax=ax, label="frames")
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    plt.savefig(pngfile, dpi=DPI)
+    print("density scatter has been saved to {}".format(pngfile))
+
+
 def main():
     file1, file2, outfile = "", "", ""
-    cmd = sys.argv[1:]
+    begin, end, cmd = pop_time_window(sys.argv[1:])
+    pngfile = ""
+    for c in cmd[:]:
+        if c[:2] == "-p":
+            pngfile = c[2:]
+            cmd.remove(c)
     if len(cmd) == 0 : 
-        print(" Usage : pc_combine.py pc1 pc2 output-file ")
+        print(" Usage : pc_combine.py pc1 pc2 output-file -b -e -ppc12.png ")
         exit()
     elif len(cmd) == 3:
         file1 = cmd[0]
@@ -18,25 +69,23 @@ def main():
         print("wrong input, check it")
         exit()
     # deal with file 
-    with open(file1, 'r') as fo:
-        content1 = fo.read()
-    with open(file2, 'r') as fo:
-        content2 = fo.read()
-    lines1 = content1.strip().strip("\n").split("\n")
-    lines2 = content2.strip().strip("\n").split("\n")
-    data1 = [li.strip().split() for li in lines1 if li[0] != '@' and li[0] != '&' and li[0] != '#']
-    data2 = [li.strip().split() for li in lines2 if li[0] != '@' and li[0] != '&' and li[0] != '#']
+    data1 = read_pc(file1, begin, end)
+    data2 = read_pc(file2, begin, end)
     # print(data1)
     # print(data2)
     output = ""
+    pairs = []
     if len(data1) != len(data2):
         print("wrong length of data1 and data2, check it ")
         exit()
     for i in range(len(data1)):
         if float(data1[i][0]) == float(data2[i][0]):
             output += "{:16} {:16} {:16} \n".format(data1[i][0], data1[i][1], data2[i][1])
+            pairs.append((data1[i][1], data2[i][1]))
     with open(outfile, "w") as fo:
         fo.write(output)
+    if pngfile != "":
+        scatter_png(pairs, pngfile)
     print("done")
 
 
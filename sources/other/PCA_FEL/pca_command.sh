@@ -21,6 +21,7 @@ gmx anaeig -s pro.tpr -f pro_combine.xtc -v eigenvectors.trr -first 3 -last 3 -p
 python pc_combine.py pc1.xvg pc2.xvg pc12_sham.xvg
 python pc_combine.py pc1.xvg pc3.xvg pc13_sham.xvg
 
+# or without gmx sham : python ../../xvg_fes/xvg_fes.py -f pc1.xvg -fy pc2.xvg -t 310 -nl 100 -o pc12_gibbs.xpm
 gmx sham -tsham 310 -nlevels 100 -f pc12_sham.xvg -ls pc12_gibbs.xpm -g pc_12.log -lsh pc12_enthalpy.xpm -lss pc12_entropy.xpm
 mv bindex.ndx pc12_bindex.ndx
 mv prob.xpm pc12_prob.xpm
@@ -5,12 +5,16 @@ import getopt
 import time
 import os
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from zopen import zopen, resolve
+
 
 def readpdb(inputfile):
-    if inputfile not in os.listdir():
+    inputfile = resolve(inputfile)
+    if not os.path.isfile(inputfile):
         print('Error => {} is not in this directory !'.format(inputfile))
         sys.exit(0)
-    with open(inputfile, 'r', encoding='utf-8') as fo:
+    with zopen(inputfile, encoding='utf-8') as fo:
         content = fo.read()
     return content
 
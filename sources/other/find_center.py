@@ -1,41 +1,42 @@
-# 读入npt.gro 
-with open("npt.gro", "r") as fo:
-    lines = fo.readlines()
-# 定义几何中心的变量
-center_X = 0 
-center_Y = 0
-center_Z = 0 
-# 遍历每一个蛋白的原子，计算几何中心
-pro_start=3
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import resolve
+from groio import open_gro, frame_index, add_frame_arguments, frames_from_args
+
+parser = argparse.ArgumentParser(description="寻找离蛋白几何中心最近的原子")
+# 默认读入npt.gro，也可以是压缩的npt.gro.gz、gmx trjconv导出的多帧轨迹，或者gro2store.py转换的npt.store
+parser.add_argument("-f", default="npt.gro", help="gro file, default npt.gro")
+add_frame_arguments(parser)
+args = parser.parse_args()
+gro_file = resolve(args.f)
+
+# 蛋白原子的范围：第pro_start行开始的pro_num个原子
+pro_start = 3
 pro_num = 5700
-# 因为python计数从0开始，所以这里pro_start-1
-for line in lines[pro_start-1:pro_start+pro_num-1]:
-    # 按空格对每一行进行切分
-    items = line[20:44].split()
-    # 蛋白原子的坐标在第4、5、6列
-    center_X += float(items[0])
-    center_Y += float(items[1])
-    center_Z += float(items[2])
-# 计算几何中心的坐标
-center_X = center_X/pro_num
-center_Y = center_Y/pro_num
-center_Z = center_Z/pro_num
-# 定义变量存储寻找到的最近原子的信息
-# atom_info记录寻找到的原子序号
-atom_info = ""
-# dist记录寻找到的原子与几何中心的距离
-dist = 10
-# 再遍历一遍原子，寻找离几何中心最近的原子
-for line in lines[pro_start-1:pro_start+pro_num-1]:
-    items = line[20:44].split()
-    x = float(items[0])
-    y = float(items[1])
-    z = float(items[2])
-    # 计算距离，小于dist就刷新atom_info和dist
-    atom_center_dist = ((x-center_X)**2 + (y-center_Y)**2 + (z-center_Z)**2 )**0.5
-    if atom_center_dist < dist:
-        dist = atom_center_dist
-        # 记录此原子信息
-        atom_info = line
-# 输出中心原子的信息
-print(atom_info)
+# 原子行前面有标题行和原子数行两行，所以第一个蛋白原子的序号是pro_start-3（从0计数）
+atoms = np.arange(pro_start - 3, pro_start - 3 + pro_num)
+
+# 默认只算第一帧；用-begin/-end/-skip选帧时，通过帧索引直接跳到这些帧
+frames = frames_from_args(gro_file, args)
+
+with open_gro(gro_file, atoms) as reader:
+    if frames is None:
+        offsets, frames = [0], [0]
+    else:
+        offsets = frame_index(gro_file)["offsets"]
+    for frame in frames:
+        reader.seek_frame(offsets[frame])
+        time, coords, _ = reader.read_frame()
+        # 蛋白所有原子坐标的平均值即为几何中心
+        center = coords.mean(axis=0)
+        # 计算每个原子到几何中心的距离，寻找最近的原子
+        dist = np.sqrt(((coords - center) ** 2).sum(axis=1))
+        nearest = dist.argmin()
+        # 输出中心原子的信息（多帧时先输出时间）
+        if len(frames) > 1:
+            print("t = {} ps".format(time))
+        print(reader.lines[nearest].decode().rstrip())
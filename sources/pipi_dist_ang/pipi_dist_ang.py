@@ -2,9 +2,14 @@
 # date : 20211129
 
 import os
+import sys
 import math
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import zopen
+from groio import read_gro, add_frame_arguments, frames_from_args
+
 
 def calcDist(ring_1_frames, ring_2_frames):
     """calculate the distance between the center of two ring"""
@@ -110,55 +115,20 @@ def calcAng(ring_1_frames, ring_2_frames):
     return angles
 
 
-def getCoor(gro_file, ring_1_id, ring_2_id):
+def getCoor(gro_file, ring_1_id, ring_2_id, frames=None):
     """get che coordinates from gro file"""
 
-    with open(gro_file, "r") as fo:
-        lines = fo.readlines()
-
-    frames = []
-    atom_lines = []
-    for line in lines:
-        ## not the atom line, judged by length of line
-        if len(line) != 45 and len(line) != 69:
-            ## use number line as frames split anchor
-            if len(line.strip().split()) == 1:
-                if len(atom_lines) != 0:
-                    frames.append(atom_lines)
-                atom_lines = []
-        ## add atom line
-        elif len(line) == 45 or len(line) == 69:
-            if len(line[20:44].split()) == 3:
-                atom_lines.append(line.rstrip())
-    ## add the last frame
-    if len(atom_lines) != 0:
-        frames.append(atom_lines)
-
-    ## read the atom coor
-    ring_1_frames = []
-    ring_2_frames = []
-    for frame in frames:
-        ring_1_coor = []
-        ring_2_coor = []
-        ## add atom coor by atom id
-        for line in frame:
-            if int(line[15:20]) in ring_1_id:
-                ring_1_coor.append(
-                    [float(line[20:28]), float(line[28:36]), float(line[36:44])]
-                )
-            if int(line[15:20]) in ring_2_id:
-                ring_2_coor.append(
-                    [float(line[20:28]), float(line[28:36]), float(line[36:44])]
-                )
-        ## check atom coor and atom id length
-        if len(ring_1_coor) != len(ring_1_id) or len(ring_2_coor) != len(ring_2_id):
-            print("Error -> shit happens when reading coordinates of ring")
-            exit()
-        ring_1_frames.append(ring_1_coor)
-        ring_2_frames.append(ring_2_coor)
-
-    ## new a time sequence
-    time = [i for i in range(len(frames))]
+    ## only the lines of the ring atoms are read from each frame, in the
+    ## order of the gro file, the other atoms are skipped by offset
+    ring_1_atoms = [i - 1 for i in sorted(ring_1_id)]
+    ring_2_atoms = [i - 1 for i in sorted(ring_2_id)]
+    _, coords, _ = read_gro(gro_file, ring_1_atoms + ring_2_atoms, frames)
+    ring_1_frames = coords[:, :len(ring_1_atoms)].tolist()
+    ring_2_frames = coords[:, len(ring_1_atoms):].tolist()
+    ## new a time sequence, numbers of the frames read
+    if frames is None:
+        frames = range(coords.shape[0])
+    time = [i for i in frames]
 
     return time, ring_1_frames, ring_2_frames
 
@@ -166,7 +136,7 @@ def getCoor(gro_file, ring_1_id, ring_2_id):
 def dealNdx(ndx_file):
     """read index file and get atom id"""
 
-    with open(ndx_file, "r") as fo:
+    with zopen(ndx_file) as fo:
         content = fo.read()
     ## read in each group
     ndx_dic = {}
@@ -212,6 +182,7 @@ def main():
     parser.add_argument(
         "-o", default="output.xvg", help="the results data, default output.xvg"
     )
+    add_frame_arguments(parser)
     args = parser.parse_args()
 
     ndx_file = args.n
@@ -241,7 +212,11 @@ def main():
         exit()
 
     ## get the coordinates of two rings
-    time, ring_1_frames, ring_2_frames = getCoor(gro_file, ring_1_id, ring_2_id)
+    ## frames by -begin, -end and -skip, from the frame index of gro file
+    frames = frames_from_args(gro_file, args)
+    time, ring_1_frames, ring_2_frames = getCoor(
+        gro_file, ring_1_id, ring_2_id, frames
+    )
     ## modify the time sequence
     time = [t * args.dt + args.b for t in time]
     # print(len(time), len(ring_1_frames), len(ring_2_frames))
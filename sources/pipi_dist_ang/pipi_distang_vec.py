@@ -2,130 +2,53 @@
 # date : 20211129
 
 import os
-import math
+import sys
 import argparse
+import functools
+import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import zopen
+from groio import map_frames, add_frame_arguments, frames_from_args
+from geometry import centroids, distances, plane_normals, mean_bond_vectors, vector_angles
 
-def calcDist(ring_1_frames, ring_2_frames):
-    ## check the frames of two ring
-    if len(ring_1_frames) != len(ring_2_frames):
-        print("Error -> length of frames of coordinates isn't equal")
-        exit()
-    ## calculate the distance between two ring
-    distance = []
-    for i in range(len(ring_1_frames)):
-        ring_1_coor = ring_1_frames[i]
-        ring_2_coor = ring_2_frames[i]
-        ring_1_atom_num = len(ring_1_coor)*1.0
-        ring_2_atom_num = len(ring_2_coor)*1.0
-        ## calculate the center of two ring
-        ring_1_center = [ sum([coor[0] for coor in ring_1_coor]) / ring_1_atom_num, 
-                sum([coor[1] for coor in ring_1_coor ]) / ring_1_atom_num,
-                sum([coor[2] for coor in ring_1_coor ]) / ring_1_atom_num ]
-        ring_2_center = [ sum([coor[0] for coor in ring_2_coor]) / ring_2_atom_num, 
-                sum([coor[1] for coor in ring_2_coor ]) / ring_2_atom_num,
-                sum([coor[2] for coor in ring_2_coor ]) / ring_2_atom_num ]
-        ## calculate the distance
-        dist = ((ring_1_center[0] - ring_2_center[0])**2 + 
-                (ring_1_center[1] - ring_2_center[1])**2 + 
-                (ring_1_center[2] - ring_2_center[2])**2 )**0.5
-        distance.append(dist)
-
-    return distance
-
-
-def calcAng(ring_1_frames, ring_2_frames):
-    ## check the frames of two ring
-    if len(ring_1_frames) != len(ring_2_frames):
-        print("Error -> length of frames of coordinates isn't equal")
-        exit()
-    ## calculate the angles
-    angles = []
-    for i in range(len(ring_1_frames)):
-        ring_1_coor = ring_1_frames[i]
-        ring_2_coor = ring_2_frames[i]
-        ## p1 = [ a1, a2, a3 ], p2 = [ b1, b2, b3 ]
-        ## p1xp2 = [ a2b3 - a3b2, a3b1 - a1b3, a1b2 - a2b1 ]
-        ## calculate the plane normal of ring 1 by cross product
-        r1_p1 = [ ring_1_coor[2][0] - ring_1_coor[0][0], 
-                ring_1_coor[2][1] - ring_1_coor[0][1],
-                ring_1_coor[2][2] - ring_1_coor[0][2]]
-        r1_p2 = [ ring_1_coor[4][0] - ring_1_coor[0][0], 
-                ring_1_coor[4][1] - ring_1_coor[0][1],
-                ring_1_coor[4][2] - ring_1_coor[0][2]]
-        r1_xProd = [ r1_p1[1]*r1_p2[2] - r1_p1[2]*r1_p2[1], 
-                r1_p1[2]*r1_p2[0] - r1_p1[0]*r1_p2[2], 
-                r1_p1[0]*r1_p2[1] - r1_p1[1]*r1_p2[0] ] 
-        ## calculate the plane normal of ring 2 by cross product
-        r2_p1 = [ ring_2_coor[2][0] - ring_2_coor[0][0], 
-                ring_2_coor[2][1] - ring_2_coor[0][1],
-                ring_2_coor[2][2] - ring_2_coor[0][2]]
-        r2_p2 = [ ring_2_coor[4][0] - ring_2_coor[0][0], 
-                ring_2_coor[4][1] - ring_2_coor[0][1],
-                ring_2_coor[4][2] - ring_2_coor[0][2]]
-        r2_xProd = [ r2_p1[1]*r2_p2[2] - r2_p1[2]*r2_p2[1], 
-                r2_p1[2]*r2_p2[0] - r2_p1[0]*r2_p2[2], 
-                r2_p1[0]*r2_p2[1] - r2_p1[1]*r2_p2[0] ] 
-        ## calc the degree 
-        dotProduct = r1_xProd[0] * r2_xProd[0] + r1_xProd[1] * r2_xProd[1]
-        dotProduct += r1_xProd[2] * r2_xProd[2]
-        r1_xProd_norm = (r1_xProd[0]**2 + r1_xProd[1]**2 + r1_xProd[2]**2)**0.5
-        r2_xProd_norm = (r2_xProd[0]**2 + r2_xProd[1]**2 + r2_xProd[2]**2)**0.5
-        cos_degree = dotProduct / (r1_xProd_norm * r2_xProd_norm)
-        degree = math.acos(cos_degree) * 180 / math.pi 
-        if degree > 90 :
-            degree = 180 - degree
-        angles.append(degree)
-
-    return angles
-
-
-def getCoor(gro_file, ring_1_id, ring_2_id):
-    with open(gro_file, "r") as fo: 
-        lines = fo.readlines()
-    frames = []
-    atom_lines = []
-    for line in lines:
-        ## not the atom line, judged by length of line
-        if len(line) != 45 and len(line) != 69:
-            # number line
-            if len(line.strip().split()) == 1:
-                if len(atom_lines) != 0:
-                    frames.append(atom_lines)
-                atom_lines = []
-        elif len(line) == 45 or len(line) == 69:
-            # suit for atom number < 10000
-            if len(line[20:44].split()) == 3 and len(line[15:44].split()) == 4:
-                atom_lines.append(line.rstrip())
-    ## add the last frame
-    if len(atom_lines) != 0:
-        frames.append(atom_lines)
-    ## read the atom coor
-    ring_1_frames = []
-    ring_2_frames = []
-    for frame in frames:
-        ring_1_coor = []
-        ring_2_coor = []
-        for line in frame:
-            if int(line[15:20]) in ring_1_id:
-                ring_1_coor.append([
-                    float(line[20:28]), float(line[28:36]), float(line[36:44]) ])
-            if int(line[15:20]) in ring_2_id:
-                ring_2_coor.append([
-                    float(line[20:28]), float(line[28:36]), float(line[36:44]) ])
-        if len(ring_1_coor) != len(ring_1_id) or len(ring_2_coor) != len(ring_2_id):
-            print("Error -> shit happens when reading coordinates of ring")
-            exit()
-        ring_1_frames.append(ring_1_coor)
-        ring_2_frames.append(ring_2_coor)
-    ## new a time sequence
-    time = [ i for i in range(len(frames)) ]            
 
-    return time, ring_1_frames, ring_2_frames
+def calcFrames(gro_file, group_1_id, group_2_id, kernel, frames=None, nt=1):
+    ## only the lines of the atoms of two groups are read from each frame, in
+    ## the order of the gro file, the other atoms are skipped by offset;
+    ## kernel gets the (frames, atoms, 3) coordinates of group 1 then group 2
+    ## chunk by chunk, in nt processes if nt > 1
+    atoms = [ i - 1 for i in sorted(group_1_id) + sorted(group_2_id) ]
+    numbers, results = map_frames(gro_file, atoms, kernel, frames, nt)
+    ## new a time sequence, numbers of the frames read
+    time = [ i for i in numbers ]
+
+    return time, results
+
+
+def ringPair(ring_1_num, coords):
+    ## distance between the centers and angle between the normals of two rings
+    ring_1_frames = coords[:, :ring_1_num]
+    ring_2_frames = coords[:, ring_1_num:]
+    distance = distances(centroids(ring_1_frames), centroids(ring_2_frames))
+    angles = vector_angles(plane_normals(ring_1_frames), plane_normals(ring_2_frames))
+    return np.column_stack([distance, angles])
+
+
+def ringVG(ring_num, coords):
+    ## angle between the ring normal and the mean vector of the vector group
+    ring_frames = coords[:, :ring_num]
+    vg_vec_frames = mean_bond_vectors(coords[:, ring_num:])
+    return vector_angles(plane_normals(ring_frames), vg_vec_frames)
+
+
+def ringVec(vec, coords):
+    ## angle between the ring normal and a fixed vector
+    return vector_angles(plane_normals(coords), vec)
 
 
 def dealNdx(ndx_file, select, vg=False):
-    with open(ndx_file, 'r') as fo:
+    with zopen(ndx_file) as fo:
         content = fo.read()
     ## read in each group
     ndx_dic = {}
@@ -178,7 +101,7 @@ def dealNdx(ndx_file, select, vg=False):
 
 
 def dealNdx_single(ndx_file, select):
-    with open(ndx_file, 'r') as fo:
+    with zopen(ndx_file) as fo:
         content = fo.read()
     ## read in each group
     ndx_dic = {}
@@ -213,55 +136,22 @@ def dealNdx_single(ndx_file, select):
     return ring_1_id
 
 
-def calcAng_RingVec(ring_frames, vec_frames):
-    ## check the frames 
-    if len(ring_frames) != len(vec_frames):
-        print("Error -> length of frames of ring and vector isn't equal")
-        exit()
-    ## calculate the angles
-    angles = []
-    for i in range(len(ring_frames)):
-        ring_1_coor = ring_frames[i]
-        vector = vec_frames[i]
-        ## p1 = [ a1, a2, a3 ], p2 = [ b1, b2, b3 ]
-        ## p1xp2 = [ a2b3 - a3b2, a3b1 - a1b3, a1b2 - a2b1 ]
-        ## calculate the plane normal of ring 1 by cross product
-        r1_p1 = [ ring_1_coor[2][0] - ring_1_coor[0][0], 
-                ring_1_coor[2][1] - ring_1_coor[0][1],
-                ring_1_coor[2][2] - ring_1_coor[0][2]]
-        r1_p2 = [ ring_1_coor[4][0] - ring_1_coor[0][0], 
-                ring_1_coor[4][1] - ring_1_coor[0][1],
-                ring_1_coor[4][2] - ring_1_coor[0][2]]
-        r1_xProd = [ r1_p1[1]*r1_p2[2] - r1_p1[2]*r1_p2[1], 
-                r1_p1[2]*r1_p2[0] - r1_p1[0]*r1_p2[2], 
-                r1_p1[0]*r1_p2[1] - r1_p1[1]*r1_p2[0] ] 
-        ## calc the degree 
-        dotProduct = r1_xProd[0] * vector[0] + r1_xProd[1] * vector[1]
-        dotProduct += r1_xProd[2] * vector[2]
-        r1_xProd_norm = (r1_xProd[0]**2 + r1_xProd[1]**2 + r1_xProd[2]**2)**0.5
-        vector_norm = (vector[0]**2 + vector[1]**2 + vector[2]**2)**0.5
-        cos_degree = dotProduct / (r1_xProd_norm * vector_norm)
-        degree = math.acos(cos_degree) * 180 / math.pi 
-        if degree > 90 :
-            degree = 180 - degree
-        angles.append(degree)
-    return angles
-
-
-def calcVec(vg_frames):
-    vg_vec_frames = []
-    for atoms in vg_frames:
-        vec = [ 0, 0, 0 ]
-        for i in range(1,len(atoms)):
-            vec[0] += atoms[i][0] - atoms[i-1][0]
-            vec[1] += atoms[i][1] - atoms[i-1][1]
-            vec[2] += atoms[i][2] - atoms[i-1][2]
-        vec = [ v/(len(atoms)-1) for v in vec ]
-        vg_vec_frames.append(vec)
-    return vg_vec_frames
-
-
-def dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select):
+def angDistribution(angles):
+    ## count the angles in 0-30, 30-60 and 60-90
+    nframes = angles.shape[0]
+    ang0_30 = np.count_nonzero((angles >= 0) & (angles < 30))
+    ang30_60 = np.count_nonzero((angles >= 30) & (angles < 60))
+    ang60_90 = np.count_nonzero(angles > 60)
+    print("Info =>  0 <= angle < 30 : {}/{} = {:>6.2%}".format(
+        ang0_30, nframes, ang0_30*1.0/nframes))
+    print("Info => 30 <= angle < 60 : {}/{} = {:>6.2%}".format(
+        ang30_60, nframes, ang30_60*1.0/nframes))
+    print("Info => 60 <= angle < 90 : {}/{} = {:>6.2%}".format(
+        ang60_90, nframes, ang60_90*1.0/nframes))
+
+
+def dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select,
+                 frames=None, nt=1):
     ## get the atom id
     ring_1_id, ring_2_id = dealNdx(ndx_file, select, False)
     if len(ring_1_id) < 5 or len(ring_1_id) > 7 or \
@@ -271,16 +161,13 @@ def dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select):
         print("Error -> please check your index file")
         print("Error -> your index : ", ring_1_id, ring_2_id)
         exit()
-    ## get the coordinates of two rings
-    time, ring_1_frames, ring_2_frames = getCoor(gro_file, ring_1_id, ring_2_id)
+    ## calculate the distance between the centers of two rings and the
+    ## angles of their normals, fitted to all ring atoms
+    time, results = calcFrames(gro_file, ring_1_id, ring_2_id,
+            functools.partial(ringPair, len(ring_1_id)), frames, nt)
+    distance, angles = results[:, 0], results[:, 1]
     ## modify the time sequence
     time = [ t*time_dt + time_b for t in time ]
-    # print(len(time), len(ring_1_frames), len(ring_2_frames))
-    ## calculate the distance of two rings
-    distance = calcDist(ring_1_frames, ring_2_frames)
-    ## calculate the angles of the normals of two rings
-    angles = calcAng(ring_1_frames, ring_2_frames)
-    # print(len(time), len(distance), len(angles))
     ## check data and output
     print("Info -> there is ", len(time), " frames in your gro file")
     if len(time) != len(distance) or len(time) != len(angles):
@@ -293,26 +180,14 @@ def dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select):
         fo.write(out_content)
 
     ## calc the angle distribution
-    ang0_30, ang30_60, ang60_90 = 0, 0, 0
-    for ang in angles:
-        if ang >= 0 and ang < 30:
-            ang0_30 += 1
-        elif ang >= 30 and ang < 60:
-            ang30_60 += 1
-        elif ang > 60 :
-            ang60_90 += 1
-    print("Info =>  0 <= angle < 30 : {}/{} = {:>6.2%}".format(
-        ang0_30, len(time), ang0_30*1.0/len(time)))
-    print("Info => 30 <= angle < 60 : {}/{} = {:>6.2%}".format(
-        ang30_60, len(time), ang30_60*1.0/len(time)))
-    print("Info => 60 <= angle < 90 : {}/{} = {:>6.2%}".format(
-        ang60_90, len(time), ang60_90*1.0/len(time)))
+    angDistribution(angles)
     ## calc the average distance
     print("Info => average distance : {:>10.4f} nm".format(
-        sum(distance)/len(time)))
+        distance.mean()))
 
 
-def dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select):
+def dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select,
+               frames=None, nt=1):
     ring_id, vg_id = dealNdx(ndx_file, select, True)
     if len(ring_id) < 5 or len(ring_id) > 7 :
         print("Error -> index of your ring is more than 7 or less than 5")
@@ -325,14 +200,11 @@ def dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select):
         print("Error -> 2 or more atom index are needed")
         print("Error -> check your vector index :", vg_id)
         exit()
-    ## get the coordinates of ring and vg
-    time, ring_frames, vg_frames = getCoor(gro_file, ring_id, vg_id)
+    ## calculate the vector of vg and its angles with the ring normal
+    time, angles = calcFrames(gro_file, ring_id, vg_id,
+            functools.partial(ringVG, len(ring_id)), frames, nt)
     ## modify the time sequence
     time = [ t*time_dt + time_b for t in time ]
-    # calculate the vector vs time
-    vg_vec_frames = calcVec(vg_frames)
-    ## calculate the angles 
-    angles = calcAng_RingVec(ring_frames, vg_vec_frames)
     # save results
     print("Info -> there is ", len(time), " frames in your gro file")
     if len(time) != len(angles):
@@ -344,24 +216,11 @@ def dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select):
     with open(output_file, 'w') as fo:
         fo.write(out_content)
     ## calc the angle distribution
-    ang0_30, ang30_60, ang60_90 = 0, 0, 0
-    for ang in angles:
-        if ang >= 0 and ang < 30:
-            ang0_30 += 1
-        elif ang >= 30 and ang < 60:
-            ang30_60 += 1
-        elif ang > 60 :
-            ang60_90 += 1
-    print("Info =>  0 <= angle < 30 : {}/{} = {:>6.2%}".format(
-        ang0_30, len(time), ang0_30*1.0/len(time)))
-    print("Info => 30 <= angle < 60 : {}/{} = {:>6.2%}".format(
-        ang30_60, len(time), ang30_60*1.0/len(time)))
-    print("Info => 60 <= angle < 90 : {}/{} = {:>6.2%}".format(
-        ang60_90, len(time), ang60_90*1.0/len(time)))
+    angDistribution(angles)
 
 
 def dealRingVec(ndx_file, gro_file, time_b, time_dt, output_file,
-                vec, select):
+                vec, select, frames=None, nt=1):
     ring_id = dealNdx_single(ndx_file, select)
     if len(ring_id) < 5 or len(ring_id) > 7 :
         print("Error -> index of your ring is more than 7 or less than 5")
@@ -369,17 +228,16 @@ def dealRingVec(ndx_file, gro_file, time_b, time_dt, output_file,
         print("Error -> please check your index file")
         print("Error -> your index : ", ring_id)
         exit()
-    time, ring_frames, _ = getCoor(gro_file, ring_id, ring_id)
-    ## modify the time sequence
-    time = [ t*time_dt + time_b for t in time ]
     # deal with vec 
     vec = [ float(i) for i in vec ]
     if 0 == vec[0] == vec[1] == vec[2]:
         print("Error -> You can't input an all zero vector")
         exit()
-    vec_frames = [ vec for i in range(len(time)) ]
-    # calculate the angles
-    angles = calcAng_RingVec(ring_frames, vec_frames)
+    # calculate the angles, the vector is broadcast to all frames
+    time, angles = calcFrames(gro_file, ring_id, [],
+            functools.partial(ringVec, np.array(vec)), frames, nt)
+    ## modify the time sequence
+    time = [ t*time_dt + time_b for t in time ]
     # save results
     print("Info -> there is ", len(time), " frames in your gro file")
     if len(time) != len(angles):
@@ -391,20 +249,7 @@ def dealRingVec(ndx_file, gro_file, time_b, time_dt, output_file,
     with open(output_file, 'w') as fo:
         fo.write(out_content)
     ## calc the angle distribution
-    ang0_30, ang30_60, ang60_90 = 0, 0, 0
-    for ang in angles:
-        if ang >= 0 and ang < 30:
-            ang0_30 += 1
-        elif ang >= 30 and ang < 60:
-            ang30_60 += 1
-        elif ang > 60 :
-            ang60_90 += 1
-    print("Info =>  0 <= angle < 30 : {}/{} = {:>6.2%}".format(
-        ang0_30, len(time), ang0_30*1.0/len(time)))
-    print("Info => 30 <= angle < 60 : {}/{} = {:>6.2%}".format(
-        ang30_60, len(time), ang30_60*1.0/len(time)))
-    print("Info => 60 <= angle < 90 : {}/{} = {:>6.2%}".format(
-        ang60_90, len(time), ang60_90*1.0/len(time)))
+    angDistribution(angles)
 
 
 def main():
@@ -426,6 +271,9 @@ def main():
             help = "get vector by your input, eg. -vec 6 6 6")
     parser.add_argument("-select", nargs="*",
             help = "select the groups, eg. -select ring1 ring2")
+    parser.add_argument("-nt", default=1, type=int,
+            help = "number of processes to read and compute frames, default=1")
+    add_frame_arguments(parser)
     args = parser.parse_args()
     ndx_file = args.n
     gro_file = args.f
@@ -435,6 +283,7 @@ def main():
     vg = args.vg
     vec = args.vec
     select = args.select
+    nt = args.nt
 
     if ndx_file not in os.listdir():
         print("Error -> no ", ndx_file, " in current directory")
@@ -443,16 +292,21 @@ def main():
         print("Error -> no ", gro_file, " in current directory")
         exit()
 
+    if vec != None and vg == True:
+        print("Error -> You can't set -vg and -vec at the same time")
+        exit()
+    ## frames by -begin, -end and -skip, from the frame index of gro file
+    frames = frames_from_args(gro_file, args)
+
     if vec == None and vg == False:
-        dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select)
+        dealTwoRings(ndx_file, gro_file, time_b, time_dt, output_file, select,
+                     frames, nt)
     elif vec == None and vg == True:
-        dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select)
+        dealRingVG(ndx_file, gro_file, time_b, time_dt, output_file, select,
+                   frames, nt)
     elif vec != None and vg == False:
         dealRingVec(ndx_file, gro_file, time_b, time_dt, output_file,
-                    vec, select)
-    elif vec != None and vg == True:
-        print("Error -> You can't set -vg and -vec at the same time")
-        exit()
+                    vec, select, frames, nt)
 
     print("Done -> good day ! ")
 
@@ -3,9 +3,13 @@
 
 # /* <width/columns> <height/rows> <colors> <chars per pixel>*/
 
+import os
 import sys
 import matplotlib.pyplot as plt 
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import zopen
+
 
 # hex color to RGB color
 def hex2rgb(hex_color):
@@ -26,7 +30,7 @@ def parse_show(inputfile, show, outputfile, ip):
     xpm_xaxis, xpm_yaxis, xpm_data = [], [], []
 
     # read data
-    with open(inputfile, 'r') as fo:
+    with zopen(inputfile) as fo:
         lines = fo.read().strip().strip("\n").split("\n")
 
     flag_4_code = 0 # means haven't detected yet
@@ -2,6 +2,7 @@
 ## date : 20220130
 
 import os
+import sys
 import math
 import argparse
 import numpy as np
@@ -11,6 +12,9 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import AutoLocator, FormatStrFormatter
 from matplotlib import pylab as pylab
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from zopen import zopen
+
 
 myparams = {
     "axes.labelsize": "12",
@@ -47,7 +51,7 @@ def readxpm(inputfile: str) -> tuple:
         print("ERROR -> no {} in current directory")
         exit()
 
-    with open(inputfile, "r") as fo:
+    with zopen(inputfile) as fo:
         lines = [line.strip() for line in fo.readlines()]
 
     ## parse content of xpm file
@@ -0,0 +1,198 @@
+## author : charlie
+## date : 20221019
+## usage : autocorrelation, statistical inefficiency and equilibration
+##     detection for the columns of xvg file
+## command : python xvg_autocorr.py -f energy.xvg -c 1 2 -b 0 -e 10000 -o acf.xvg
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg, writexvg, column_number
+
+
+def acf_fft(data: np.ndarray) -> np.ndarray:
+    """normalized autocorrelation function of each column by FFT"""
+    n = data.shape[0]
+    fluct = data - data.mean(axis=0)
+    ## zero padding to avoid the circular correlation of FFT
+    nfft = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(fluct, n=nfft, axis=0)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=nfft, axis=0)[:n]
+    acov /= (n - np.arange(n))[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acf = acov / acov[0]
+    ## constant column has no fluctuation at all
+    acf[:, acov[0] <= 0] = 0.0
+    acf[0] = 1.0
+    return acf
+
+
+def statistical_inefficiency(acf: np.ndarray, n: int) -> np.ndarray:
+    """g = 1 + 2 * sum (1 - t/N) C(t), summed until C(t) first drops to zero"""
+    lag = np.arange(1, acf.shape[0])
+    positive = np.cumprod(acf[1:] > 0, axis=0)
+    g = 1.0 + 2.0 * np.sum(positive * acf[1:] * (1.0 - lag / n)[:, None], axis=0)
+    return np.maximum(g, 1.0)
+
+
+def lagged_products(u: np.ndarray, v: np.ndarray, maxlag: int) -> np.ndarray:
+    """sum u[i] * v[i + k] for k = 0 .. maxlag, by a zero padded FFT"""
+    nfft = 1 << (u.shape[0] + max(v.shape[0], maxlag + 1)).bit_length()
+    spectrum = np.conj(np.fft.rfft(u, n=nfft)) * np.fft.rfft(v, n=nfft)
+    return np.fft.irfft(spectrum, n=nfft)[: maxlag + 1]
+
+
+def detect_equilibration(x: np.ndarray, candidates: int = 200) -> tuple:
+    """find the start index t0 which maximizes the effective samples N/g
+
+    The lagged products of the whole series are computed once by FFT. The
+    candidate t0 lie on a coarse grid over the first half of the series,
+    the products of a suffix x[t0:] are those of the whole series minus the
+    ones of the frames before t0, which are added block by block between
+    two candidates. The lags are cut at a few times the correlation length
+    of the whole series.
+
+    Returns (t0, g, neff).
+    """
+    n = x.shape[0]
+    x = x - x.mean()
+    if n < 8 or np.all(x == 0):
+        return 0, 1.0, float(n)
+    total = lagged_products(x, x, n - 1)
+    acf = total / (n - np.arange(n)) / (total[0] / n)
+    nonpositive = np.nonzero(acf[1:] <= 0)[0]
+    first_zero = nonpositive[0] + 1 if nonpositive.size != 0 else n // 4
+    maxlag = int(min(n // 4, max(4 * first_zero, 20)))
+    total = total[: maxlag + 1]
+
+    t0 = np.unique(np.linspace(0, n // 2, min(candidates, n // 2 + 1)).astype(int))
+    csum = np.append(np.cumsum(x[::-1])[::-1], 0.0)
+    lag = np.arange(maxlag + 1)
+    ## products x[i] * x[i + k] of the frames before the candidate
+    before = np.zeros(maxlag + 1)
+    g = np.ones(t0.shape[0])
+    for index, start in enumerate(t0):
+        if index > 0:
+            last = t0[index - 1]
+            before += lagged_products(x[last:start], x[last : start + maxlag], maxlag)
+        length = n - start
+        mean = csum[start] / length
+        head = csum[start] - csum[n - lag]
+        tail = csum[start + lag]
+        cov = (total - before - mean * (head + tail)) / (length - lag) + mean * mean
+        if cov[0] <= 0:
+            continue
+        corr = cov[1:] / cov[0]
+        positive = np.cumprod(corr > 0)
+        g[index] = 1.0 + 2.0 * np.sum(positive * corr * (1.0 - lag[1:] / length))
+    g = np.maximum(g, 1.0)
+    neff = (n - t0) / g
+    best = int(np.argmax(neff))
+
+    return int(t0[best]), float(g[best]), float(neff[best])
+
+
+def analyse(
+    xvgfile: str, columns: list, outputfile: str, candidates: int, begin: float, end: float
+) -> None:
+    """print correlation times and equilibration of columns, write acf"""
+    column_num = column_number(xvgfile)
+    if columns == None:
+        columns = list(range(1, column_num))
+    for c in columns:
+        if c < 1 or c >= column_num:
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    ## only time and the selected columns are read
+    _, xlabel, _, legends, data = readxvg(xvgfile, begin, end, columns)
+    if data.shape[0] < 2:
+        print("ERROR -> at least 2 rows are needed in {}".format(xvgfile))
+        exit()
+
+    time = data[:, 0]
+    dt = (time[-1] - time[0]) / (time.shape[0] - 1)
+    values = data[:, 1:]
+    n = values.shape[0]
+    acf = acf_fft(values)
+    g = statistical_inefficiency(acf, n)
+
+    print("Info -> {} frames, dt = {:.4f}".format(n, dt))
+    print(
+        "{:>6} {:>20} {:>14} {:>12} {:>12} {:>10} {:>12} {:>12} {:>10}".format(
+            "column", "legend", "mean", "SD", "tau_int", "g", "t0", "g(t0)", "Neff(t0)"
+        )
+    )
+    t0_max = 0
+    for index, c in enumerate(columns):
+        t0, g0, neff = detect_equilibration(values[:, index], candidates)
+        t0_max = max(t0_max, t0)
+        print(
+            "{:>6} {:>20} {:>14.4f} {:>12.4f} {:>12.4f} {:>10.2f} {:>12.4f} {:>12.2f} {:>10.1f}".format(
+                c,
+                legends[index + 1][:20],
+                values[:, index].mean(),
+                values[:, index].std(),
+                (g[index] - 1.0) / 2.0 * dt,
+                g[index],
+                time[t0],
+                g0,
+                neff,
+            )
+        )
+    print(
+        "Info -> suggested production window : {:.4f} to {:.4f}".format(time[t0_max], time[-1])
+    )
+    print(
+        "Info -> python xvg_average.py {} {} -b {:g} -e {:g}".format(
+            xvgfile, ",".join([str(c) for c in columns]), time[t0_max], time[-1]
+        )
+    )
+
+    ## lag time is used as x axis of acf
+    out = np.column_stack([time - time[0], acf])
+    writexvg(
+        outputfile,
+        out,
+        ["lag"] + legends[1:],
+        title="Autocorrelation",
+        xlabel="Lag " + xlabel,
+        ylabel="C(t)",
+        source="xvg_autocorr.py from " + xvgfile,
+    )
+    print("Info -> autocorrelation functions have been written to {}".format(outputfile))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Autocorrelation, statistical inefficiency and equilibration of xvg columns"
+    )
+    parser.add_argument("-f", "--inputfile", help="input your xvg file")
+    parser.add_argument(
+        "-c", "--columns", nargs="*", type=int, help="columns to analyse, eg. -c 1 2, default all"
+    )
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument(
+        "-o", "--outputfile", default="acf.xvg", help="autocorrelation functions, default acf.xvg"
+    )
+    parser.add_argument(
+        "-nc",
+        "--candidates",
+        default=200,
+        type=int,
+        help="number of candidate start points for equilibration detection, default 200",
+    )
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your xvg file by -f")
+        exit()
+    analyse(args.inputfile, args.columns, args.outputfile, args.candidates, args.begin, args.end)
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,28 @@
 # author : charlie
 # time : 20200714
 # command : python xvg_average.py xvgfilename full 10 100
+#           python xvg_average.py xvgfilename full -b 1000 -e 5000
 # usage : 
-#    xvg_average.py XVG_Filename column_select start_index end_index
+#    xvg_average.py XVG_Filename column_select start_index end_index -b -e
 #        column_select -> e.g. 1,3 or full; default full
 #        start_index   -> optional, e.g. 10; default 0
 #        end_index     -> optional, but must be POSITIVE, NO -1 ! default End
+#        -b, -e        -> optional, begin and end time, e.g. -b1000 or -b 1000
+#        start_index and end_index count the data rows between -b and -e
 #############################################################################
 
 import os
 import sys
-from statistics import mean
 
-def loadxvg(file):
-    with open(file, 'r') as fo:
-        content = fo.read()
-    lines = content.strip().split('\n')
-    column_num = len([i for i in lines[-1].split() if i !=' '])
-    print('>> ' + file + " ->>> column_num == " + str(column_num) )
-    data = [ [] for i in range(column_num)]
-    for line in lines:
-        if '@' in line:
-            print(' ---> ' + line)
-            continue
-        elif line[0] == '#':
-            continue
-        line_clean = [i for i in line.split() if i != ' ']
-        for i in range(column_num):
-            data[i].append(line_clean[i])
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg, pop_time_window, column_number
+
+def loadxvg(file, begin=None, end=None, column_show=None):
+    title, xlabel, ylabel, legends, data = readxvg(file, begin, end, column_show)
+    print('>> ' + file + " ->>> column_num == " + str(column_number(file)) )
+    print(' ---> title "{}", xaxis "{}", yaxis "{}"'.format(title, xlabel, ylabel))
     
-    return data
+    return legends, data
 
 
 def main():
@@ -40,8 +33,10 @@ def main():
         column_select -> e.g. 1,3 or full; default full
         start_index   -> optional, e.g. 10; default 0
         end_index     -> optional, but must be POSITIVE, NO -1 ! default End
+        -b, -e        -> optional, begin and end time, e.g. -b1000 or -b 1000
+        start_index and end_index count the data rows between -b and -e
 == \n"""
-    cmds = [ i for i in sys.argv[1:]]
+    begin, end, cmds = pop_time_window(sys.argv[1:])
 
     if len(cmds) == 0:
         print(help_str)
@@ -71,7 +66,7 @@ def main():
         print(help_str)
         return 
 
-    if filename not in os.listdir() or '.xvg' not in filename:
+    if filename not in os.listdir() or ('.xvg' not in filename and '.edr' not in filename):
         print("\n --> wrong xvg filename ! ")
         print(help_str)
         return
@@ -83,24 +78,7 @@ def main():
         print(help_str)
         return
 
-    data = loadxvg( filename )
-    # print("data first line -> ")
-    data_first_line = ''
-    for i in range(len(data)):
-    	data_first_line += "{: ^16}".format(data[i][0])
-    # print(data_first_line)
-    
-    raw_max = len(data[0]) - 1
-    if start_index > raw_max:
-        start_index = 0 
-        print("\n* start_index larger than raw_max " 
-                + str(raw_max) + ", set it to be 0")
-    if end_index > raw_max:
-        end_index = -1
-        print("\n** end_index larger than raw_max " 
-                + str(raw_max) + ", set it to be -1")
-
-    column_range = [ i for i in range(len(data))]
+    column_range = [ i for i in range(column_number(filename))]
     column_show = []
     if column_select == 'full':
         column_show = column_range
@@ -112,42 +90,42 @@ def main():
         except:
             column_show = column_range
             print('\n** wrong column_select, set it to be full ! ')
-        
+
+    # only time and the columns in column_show are read, in this order
+    legends, data = loadxvg( filename, begin, end, column_show )
+    
+    raw_max = data.shape[0] - 1
+    if start_index > raw_max:
+        start_index = 0 
+        print("\n* start_index larger than raw_max " 
+                + str(raw_max) + ", set it to be 0")
+    if end_index > raw_max:
+        end_index = -1
+        print("\n** end_index larger than raw_max " 
+                + str(raw_max) + ", set it to be -1")
+
+    if end_index == -1:
+        data_select = data[start_index : ]
+    else:
+        data_select = data[start_index : end_index + 1]
+    print("->> average of {} rows, time from {} to {}".format(
+        data_select.shape[0], data_select[0, 0], data_select[-1, 0]))
     # print(start_index, end_index, column_show)
     table_title = ""
     table_content = ""
     table_seprate = ""
     table_line = ""
-    table_first_line = ''
-    for i in column_show:
-        table_first_line += "{: ^16}".format(data[i][0])
-        # if original xvg file, add first line into compute
-        if start_index == 0:
-            try:
-                float(data[i][0])
-            except:
-                start_index = 1
-                print("->> Unable to convert the raw 0 '{}' into float,".format(
-                    data[i][0]), end = '')
-                print("start_index set to be 1")
-            else:
-                start_index = 0
+    table_legend = ''
+    for index, i in enumerate(column_show):
+        table_legend += "{: ^16}".format(legends[index + 1][:15])
         table_seprate += "{:=^16}".format("=")
         table_line += "{:-^16}".format('-')
         table_title += "{:^16}".format(i)
-        if end_index == -1:
-            table_content += "{:^16.4f}".format(
-                mean([float(num) for num in 
-                    data[i][start_index : ]]))
-
-        else:
-            table_content += "{:^16.4f}".format(
-                mean([float(num) for num in 
-                    data[i][start_index : end_index +1 ]]))
+        table_content += "{:^16.4f}".format(data_select[:, index + 1].mean())
 
     print("=========" + table_seprate)
     print("title    " + table_title)
-    print("firstLine" + table_first_line)
+    print("legend   " + table_legend)
     print("---------" + table_line)
     print("average  " + table_content)
     print("=========" + table_seprate)
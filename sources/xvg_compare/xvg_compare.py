@@ -8,17 +8,30 @@
 #       -n for colomns selected for draw (e.g. -n56)
 #       -t for plot title (e.g. -tEnergy_for_Protein_and_Ligands)
 #       -x for xlabel (e.g. -xTime_(ns))
+#       -b, -e for begin and end time (e.g. -b1000 -e5000)
+#       -lttb, -raw for decimation of long lines before plotting,
+#           default is min and max of each pixel, -raw plots all points
+#       -interp for linear interpolation of all files onto common time axis,
+#           default keeps only the times found in all files
+#       -o for output of aligned data (e.g. -oaligned.xvg)
+#       -j for number of processes to read files (e.g. -j4), default one
+#           process per file
 # notice for command:
 #   all "_" will be replaced by space
 #   all "," will be set as a symbel to split
 #   all item formed by split() will show one by one with subplots
 #####################
 
+import os
 import sys
 import matplotlib
 from matplotlib import pyplot as plt 
 from matplotlib import pylab as pylab
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg_many, align_time, writexvg, pop_time_window
+from decimate import decimate, figure_pixels
+
 # 绘图控制参数
 myparams = {
     'axes.labelsize': '12',
@@ -32,61 +45,26 @@ pylab.rcParams.update(myparams)
 # matplotlib.style.use('ggplot')
 
 
-def xvg_deal(filename):
-    with open(filename, 'r') as fo:
-        content = fo.read()
-
-    line_list = content.strip('\n').split('\n')
-    column_num = len(line_list[-1].split())
-    data = []
-    for i in range(column_num):
-        data.append([])
-
-    title_lis = []
-    for line in line_list:
-        if line[0] != "#" and line[0] != '@':
-            if 'time' in line: 
-                for title in line.split(' '):
-                    if title == "":
-                        continue
-                    if '(' == title[0]:
-                        title_lis[-1] += title
-                    else:
-                        title_lis.append(title) 
-
-                for i in range(column_num):
-                    data[i].append( title_lis[i] )
-
-            else:
-                line_split = line.split()
-                if len(line_split) == column_num:
-                    for i in range( column_num ):
-                        data[i].append( float(line_split[i]) )
-                else:
-                    print(" WRONG! len(line_split) != column_num")
-
-    return data
-
-
 def yield_ylabel( num ):
     for y in range(num):
         yield y
 
 
-def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend):
+def multi_plot(aligned, legends_lis, select, filename_lis, title, ylabel, xlabel, showlegend, method='minmax'):
     number_list = []
     ylabel_list = ylabel
     ylabel_index = yield_ylabel(len(ylabel_list))
     for i in range(2, len(select)):
         number_list.append(int( select[i] ))
 
+    pixels = figure_pixels(plt.gcf())
     for i in range(len(number_list)):
         ax = plt.subplot(len(number_list), 1, i+1 )
         ax_legend = []
-        for data in data_lis:
-            ax.plot( [ d for d in data[0][1:] ], data[ number_list[i] ][1:] ) 
-            ax_legend.append( data[number_list[i]][0] )
-            # print( data[ number_list[i] ][0:10] )
+        # aligned columns : time, columns of file 1, columns of file 2, ...
+        for f, legends in enumerate(legends_lis):
+            ax.plot( *decimate(aligned[:, 0], aligned[:, 1 + f * len(number_list) + i], pixels, method) ) 
+            ax_legend.append( legends[i + 1] )
         if len(ylabel_list) == len(number_list):
             ax.set_ylabel( ylabel_list[ next( ylabel_index )] )
         for f in range(len(filename_lis)):
@@ -110,19 +88,26 @@ def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend
 
 def main():
     # energy_multi_show.py pro.xvg
-    cmds = [ i for i in sys.argv[1:] ]
+    begin, end, cmds = pop_time_window(sys.argv[1:])
 
     print("""xvg_compare.py fileA, fileB, fileC, ... -n165, 
-        -tTitle -yy_label,ylable_2 -xxlabel -llegend_1,legend_2 """)
+        -tTitle -yy_label,ylable_2 -xxlabel -llegend_1,legend_2 -b1000 -e5000 -lttb/-raw -interp -oaligned.xvg -j4 """)
 
-    data_lis = []
     filename_lis = []
     title = ""
     ylabel = "xvg ylabel"
     xlabel = 'xvg xlabel'
     showlegend = 0
+    method = 'minmax'
+    interp = False
+    outputfile = ""
+    workers = None
     for cmd in cmds:
-        if '-n' == cmd[:2]:
+        if cmd == '-raw' or cmd == '-lttb':
+            method = cmd[1:]
+        elif cmd == '-interp':
+            interp = True
+        elif '-n' == cmd[:2]:
             column_select = cmd
         elif '-t' == cmd[:2]:
             title = cmd[2: ].replace('_', ' ')
@@ -132,11 +117,35 @@ def main():
             xlabel = cmd[2:].replace("_", ' ')
         elif '-l' == cmd[:2]:
             showlegend = cmd[2:].replace('_', ' ').split(',')
+        elif '-o' == cmd[:2]:
+            outputfile = cmd[2:]
+        elif '-j' == cmd[:2]:
+            workers = int(cmd[2:])
         else:
-            data_lis.append( xvg_deal(cmd) )
             filename_lis.append( cmd )
     
-    multi_plot(data_lis, column_select, filename_lis, title, ylabel, xlabel, showlegend)
+    # only time and the columns selected by -n are read, files are read in parallel
+    cols = [ int(c) for c in column_select[2:] ]
+    results = readxvg_many(filename_lis, begin, end, cols, workers)
+    legends_lis = [ result[3] for result in results ]
+    data_lis = [ result[4] for result in results ]
+
+    # put all files onto one time axis, so columns could be compared frame by frame
+    aligned = align_time(data_lis, interp)
+    if aligned.shape[0] == 0:
+        print("ERROR -> no common time found in files, try -interp")
+        exit()
+    for filename, data in zip(filename_lis, data_lis):
+        if data.shape[0] > aligned.shape[0]:
+            print("Info -> {} of {} frames in {} are not on common time axis".format(
+                data.shape[0] - aligned.shape[0], data.shape[0], filename))
+    if outputfile != "":
+        aligned_legends = ["time"] + [ legends[i + 1] + ' of ' + filename.split(".")[0]
+            for filename, legends in zip(filename_lis, legends_lis) for i in range(len(cols)) ]
+        writexvg(outputfile, aligned, aligned_legends, title=title, source="xvg_compare.py")
+        print("Info -> aligned data have been written to {}".format(outputfile))
+
+    multi_plot(aligned, legends_lis, column_select, filename_lis, title, ylabel, xlabel, showlegend, method)
     print(" ~ Over ~ ")
 
 
@@ -8,46 +8,37 @@
 #       -n for colomns selected for draw (e.g. -n56)
 #       -t for plot title (e.g. -tEnergy_for_Protein_and_Ligands)
 #       -x for xlabel (e.g. -xTime_(ns))
+#       -b, -e for begin and end time (e.g. -b1000 -e5000)
+#       -mm for the min and max of each terminal column besides the mean
 # notice for command:
 #   all "_" will be replaced by space
 #   all "," will be set as a symbel to split
 #   all item formed by split() will be showed one by one with subplots
 #####################
 
+import os
 import sys
+import shutil
 import plotille
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg, time_range, pop_time_window
+from decimate import Bins
 
-def xvg_deal(filename):
-    with open(filename, 'r') as fo:
-        content = fo.read()
-    line_list = content.strip('\n').split('\n')
-    column_num = len(line_list[-1].split())
-    data = []
-    for i in range(column_num):
-        data.append([])
-    title_lis = []
-    for line in line_list:
-        if line[0] != "#" and line[0] != '@':
-            if 'time' in line: 
-                for title in line.split(' '):
-                    if title == "":
-                        continue
-                    if '(' == title[0]:
-                        title_lis[-1] += title
-                    else:
-                        title_lis.append(title) 
-                for i in range(column_num):
-                    data[i].append( title_lis[i] )
-            else:
-                line_split = line.split()
-                if len(line_split) == column_num:
-                    for i in range( column_num ):
-                        data[i].append( float(line_split[i]) )
-                else:
-                    print(" WRONG! len(line_split) != column_num")
+# width of plot in characters, every character has 2 dots in x; the
+# terminal width less the y axis labels and borders (about 22 characters)
+WIDTH = max(20, shutil.get_terminal_size((84, 24)).columns - 24)
+COLORS = ['red', 'green', 'blue', 'yellow', 'magenta', 'cyan', 'white']
 
-    return data
+
+def xvg_deal(filename, begin=None, end=None, cols=None, low=0, high=1, chunk=100000):
+    # the file is read chunk by chunk into min, mean and max of 2 bins per
+    # character, so plotille only draws a few hundred points for any file
+    legends = read_header(filename)[3]
+    binned = Bins(low, high, WIDTH * 2, len(cols))
+    for data in iter_xvg(filename, begin, end, cols, chunk):
+        binned.add(data[:, 0], data[:, 1:])
+    return [legends[c] for c in [0] + cols], binned.result()
 
 
 def yield_ylabel( num ):
@@ -55,7 +46,7 @@ def yield_ylabel( num ):
         yield y
 
 
-def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend):
+def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend, low, high, minmax=False):
     number_list = []
     ylabel_list = ylabel
     ylabel_index = yield_ylabel(len(ylabel_list))
@@ -63,13 +54,13 @@ def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend
         number_list.append(int( select[i] ))
     print(" ================= title = {} ================= ".format(title))
     fig = plotille.Figure()
-    fig.set_x_limits(min_ = 0)
-    fig.width = 60
+    fig.set_x_limits(min_ = low, max_ = high)
+    fig.width = WIDTH
     fig.height = 20
     for i in range(len(number_list)):
         ax_legend = []
-        for data in data_lis:
-            ax_legend.append( data[number_list[i]][0])
+        for legends, data in data_lis:
+            ax_legend.append( legends[i + 1])
         if len(ylabel_list) == len(number_list):
             ylabel2print = ylabel_list[ next( ylabel_index)]
         else:
@@ -80,8 +71,12 @@ def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend
         if showlegend != 0:
             ax_legend = showlegend
         for da in range(len(data_lis)):
-            data = data_lis[da]
-            fig.plot( [d for d in data[0][1:]], data[ number_list[i] ][1:],label=ax_legend[da])
+            centers, ymin, ymean, ymax = data_lis[da][1]
+            color = COLORS[da % len(COLORS)]
+            fig.plot( centers, ymean[:, i], lc=color, label=ax_legend[da])
+            if minmax:
+                fig.scatter( list(centers) * 2, list(ymin[:, i]) + list(ymax[:, i]), 
+                    lc=color, label='min/max')
         print()
         print(fig.show(legend=True))
         print("xlabel -> ", xlabel)
@@ -92,17 +87,20 @@ def multi_plot(data_lis, select, filename_lis, title, ylabel, xlabel, showlegend
 
 def main():
     # energy_multi_show.py pro.xvg
-    cmds = [ i for i in sys.argv[1:] ]
+    begin, end, cmds = pop_time_window(sys.argv[1:])
     print("""xvgcompare.py fileA, fileB, fileC, ... -n165, 
-        -tTitle -yy_label,ylable_2 -xxlabel -llegend_1,legend_2 """)
+        -tTitle -yy_label,ylable_2 -xxlabel -llegend_1,legend_2 -b1000 -e5000 -mm """)
     data_lis = []
     filename_lis = []
     title = "default title"
     ylabel = "default ylabel"
     xlabel = 'default xlabel'
     showlegend = 0
+    minmax = False
     for cmd in cmds:
-        if '-n' == cmd[:2]:
+        if cmd == '-mm':
+            minmax = True
+        elif '-n' == cmd[:2]:
             column_select = cmd
         elif '-t' == cmd[:2]:
             title = cmd[2: ].replace('_', ' ')
@@ -111,14 +109,27 @@ def main():
         elif '-x' == cmd[:2]:
             xlabel = cmd[2:].replace("_", ' ')
         elif '-l' == cmd[:2]:
-            showlegend = cmd[2:].replace('_', ' ').split(',')
             if len(cmd) == 2:
-                showlegend = []
+                print("ERROR -> give the legends right after -l, e.g. -llegend_1,legend_2")
+                exit()
+            showlegend = cmd[2:].replace('_', ' ').split(',')
         else:
-            data_lis.append( xvg_deal(cmd) )
             filename_lis.append( cmd )
     
-    multi_plot(data_lis, column_select, filename_lis, title, ylabel, xlabel, showlegend)
+    if showlegend != 0 and len(showlegend) < len(filename_lis):
+        print("ERROR -> {} legends given by -l for {} files".format(len(showlegend), len(filename_lis)))
+        exit()
+
+    # time range of all files from the first and last lines, for the bins
+    ranges = [ time_range(filename) for filename in filename_lis ]
+    low = min([ r[0] for r in ranges ]) if begin is None else begin
+    high = max([ r[1] for r in ranges ]) if end is None else end
+
+    # only time and the columns selected by -n are read from each file
+    cols = [ int(c) for c in column_select[2:] ]
+    for filename in filename_lis:
+        data_lis.append( xvg_deal(filename, begin, end, cols, low, high) )
+    multi_plot(data_lis, column_select, filename_lis, title, ylabel, xlabel, showlegend, low, high, minmax)
     print(" ~~~~~~~~~~~~~~~~~~~~~ Plot Over ~~~~~~~~~~~~~~~~~~~~~ ")
 
 
@@ -0,0 +1,191 @@
+## author : charlie
+## date : 20221019
+## usage : running (cumulative), sliding window, forward/backward and block
+##     averages of xvg columns versus time, to judge the convergence
+## command : python xvg_convergence.py -f energy.xvg -c 1 3 -w 1000 5000 -nb 10
+
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg, writexvg, column_number
+from decimate import decimate, figure_pixels
+
+
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    """S[k] = sum of the first k rows, S[0] = 0, for all columns at once
+
+    The first row is subtracted before summing, so large energies like
+    -30000 kJ/mol do not lose the digits of their fluctuations.
+    """
+    return np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values - values[0], axis=0)])
+
+
+def cumulative_mean(values: np.ndarray, sums: np.ndarray) -> np.ndarray:
+    """mean of rows 0..k for every k"""
+    count = np.arange(1, values.shape[0] + 1)[:, None]
+    return sums[1:] / count + values[0]
+
+
+def window_mean(values: np.ndarray, sums: np.ndarray, window: int) -> np.ndarray:
+    """mean of the last window rows up to row k, fewer rows at the beginning"""
+    n = values.shape[0]
+    stop = np.arange(1, n + 1)
+    start = np.maximum(stop - window, 0)
+    return (sums[stop] - sums[start]) / (stop - start)[:, None] + values[0]
+
+
+def forward_backward(values: np.ndarray, sums: np.ndarray, blocks: int) -> tuple:
+    """forward, backward and block means of k / blocks of the data, k = 1..blocks
+
+    forward : mean of the first k blocks, backward : mean of the last k
+    blocks, block : mean of the k-th block alone.
+    """
+    n = values.shape[0]
+    edges = np.rint(np.linspace(0, n, blocks + 1)).astype(int)
+    size = edges[1:][:, None]
+    forward = sums[edges[1:]] / size + values[0]
+    backward = (sums[n] - sums[n - edges[1:]]) / size + values[0]
+    block = (sums[edges[1:]] - sums[edges[:-1]]) / np.diff(edges)[:, None] + values[0]
+    return edges[1:] / n, forward, backward, block
+
+
+def analyse(args) -> None:
+    column_num = column_number(args.inputfile)
+    columns = args.columns if args.columns != None else list(range(1, column_num))
+    for c in columns:
+        if c < 1 or c >= column_num:
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    _, xlabel, _, legends, data = readxvg(args.inputfile, args.begin, args.end, columns)
+    if data.shape[0] < args.blocks:
+        print("ERROR -> at least {} rows are needed for {} blocks".format(args.blocks, args.blocks))
+        exit()
+    if xlabel == "Null":
+        xlabel = "Time (ps)"
+    time, values = data[:, 0], data[:, 1:]
+    n = values.shape[0]
+    dt = (time[-1] - time[0]) / (n - 1) if n > 1 else 1.0
+    sums = prefix_sums(values)
+
+    ## running averages : time, cumulative of every column, then every window
+    cumulative = cumulative_mean(values, sums)
+    windows = args.windows if args.windows != None else []
+    window_rows = [max(int(round(w / dt)), 1) for w in windows]
+    running = [time, cumulative] + [window_mean(values, sums, rows) for rows in window_rows]
+    running_legends = ["time"] + ["cumulative " + legends[i + 1] for i in range(len(columns))]
+    for w in windows:
+        running_legends += ["window {:g} {}".format(w, legends[i + 1]) for i in range(len(columns))]
+    running_file = args.outputfile + "_running.xvg"
+    writexvg(
+        running_file,
+        np.column_stack(running),
+        running_legends,
+        title="Running averages",
+        xlabel=xlabel,
+        ylabel="Average",
+        source="xvg_convergence.py from " + args.inputfile,
+    )
+    print("Info -> running averages have been written to {}".format(running_file))
+
+    ## forward, backward and block averages against fraction of data
+    fraction, forward, backward, block = forward_backward(values, sums, args.blocks)
+    fb_legends = ["fraction"]
+    for name in ("forward", "backward", "block"):
+        fb_legends += ["{} {}".format(name, legends[i + 1]) for i in range(len(columns))]
+    fb_file = args.outputfile + "_blocks.xvg"
+    writexvg(
+        fb_file,
+        np.column_stack([fraction, forward, backward, block]),
+        fb_legends,
+        title="Forward and backward averages",
+        xlabel="Fraction of data",
+        ylabel="Average",
+        source="xvg_convergence.py from " + args.inputfile,
+    )
+    print("Info -> forward, backward and block averages have been written to {}".format(fb_file))
+
+    ## block standard error, and the gap of forward/backward averages of half data
+    ## the half is taken from the prefix sums, not from a block edge, for any -nb
+    half = max(n // 2, 1)
+    half_gap = (sums[half] - (sums[n] - sums[n - half])) / half
+    block_sem = block.std(axis=0, ddof=1) / np.sqrt(args.blocks) if args.blocks > 1 else np.zeros(len(columns))
+    print(
+        "{:>6} {:>20} {:>14} {:>14} {:>14} {:>14}".format(
+            "column", "legend", "mean", "block SEM", "fwd-bwd(1/2)", "last window"
+        )
+    )
+    for i, c in enumerate(columns):
+        last = running[-1][-1, i] if len(windows) != 0 else cumulative[-1, i]
+        print(
+            "{:>6} {:>20} {:>14.4f} {:>14.4f} {:>14.4f} {:>14.4f}".format(
+                c, legends[i + 1][:20], cumulative[-1, i], block_sem[i], half_gap[i], last
+            )
+        )
+
+    if not args.noplot:
+        plot(time, values, running, windows, fraction, forward, backward, block, legends, xlabel, args.picture)
+
+
+def plot(time, values, running, windows, fraction, forward, backward, block, legends, xlabel, picture) -> None:
+    """one row per column : data with running averages, forward/backward averages"""
+    ncol = values.shape[1]
+    fig, axes = plt.subplots(ncol, 2, figsize=(12, 3 * ncol), squeeze=False)
+    pixels = figure_pixels(fig) / 2
+    for i in range(ncol):
+        ax = axes[i, 0]
+        ax.plot(*decimate(time, values[:, i], pixels), color="lightgray", label="data")
+        ax.plot(*decimate(time, running[1][:, i], pixels), label="cumulative")
+        for index, w in enumerate(windows):
+            ax.plot(*decimate(time, running[2 + index][:, i], pixels), label="window {:g}".format(w))
+        ax.set_ylabel(legends[i + 1])
+        ax.legend(frameon=False, fontsize=8)
+        ax = axes[i, 1]
+        ax.plot(fraction, forward[:, i], "o-", label="forward")
+        ax.plot(fraction, backward[:, i], "s-", label="backward")
+        ax.plot(fraction, block[:, i], "^:", label="block")
+        ax.legend(frameon=False, fontsize=8)
+    axes[-1, 0].set_xlabel(xlabel)
+    axes[-1, 1].set_xlabel("Fraction of data")
+    plt.tight_layout()
+    if picture != None:
+        plt.savefig(picture, dpi=300)
+        print("Info -> plot has been saved to {}".format(picture))
+    else:
+        plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cumulative, sliding window, forward/backward and block averages of xvg columns"
+    )
+    parser.add_argument("-f", "--inputfile", help="input your xvg file")
+    parser.add_argument("-c", "--columns", nargs="*", type=int, help="columns to analyse, eg. -c 1 2, default all")
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument(
+        "-w", "--windows", nargs="*", type=float, help="widths of sliding windows in time unit, eg. -w 1000 5000"
+    )
+    parser.add_argument("-nb", "--blocks", default=10, type=int, help="number of blocks, default 10")
+    parser.add_argument(
+        "-o", "--outputfile", default="convergence", help="prefix of output xvg files, default convergence"
+    )
+    parser.add_argument("-p", "--picture", help="save plot to picture file instead of showing it")
+    parser.add_argument("-noplot", action="store_true", help="do not plot")
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your xvg file by -f")
+        exit()
+    if args.blocks < 1:
+        print("ERROR -> number of blocks should be at least 1")
+        exit()
+    analyse(args)
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
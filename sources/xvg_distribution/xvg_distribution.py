@@ -0,0 +1,269 @@
+## author : charlie
+## date : 20221019
+## usage : histogram, kernel density estimation and 2D joint histogram of
+##     xvg columns, over one or several xvg files
+## command : python xvg_distribution.py -f rmsd1.xvg rmsd2.xvg -c 1 -o dist
+##           python xvg_distribution.py -f distang.xvg -j 1 2 -o joint
+
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg, writexvg
+
+
+def merge_moments(a: tuple, b: tuple) -> tuple:
+    """merge (n, mean, M2, min, max) of two parts, Chan's parallel formula"""
+    na, ma, sa, lowa, higha = a
+    nb, mb, sb, lowb, highb = b
+    n = na + nb
+    delta = mb - ma
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(n > 0, ma + delta * nb / n, 0.0)
+        m2 = np.where(n > 0, sa + sb + delta * delta * na * nb / n, 0.0)
+    return n, mean, m2, np.minimum(lowa, lowb), np.maximum(higha, highb)
+
+
+def chunk_moments(values: np.ndarray) -> tuple:
+    n = np.full(values.shape[1], float(values.shape[0]))
+    mean = values.mean(axis=0)
+    m2 = ((values - mean) ** 2).sum(axis=0)
+    return n, mean, m2, values.min(axis=0), values.max(axis=0)
+
+
+def scan_moments(xvgfiles: list, begin: float, end: float, columns: list, chunk: int) -> list:
+    """first pass, (n, mean, M2, min, max) of each column of each file"""
+    result = []
+    for xvgfile in xvgfiles:
+        ncol = len(columns)
+        moments = (np.zeros(ncol), np.zeros(ncol), np.zeros(ncol), np.full(ncol, np.inf), np.full(ncol, -np.inf))
+        for data in iter_xvg(xvgfile, begin, end, columns, chunk):
+            moments = merge_moments(moments, chunk_moments(data[:, 1:]))
+        if moments[0][0] == 0:
+            print("ERROR -> no data found in {}".format(xvgfile))
+            exit()
+        result.append(moments)
+    return result
+
+
+def bandwidth(moments: tuple) -> np.ndarray:
+    """Silverman's rule of thumb, 1.06 * SD * n^(-1/5)"""
+    n, _, m2, _, _ = moments
+    sd = np.sqrt(m2 / np.maximum(n - 1, 1))
+    h = 1.06 * sd * n ** (-0.2)
+    ## constant column
+    return np.where(h > 0, h, 1e-3)
+
+
+def bin_index(values: np.ndarray, low: float, width: float, bins: int) -> np.ndarray:
+    """bin of each value, values out of range are dropped"""
+    values = values[(values >= low) & (values <= low + width * bins)]
+    ## the high edge belongs to the last bin
+    return np.minimum(np.floor((values - low) / width).astype(np.int64), bins - 1)
+
+
+def histograms(
+    xvgfiles: list, begin: float, end: float, columns: list, chunk: int, lows: np.ndarray, width: np.ndarray, bins: int
+) -> np.ndarray:
+    """second pass, counts of each file and column (files x columns x bins)"""
+    counts = np.zeros((len(xvgfiles), len(columns), bins))
+    for f, xvgfile in enumerate(xvgfiles):
+        for data in iter_xvg(xvgfile, begin, end, columns, chunk):
+            for c in range(len(columns)):
+                index = bin_index(data[:, c + 1], lows[c], width[c], bins)
+                counts[f, c] += np.bincount(index, minlength=bins)
+    return counts
+
+
+def kde_fft(counts: np.ndarray, width: float, h: float) -> np.ndarray:
+    """gaussian KDE on the bin centers, the binned counts are convolved with
+    the kernel by FFT, O(bins log bins) whatever the number of points"""
+    bins = counts.shape[0]
+    half = int(min(np.ceil(5 * h / width), bins))
+    offset = np.arange(-half, half + 1) * width
+    kernel = np.exp(-0.5 * (offset / h) ** 2) / (np.sqrt(2 * np.pi) * h)
+    nfft = 1 << (bins + 2 * half).bit_length()
+    conv = np.fft.irfft(np.fft.rfft(counts, nfft) * np.fft.rfft(kernel, nfft), nfft)
+    density = conv[half : half + bins] / max(counts.sum(), 1)
+    return np.maximum(density, 0.0)
+
+
+def joint_histogram(
+    xvgfiles: list, begin: float, end: float, columns: list, chunk: int, bins: int, lows, width
+) -> np.ndarray:
+    """2D counts of two columns, summed over files"""
+    counts = np.zeros(bins * bins)
+    for xvgfile in xvgfiles:
+        for data in iter_xvg(xvgfile, begin, end, columns, chunk):
+            inside = np.ones(data.shape[0], dtype=bool)
+            for c in range(2):
+                inside &= (data[:, c + 1] >= lows[c]) & (data[:, c + 1] <= lows[c] + width[c] * bins)
+            ix = bin_index(data[inside, 1], lows[0], width[0], bins)
+            iy = bin_index(data[inside, 2], lows[1], width[1], bins)
+            counts += np.bincount(ix * bins + iy, minlength=bins * bins)
+    return counts.reshape(bins, bins)
+
+
+def grid(moments: tuple, value_range: list, bins: int, pad: np.ndarray) -> tuple:
+    """low edge and bin width of each column"""
+    if value_range != None:
+        lows = np.full(moments[0].shape[0], value_range[0])
+        highs = np.full(moments[0].shape[0], value_range[1])
+    else:
+        lows = moments[3] - pad
+        highs = moments[4] + pad
+    highs = np.where(highs > lows, highs, lows + 1.0)
+    return lows, (highs - lows) / bins
+
+
+def distribution(args) -> None:
+    title, _, _, legends = read_header(args.inputfiles[0])
+    columns = args.columns if args.columns != None else list(range(1, len(legends)))
+    for c in columns:
+        if c < 1 or c >= len(legends):
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    names = [os.path.splitext(os.path.basename(f))[0] for f in args.inputfiles]
+
+    moments_lis = scan_moments(args.inputfiles, args.begin, args.end, columns, args.chunk)
+    total = moments_lis[0]
+    for moments in moments_lis[1:]:
+        total = merge_moments(total, moments)
+    h_total = bandwidth(total) if args.bandwidth == None else np.full(len(columns), args.bandwidth)
+    ## the grid is padded by 3 bandwidths so the tails of KDE are kept
+    lows, width = grid(total, args.range, args.bins, 3 * h_total)
+    counts = histograms(args.inputfiles, args.begin, args.end, columns, args.chunk, lows, width, args.bins)
+    print("Info -> {:>20} {:>12} {:>12} {:>12} {:>12} {:>12}".format("column", "frames", "mean", "SD", "min", "max"))
+
+    for c, column in enumerate(columns):
+        centers = lows[c] + (np.arange(args.bins) + 0.5) * width[c]
+        out, out_legends = [centers], [legends[column]]
+        parts = list(zip(names, counts[:, c], moments_lis))
+        if len(args.inputfiles) > 1:
+            parts.append(("all", counts[:, c].sum(axis=0), total))
+        for name, count, moments in parts:
+            n = count.sum()
+            h = bandwidth(moments)[c] if args.bandwidth == None else args.bandwidth
+            out.append(count / max(n, 1) / width[c])
+            out.append(kde_fft(count, width[c], h))
+            out_legends += ["histogram of " + name, "KDE of " + name]
+            print("Info -> {:>20} {:>12.0f} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.4f}".format(
+                (legends[column] + " " + name)[:20],
+                moments[0][c],
+                moments[1][c],
+                np.sqrt(moments[2][c] / max(moments[0][c] - 1, 1)),
+                moments[3][c],
+                moments[4][c],
+            ))
+        out = np.column_stack(out)
+        outputfile = "{}_{}.xvg".format(args.outputfile, column)
+        writexvg(
+            outputfile,
+            out,
+            out_legends,
+            title="Distribution of " + legends[column],
+            xlabel=legends[column],
+            ylabel="Probability density",
+            source="xvg_distribution.py",
+        )
+        print("Info -> distribution of column {} has been written to {}".format(column, outputfile))
+        if not args.noplot:
+            fig, ax = plt.subplots()
+            for index in range(len(parts)):
+                line = ax.plot(centers, out[:, 2 + 2 * index], label=parts[index][0])[0]
+                ax.step(centers, out[:, 1 + 2 * index], where="mid", alpha=0.4, color=line.get_color())
+            ax.set_xlabel(legends[column])
+            ax.set_ylabel("Probability density")
+            ax.legend(frameon=False)
+            save_or_show(args.picture, "{}_{}".format(args.outputfile, column))
+
+
+def joint(args) -> None:
+    title, _, _, legends = read_header(args.inputfiles[0])
+    columns = args.joint
+    for c in columns:
+        if c < 1 or c >= len(legends):
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    moments_lis = scan_moments(args.inputfiles, args.begin, args.end, columns, args.chunk)
+    total = moments_lis[0]
+    for moments in moments_lis[1:]:
+        total = merge_moments(total, moments)
+    bins = args.bins2d
+    lows, width = grid(total, args.range, bins, np.zeros(2))
+    counts = joint_histogram(args.inputfiles, args.begin, args.end, columns, args.chunk, bins, lows, width)
+    density = counts / max(counts.sum(), 1) / (width[0] * width[1])
+
+    x = lows[0] + (np.arange(bins) + 0.5) * width[0]
+    y = lows[1] + (np.arange(bins) + 0.5) * width[1]
+    xx, yy = np.meshgrid(x, y, indexing="ij")
+    outputfile = "{}_joint.xvg".format(args.outputfile)
+    writexvg(
+        outputfile,
+        np.column_stack([xx.ravel(), yy.ravel(), density.ravel()]),
+        [legends[columns[0]], legends[columns[1]], "density"],
+        title="Joint distribution",
+        xlabel=legends[columns[0]],
+        ylabel=legends[columns[1]],
+        source="xvg_distribution.py",
+    )
+    print("Info -> {:.0f} frames, joint distribution has been written to {}".format(counts.sum(), outputfile))
+    if not args.noplot:
+        fig, ax = plt.subplots()
+        mesh = ax.pcolormesh(
+            lows[0] + np.arange(bins + 1) * width[0],
+            lows[1] + np.arange(bins + 1) * width[1],
+            np.ma.masked_equal(density.T, 0),
+            cmap="viridis",
+        )
+        fig.colorbar(mesh, label="Probability density")
+        ax.set_xlabel(legends[columns[0]])
+        ax.set_ylabel(legends[columns[1]])
+        save_or_show(args.picture, "{}_joint".format(args.outputfile))
+
+
+def save_or_show(picture: str, name: str) -> None:
+    if picture != None:
+        plt.savefig("{}.{}".format(name, picture), dpi=300)
+        print("Info -> plot has been saved to {}.{}".format(name, picture))
+        plt.close()
+    else:
+        plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Histogram, KDE and joint histogram of xvg columns")
+    parser.add_argument("-f", "--inputfiles", nargs="+", help="xvg files, the distributions are also combined")
+    parser.add_argument("-c", "--columns", nargs="*", type=int, help="columns, eg. -c 1 2, default all")
+    parser.add_argument("-j", "--joint", nargs=2, type=int, help="joint histogram of two columns, eg. -j 1 2")
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument("-o", "--outputfile", default="distribution", help="prefix of output xvg, default distribution")
+    parser.add_argument("-nb", "--bins", default=200, type=int, help="number of bins, default 200")
+    parser.add_argument("-nb2d", "--bins2d", default=100, type=int, help="number of bins in x and y of joint histogram, default 100")
+    parser.add_argument("-r", "--range", nargs=2, type=float, help="range of bins, default from the data")
+    parser.add_argument("-bw", "--bandwidth", type=float, help="bandwidth of KDE, default by Silverman's rule")
+    parser.add_argument("-chunk", default=100000, type=int, help="frames read at once, default 100000")
+    parser.add_argument("-p", "--picture", help="save plots as picture of this type (png, pdf, ...) instead of showing them")
+    parser.add_argument("-noplot", action="store_true", help="do not plot")
+    args = parser.parse_args()
+
+    if args.inputfiles == None:
+        print("ERROR -> specify xvg files by -f")
+        exit()
+    for xvgfile in args.inputfiles:
+        if not os.path.exists(xvgfile):
+            print("ERROR -> no {} in current directory".format(xvgfile))
+            exit()
+    if args.joint != None:
+        joint(args)
+    else:
+        distribution(args)
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+## author : charlie
+## date : 20221019
+## usage : python -m pytest sources/xvg_ensemble/tests
+
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from xvg_ensemble import match_rows, lockstep_chunks
+
+
+def write_replica(xvgfile: str, data: np.ndarray) -> None:
+    with open(xvgfile, "w") as fo:
+        fo.write('@    title "rmsd"\n@    xaxis  label "Time (ps)"\n@ s0 legend "rmsd"\n')
+        np.savetxt(fo, data, fmt="%12.4f")
+
+
+def test_match_rows_repeated_time():
+    """a restarted run repeats times 6 to 8, the rows written last are kept"""
+    time = np.arange(10.0)
+    clean = np.column_stack([time, time])
+    restarted = np.vstack([clean[:9], clean[6:] + [0, 100]])
+    a, b = match_rows([clean, restarted])
+    np.testing.assert_array_equal(a, clean)
+    np.testing.assert_array_equal(b[:, 0], time)
+    np.testing.assert_array_equal(b[:6, 1], time[:6])
+    np.testing.assert_array_equal(b[6:, 1], time[6:] + 100)
+
+
+def test_match_rows_missing_frame(capsys):
+    time = np.arange(10.0)
+    clean = np.column_stack([time, time])
+    a, b = match_rows([clean, np.delete(clean, 4, axis=0)])
+    assert a.shape[0] == b.shape[0] == 9 and 4.0 not in a[:, 0]
+    np.testing.assert_array_equal(a, b)
+    assert "1 frames not found in all replicas" in capsys.readouterr().out
+
+
+def test_lockstep_repeated_time(tmp_path):
+    time = np.arange(20.0)
+    clean = np.column_stack([time, time])
+    files = [str(tmp_path / "1.xvg"), str(tmp_path / "2.xvg")]
+    write_replica(files[0], clean)
+    write_replica(files[1], np.vstack([clean[:12], clean[9:]]))
+    for chunk in (4, 100):
+        chunks = list(lockstep_chunks(files, None, None, [1], chunk))
+        joined = np.concatenate([t for t, _ in chunks])
+        np.testing.assert_array_equal(joined, time)
+        values = np.concatenate([v for _, v in chunks])
+        np.testing.assert_array_equal(values[:, 0, 0], values[:, 1, 0])
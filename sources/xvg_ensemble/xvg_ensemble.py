@@ -0,0 +1,291 @@
+## author : charlie
+## date : 20221019
+## usage : ensemble mean, SD, SEM and bootstrap confidence interval of the
+##     same columns of several replicas, frame by frame
+## command : python xvg_ensemble.py -f rmsd1.xvg rmsd2.xvg rmsd3.xvg -c 1 -nb 1000 -o ensemble.xvg
+
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg, readxvg_many, align_time, write_header, time_range
+from decimate import decimate, envelope, figure_pixels, Bins
+
+## rows of replicas closer than this in time are the same frame
+TIME_TOLERANCE = 1e-3
+## time bins of the plotted band, more than the pixels of a saved figure
+PLOT_BINS = 4000
+
+
+def bootstrap_weights(replicas: int, samples: int, seed: int = None) -> np.ndarray:
+    """resampling of replicas as weights (samples x replicas), each row sums to 1
+
+    The mean of a bootstrap sample is then values @ weights.T, so all frames
+    of a chunk are resampled by one matrix product with the same draws.
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.multinomial(replicas, np.full(replicas, 1.0 / replicas), size=samples)
+    return counts / replicas
+
+
+def ensemble_stats(values: np.ndarray, weights: np.ndarray = None, ci: float = 95) -> list:
+    """mean, SD, SEM (and CI low, CI high) over replicas, values is frames x replicas"""
+    replicas = values.shape[1]
+    mean = values.mean(axis=1)
+    sd = values.std(axis=1, ddof=1)
+    stats = [mean, sd, sd / np.sqrt(replicas)]
+    if weights is not None:
+        boot = values @ weights.T
+        stats += list(np.percentile(boot, [50 - ci / 2, 50 + ci / 2], axis=1))
+    return stats
+
+
+def lockstep_chunks(
+    xvgfiles: list, begin: float, end: float, columns: list, chunk: int
+):
+    """read the replicas chunk by chunk together, yield (time, frames x replicas x columns)
+
+    At most two chunks of each file are in memory. The rows are joined on
+    time: rows up to the earliest last time of the buffered chunks are
+    matched, a row missing in any replica (e.g. a broken line dropped by
+    the reader) is skipped with a warning, later rows wait for the next
+    chunk. The ensemble stops at the end of the shortest file.
+    """
+    iters = [iter_xvg(xvgfile, begin, end, columns, chunk) for xvgfile in xvgfiles]
+    buffers = [None] * len(xvgfiles)
+    ended = [False] * len(xvgfiles)
+    while True:
+        for i, it in enumerate(iters):
+            if not ended[i] and (buffers[i] is None or buffers[i].shape[0] < chunk):
+                block = next(it, None)
+                if block is None:
+                    ended[i] = True
+                elif buffers[i] is None or buffers[i].shape[0] == 0:
+                    buffers[i] = block
+                else:
+                    buffers[i] = np.vstack([buffers[i], block])
+        sizes = [0 if buffer is None else buffer.shape[0] for buffer in buffers]
+        if min(sizes) == 0:
+            if max(sizes) != 0:
+                short = [xvgfiles[i] for i, size in enumerate(sizes) if size == 0]
+                print("Warning -> {} end earlier, the ensemble is cut there".format(", ".join(short)))
+            return
+        ## later rows may still find their partners in the next chunk
+        horizon = min([buffer[-1, 0] for buffer in buffers]) + TIME_TOLERANCE
+        parts = [buffer[buffer[:, 0] <= horizon] for buffer in buffers]
+        buffers = [buffer[buffer[:, 0] > horizon] for buffer in buffers]
+        parts = match_rows(parts)
+        if parts[0].shape[0] != 0:
+            yield parts[0][:, 0], np.stack([part[:, 1:] for part in parts], axis=1)
+
+
+def match_rows(parts: list) -> list:
+    """rows of the times found in all parts (within TIME_TOLERANCE), in the same order
+
+    A time repeated in a part (overlapping frames of a restarted run) keeps
+    its last row, as xvgio.sort_time does.
+    """
+    times = [part[:, 0] for part in parts]
+    same = all(t.shape == times[0].shape and np.all(np.abs(t - times[0]) <= TIME_TOLERANCE) for t in times)
+    if same and np.all(np.diff(times[0]) > 0):
+        return parts
+    uniques = []
+    repeated = 0
+    for part, t in zip(parts, times):
+        ## reverse so that np.unique keeps the last occurrence
+        key, index = np.unique(np.round(t[::-1] / TIME_TOLERANCE).astype(np.int64), return_index=True)
+        uniques.append((part[::-1][index], key))
+        repeated += t.shape[0] - key.shape[0]
+    if repeated != 0:
+        print("Warning -> {} rows of repeated times are skipped, the last row of each time is kept".format(repeated))
+    common = uniques[0][1]
+    for _, key in uniques[1:]:
+        common = np.intersect1d(common, key)
+    missing = np.unique(np.concatenate([part[~np.isin(key, common), 0] for part, key in uniques]))
+    if missing.size != 0:
+        print("Warning -> {} frames not found in all replicas are skipped, first at time {}".format(missing.shape[0], missing[0]))
+        print("Warning -> use -a to align replicas saved with different time steps")
+    return [part[np.searchsorted(key, common)] for part, key in uniques]
+
+
+def aligned_chunks(
+    xvgfiles: list, begin: float, end: float, columns: list, chunk: int, interp: bool
+):
+    """read all replicas, align them on common time axis, yield as lockstep_chunks"""
+    data_lis = [result[4] for result in readxvg_many(xvgfiles, begin, end, columns)]
+    aligned = align_time(data_lis, interp)
+    print("Info -> {} common time points of replicas".format(aligned.shape[0]))
+    ## aligned columns : time, columns of file 1, columns of file 2, ...
+    values = aligned[:, 1:].reshape(aligned.shape[0], len(xvgfiles), len(columns))
+    for start in range(0, aligned.shape[0], chunk):
+        yield aligned[start : start + chunk, 0], values[start : start + chunk]
+
+
+def ensemble(
+    xvgfiles: list,
+    columns: list,
+    outputfile: str,
+    begin: float,
+    end: float,
+    chunk: int,
+    samples: int,
+    ci: float,
+    align: bool,
+    interp: bool,
+    seed: int,
+    plot: bool = True,
+) -> tuple:
+    """write ensemble statistics of replicas into xvg chunk by chunk
+
+    With plot, mean and band are reduced into PLOT_BINS time bins on the
+    way, so memory does not grow with the length of the replicas.
+    Returns the binned (time, band) for plot_band, or (None, None).
+    """
+    title, xlabel, ylabel, legends = read_header(xvgfiles[0])
+    if xlabel == "Null":
+        xlabel = "Time (ps)"
+    if columns == None:
+        columns = list(range(1, len(legends)))
+    for c in columns:
+        if c < 1 or c >= len(legends):
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    weights = None
+    names = ["mean", "SD", "SEM"]
+    if samples > 0:
+        weights = bootstrap_weights(len(xvgfiles), samples, seed)
+        names += ["CI{:g} low".format(ci), "CI{:g} high".format(ci)]
+    out_legends = ["time"] + [
+        "{} {}".format(name, legends[c]) for c in columns for name in names
+    ]
+
+    if align or interp:
+        chunks = aligned_chunks(xvgfiles, begin, end, columns, chunk, interp)
+    else:
+        chunks = lockstep_chunks(xvgfiles, begin, end, columns, chunk)
+    ## mean, low and high of each column, binned for plot
+    binned = None
+    if plot:
+        low, high = time_range(xvgfiles[0])
+        low = low if begin == None else max(low, begin)
+        high = high if end == None else min(high, end)
+        binned = Bins(low, high, PLOT_BINS, 3 * len(columns))
+    frames = 0
+    with open(outputfile, "w") as fo:
+        write_header(
+            fo,
+            out_legends,
+            title="Ensemble of {} replicas".format(len(xvgfiles)),
+            xlabel=xlabel,
+            ylabel=ylabel,
+            source="xvg_ensemble.py",
+        )
+        for time, values in chunks:
+            out = [time]
+            band = []
+            for index in range(len(columns)):
+                stats = ensemble_stats(values[:, :, index], weights, ci)
+                out += stats
+                if weights is None:
+                    band.append([stats[0], stats[0] - stats[2], stats[0] + stats[2]])
+                else:
+                    band.append([stats[0], stats[3], stats[4]])
+            np.savetxt(fo, np.column_stack(out), fmt="%16.6f", delimiter=" ")
+            if binned is not None:
+                binned.add(time, np.column_stack([line for lines in band for line in lines]))
+            frames += time.shape[0]
+    if frames == 0:
+        print("ERROR -> no common data found in replicas")
+        exit()
+    print("Info -> {} frames of {} replicas have been written to {}".format(
+        frames, len(xvgfiles), outputfile
+    ))
+    if binned is None:
+        return None, None, legends, columns, xlabel, weights is not None
+    ## band : columns x (mean, low, high) x bins, the lowest low and highest high of a bin
+    centers, mins, means, maxs = binned.result()
+    band = np.stack([means[:, 0::3], mins[:, 1::3], maxs[:, 2::3]], axis=0).transpose(2, 0, 1)
+    return centers, band, legends, columns, xlabel, weights is not None
+
+
+def plot_band(
+    time: np.ndarray, band: np.ndarray, legends: list, columns: list, xlabel: str, bootstrap: bool, picture: str
+) -> None:
+    """mean line with shaded SEM or CI band, one subplot per column"""
+    fig = plt.figure()
+    pixels = figure_pixels(fig)
+    label = "bootstrap CI" if bootstrap else "mean ± SEM"
+    for index, c in enumerate(columns):
+        ax = fig.add_subplot(len(columns), 1, index + 1)
+        mean, low, high = band[index]
+        ax.fill_between(*envelope(time, low, high, pixels), alpha=0.3, linewidth=0, label=label)
+        ax.plot(*decimate(time, mean, pixels), label="mean")
+        ax.set_ylabel(legends[c])
+        ax.legend(frameon=False)
+    ax.set_xlabel(xlabel)
+    plt.tight_layout()
+    if picture != None:
+        plt.savefig(picture, dpi=300)
+        print("Info -> plot has been saved to {}".format(picture))
+    else:
+        plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ensemble mean, SD, SEM and bootstrap CI of xvg columns over replicas"
+    )
+    parser.add_argument("-f", "--inputfiles", nargs="+", help="xvg files of replicas")
+    parser.add_argument(
+        "-c", "--columns", nargs="*", type=int, help="columns to analyse, eg. -c 1 2, default all"
+    )
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument(
+        "-o", "--outputfile", default="ensemble.xvg", help="ensemble statistics, default ensemble.xvg"
+    )
+    parser.add_argument(
+        "-nb", "--bootstrap", default=0, type=int, help="number of bootstrap samples, default 0 for no CI"
+    )
+    parser.add_argument("-ci", default=95, type=float, help="confidence level of CI in %%, default 95")
+    parser.add_argument("-seed", type=int, help="random seed of bootstrap")
+    parser.add_argument(
+        "-a", "--align", action="store_true", help="align replicas on common time, instead of row by row"
+    )
+    parser.add_argument(
+        "-interp", action="store_true", help="align replicas by linear interpolation of time"
+    )
+    parser.add_argument(
+        "-chunk", default=10000, type=int, help="frames read from each replica at once, default 10000"
+    )
+    parser.add_argument("-p", "--picture", help="save plot to picture file instead of showing it")
+    parser.add_argument("-noplot", action="store_true", help="do not plot")
+    args = parser.parse_args()
+
+    if args.inputfiles == None or len(args.inputfiles) < 2:
+        print("ERROR -> specify at least 2 xvg files of replicas by -f")
+        exit()
+    time, band, legends, columns, xlabel, bootstrap = ensemble(
+        args.inputfiles,
+        args.columns,
+        args.outputfile,
+        args.begin,
+        args.end,
+        args.chunk,
+        args.bootstrap,
+        args.ci,
+        args.align,
+        args.interp,
+        args.seed,
+        not args.noplot,
+    )
+    if not args.noplot:
+        plot_band(time, band, legends, columns, xlabel, bootstrap, args.picture)
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+## author : charlie
+## date : 20221019
+## usage : 2D free energy surface (Gibbs energy landscape) of two xvg
+##     columns, G = -kT ln P, written as xpm for xpm_show.py, instead of
+##     pc_combine.py + gmx sham
+## command : python xvg_fes.py -f pc1.xvg -fy pc2.xvg -t 310 -o gibbs.xpm
+##           python xvg_fes.py -f rep1.xvg rep2.xvg -c 1 2 -nb 50 -o gibbs.xpm
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg, lockstep, UnsortedTime
+from xpmio import writexpm
+
+## Boltzmann constant in kJ/(mol K)
+KB = 0.0083144626
+
+
+def pair_chunks(
+    xfile: str, yfile: str, columns: list, begin: float, end: float, chunk: int, report: bool = False
+):
+    """yield (x, y) arrays of one replica chunk by chunk
+
+    Without yfile both columns are read from xfile. With yfile, x is from
+    xfile and y from yfile, merge-joined on time by lockstep of xvgio, so a
+    row missing in one file does not shift the later pairs; rows whose time
+    is not in both files are skipped, and counted with report.
+    """
+    if yfile == None:
+        for data in iter_xvg(xfile, begin, end, columns, chunk):
+            yield data[:, 1], data[:, 2]
+        return
+    dropped = [0, 0]
+    try:
+        for _, (xdata, ydata) in lockstep([xfile, yfile], [[columns[0]], [columns[1]]], begin, end, chunk, dropped):
+            yield xdata[:, 0], ydata[:, 0]
+    except UnsortedTime as error:
+        print("ERROR -> time of {} is not in order, join restarted runs in time order first".format(error))
+        exit()
+    if report:
+        for xvgfile, other, num in ((xfile, yfile, dropped[0]), (yfile, xfile, dropped[1])):
+            if num != 0:
+                print("Warning -> {} rows of {} are skipped, their time is not in {}".format(num, xvgfile, other))
+
+
+def replicas(args) -> list:
+    """(xfile, yfile) of each replica"""
+    if args.yfiles == None:
+        return [(xfile, None) for xfile in args.inputfiles]
+    if len(args.yfiles) != len(args.inputfiles):
+        print("ERROR -> number of -f and -fy files should be the same")
+        exit()
+    return list(zip(args.inputfiles, args.yfiles))
+
+
+def data_range(pairs: list, columns: list, begin: float, end: float, chunk: int) -> tuple:
+    """first pass, min and max of x and y over all replicas"""
+    low, high = np.full(2, np.inf), np.full(2, -np.inf)
+    for xfile, yfile in pairs:
+        for x, y in pair_chunks(xfile, yfile, columns, begin, end, chunk, report=True):
+            if x.shape[0] == 0:
+                continue
+            low = np.minimum(low, [x.min(), y.min()])
+            high = np.maximum(high, [x.max(), y.max()])
+    if not np.all(np.isfinite(low)):
+        print("ERROR -> no data found in input files")
+        exit()
+    return low, high
+
+
+def histogram2d(
+    pairs: list, columns: list, begin: float, end: float, chunk: int, low: np.ndarray, high: np.ndarray, bins: int
+) -> np.ndarray:
+    """counts[ix, iy] of all replicas, each chunk is added by one bincount"""
+    width = (high - low) / bins
+    counts = np.zeros(bins * bins)
+    for xfile, yfile in pairs:
+        for x, y in pair_chunks(xfile, yfile, columns, begin, end, chunk):
+            inside = (x >= low[0]) & (x <= high[0]) & (y >= low[1]) & (y <= high[1])
+            ## the high edge belongs to the last bin
+            ix = np.minimum(((x[inside] - low[0]) / width[0]).astype(np.int64), bins - 1)
+            iy = np.minimum(((y[inside] - low[1]) / width[1]).astype(np.int64), bins - 1)
+            counts += np.bincount(ix * bins + iy, minlength=bins * bins)
+    return counts.reshape(bins, bins)
+
+
+def free_energy(counts: np.ndarray, temperature: float, shift: bool, gmax: float) -> np.ndarray:
+    """G = -kT ln P, the minimum is shifted to 0 unless shift is False,
+    empty bins get gmax or the largest G found"""
+    kt = KB * temperature
+    prob = counts / counts.sum()
+    with np.errstate(divide="ignore"):
+        energy = -kt * np.log(prob)
+    sampled = counts > 0
+    if shift:
+        energy -= energy[sampled].min()
+    top = energy[sampled].max() if gmax == None else gmax
+    energy[~sampled] = top
+    return np.minimum(energy, top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2D free energy surface of two xvg columns, written as xpm")
+    parser.add_argument("-f", "--inputfiles", nargs="+", help="xvg files, one per replica, all are accumulated")
+    parser.add_argument("-fy", "--yfiles", nargs="+", help="xvg files for y, paired with -f in order, e.g. -f pc1.xvg -fy pc2.xvg")
+    parser.add_argument("-c", "--columns", nargs=2, type=int, help="columns of x and y, default 1 2, or 1 1 with -fy")
+    parser.add_argument("-b", "--begin", type=float, help="time of first frame to read")
+    parser.add_argument("-e", "--end", type=float, help="time of last frame to read")
+    parser.add_argument("-o", "--outputfile", default="gibbs.xpm", help="output xpm, default gibbs.xpm")
+    parser.add_argument("-t", "--temperature", default=300.0, type=float, help="temperature in K, default 300")
+    parser.add_argument("-nb", "--bins", default=32, type=int, help="number of bins in x and y, default 32 as gmx sham")
+    parser.add_argument("-xr", "--xrange", nargs=2, type=float, help="range of x, default from the data")
+    parser.add_argument("-yr", "--yrange", nargs=2, type=float, help="range of y, default from the data")
+    parser.add_argument("-nl", "--nlevels", default=100, type=int, help="number of colors in xpm, default 100")
+    parser.add_argument("-gmax", type=float, help="G of empty bins and upper limit of G, default the largest G")
+    parser.add_argument("-noshift", action="store_true", help="keep -kT ln P, do not shift the minimum to 0")
+    parser.add_argument("-chunk", default=1000000, type=int, help="frames read at once, default 1000000")
+    parser.add_argument("-xl", "--xlabel", help="label of x, default legend of x column")
+    parser.add_argument("-yl", "--ylabel", help="label of y, default legend of y column")
+    args = parser.parse_args()
+
+    if args.inputfiles == None:
+        print("ERROR -> specify xvg files by -f")
+        exit()
+    pairs = replicas(args)
+    for pair in pairs:
+        for xvgfile in pair:
+            if xvgfile != None and not os.path.exists(xvgfile):
+                print("ERROR -> no {} in current directory".format(xvgfile))
+                exit()
+    if os.path.exists(args.outputfile):
+        print("ERROR -> {} already in current directory".format(args.outputfile))
+        exit()
+    columns = args.columns
+    if columns == None:
+        columns = [1, 2] if args.yfiles == None else [1, 1]
+
+    xlegends = read_header(pairs[0][0])[3]
+    ylegends = read_header(pairs[0][1])[3] if args.yfiles != None else xlegends
+    for c, legends in zip(columns, (xlegends, ylegends)):
+        if c < 1 or c >= len(legends):
+            print("ERROR -> column {} is out of range".format(c))
+            exit()
+    xlabel = args.xlabel if args.xlabel != None else xlegends[columns[0]]
+    ylabel = args.ylabel if args.ylabel != None else ylegends[columns[1]]
+
+    ## only the ranges not given need a pass over the data
+    low, high = np.zeros(2), np.zeros(2)
+    if args.xrange == None or args.yrange == None:
+        low, high = data_range(pairs, columns, args.begin, args.end, args.chunk)
+    if args.xrange != None:
+        low[0], high[0] = args.xrange
+    if args.yrange != None:
+        low[1], high[1] = args.yrange
+    high = np.where(high > low, high, low + 1.0)
+
+    counts = histogram2d(pairs, columns, args.begin, args.end, args.chunk, low, high, args.bins)
+    if counts.sum() == 0:
+        print("ERROR -> no data in the range of x and y")
+        exit()
+    energy = free_energy(counts, args.temperature, not args.noshift, args.gmax)
+
+    ix, iy = np.unravel_index(np.argmin(energy), energy.shape)
+    width = (high - low) / args.bins
+    xedges = low[0] + np.arange(args.bins + 1) * width[0]
+    yedges = low[1] + np.arange(args.bins + 1) * width[1]
+    print("Info -> {:.0f} frames of {} replicas in {} x {} bins".format(counts.sum(), len(pairs), args.bins, args.bins))
+    print("Info -> minimum G = {:.4f} kJ/mol at ({:.4f}, {:.4f})".format(
+        energy[ix, iy], (xedges[ix] + xedges[ix + 1]) / 2, (yedges[iy] + yedges[iy + 1]) / 2))
+
+    writexpm(
+        args.outputfile,
+        energy,
+        xedges,
+        yedges,
+        title="Gibbs Energy Landscape",
+        legend="G (kJ/mol)",
+        xlabel=xlabel,
+        ylabel=ylabel,
+        levels=args.nlevels,
+        source="xvg_fes.py",
+    )
+    print("Info -> free energy surface has been written to {}".format(args.outputfile))
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+## author : charlie
+## date : 20221019
+## usage : follow the xvg file of a running simulation, only the lines
+##     appended since the last poll are parsed, running statistics and
+##     moving averages are updated with them, then the summary is printed
+##     and the plot is refreshed
+## command : python xvg_follow.py -f energy.xvg -c 1 3 -w 50 -i 5 -plot
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, check_columns
+from xvgtail import XvgTail, RunningStats, TrailingMean
+
+
+class History:
+    """bucket means of the series for plotting, at most about maxpoints rows
+
+    When the stored rows exceed maxpoints, neighbouring pairs are merged
+    and the bucket size doubles, so an update costs only the new rows.
+    """
+
+    def __init__(self, ncol: int, maxpoints: int = 2000):
+        self.maxpoints = maxpoints
+        self.stride = 1
+        self.rows = np.zeros((0, ncol))
+        self.pending = np.zeros((0, ncol))
+
+    def add(self, rows: np.ndarray) -> None:
+        self.pending = np.vstack([self.pending, rows])
+        full = self.pending.shape[0] // self.stride * self.stride
+        if full != 0:
+            buckets = self.pending[:full].reshape(-1, self.stride, rows.shape[1]).mean(axis=1)
+            self.rows = np.vstack([self.rows, buckets])
+            self.pending = self.pending[full:]
+        while self.rows.shape[0] > self.maxpoints:
+            even = self.rows.shape[0] // 2 * 2
+            merged = self.rows[:even].reshape(-1, 2, rows.shape[1]).mean(axis=1)
+            self.rows = np.vstack([merged, self.rows[even:]])
+            self.stride *= 2
+
+    def result(self) -> np.ndarray:
+        if self.pending.shape[0] == 0:
+            return self.rows
+        return np.vstack([self.rows, self.pending.mean(axis=0)])
+
+
+def print_summary(legends: list, columns: list, last: np.ndarray, stats: RunningStats, moving: np.ndarray) -> None:
+    print(
+        "Info -> time {:.4f}, {} frames in statistics".format(last[0], stats.count)
+    )
+    print(
+        "{:>6} {:>20} {:>14} {:>14} {:>12} {:>14} {:>14} {:>14}".format(
+            "column", "legend", "last", "mean", "SD", "min", "max", "moving avg"
+        )
+    )
+    std = stats.std()
+    for i, c in enumerate(columns):
+        print(
+            "{:>6} {:>20} {:>14.4f} {:>14.4f} {:>12.4f} {:>14.4f} {:>14.4f} {:>14.4f}".format(
+                c, legends[c][:20], last[i + 1], stats.mean[i], std[i], stats.min[i], stats.max[i], moving[i]
+            )
+        )
+
+
+class LivePlot:
+    """one subplot per column, data and moving average, redrawn in place"""
+
+    def __init__(self, legends: list, columns: list, xlabel: str, title: str):
+        import matplotlib.pyplot as plt
+
+        self.plt = plt
+        plt.ion()
+        self.fig, axes = plt.subplots(len(columns), 1, sharex=True, squeeze=False)
+        self.axes = axes[:, 0]
+        self.lines = []
+        for ax, c in zip(self.axes, columns):
+            raw, = ax.plot([], [], color="lightgray", label="data")
+            moving, = ax.plot([], [], label="moving average")
+            ax.set_ylabel(legends[c])
+            self.lines.append((raw, moving))
+        self.axes[0].set_title(title)
+        self.axes[0].legend(frameon=False, fontsize=8)
+        self.axes[-1].set_xlabel(xlabel)
+
+    def update(self, rows: np.ndarray) -> None:
+        """rows : time, data columns, moving average columns"""
+        ncol = len(self.lines)
+        for i, (raw, moving) in enumerate(self.lines):
+            raw.set_data(rows[:, 0], rows[:, 1 + i])
+            moving.set_data(rows[:, 0], rows[:, 1 + ncol + i])
+            self.axes[i].relim()
+            self.axes[i].autoscale_view()
+        self.fig.canvas.draw_idle()
+
+    def pause(self, interval: float) -> None:
+        self.plt.pause(interval)
+
+
+def follow(args) -> None:
+    tail = None
+    ## wait for the first data line, header and columns are known then
+    waited = 0.0
+    while True:
+        if os.path.exists(args.inputfile):
+            tail = XvgTail(args.inputfile)
+            first = tail.poll()
+            if first.shape[0] != 0:
+                break
+        if args.timeout > 0 and waited >= args.timeout:
+            print("ERROR -> no data in {} after {:g} s".format(args.inputfile, waited))
+            exit()
+        time.sleep(args.interval)
+        waited += args.interval
+
+    title, xlabel, _, legends = read_header(args.inputfile)
+    column_num = first.shape[1]
+    columns = args.columns if args.columns != None else list(range(1, column_num))
+    check_columns(args.inputfile, columns, column_num)
+    tail.columns = columns
+    first = first[:, [0] + columns]
+    if xlabel == "Null":
+        xlabel = "Time (ps)"
+
+    stats = RunningStats(len(columns))
+    trailing = TrailingMean(len(columns), args.window)
+    history = History(1 + 2 * len(columns), args.maxpoints)
+    live = LivePlot(legends, columns, xlabel, title) if args.plot else None
+    moving = np.zeros(len(columns))
+    last = None
+    idle, data = 0.0, first
+    try:
+        while True:
+            if args.begin != None:
+                data = data[data[:, 0] >= args.begin]
+            if data.shape[0] != 0:
+                idle = 0.0
+                values = data[:, 1:]
+                stats.add(values)
+                averages = trailing.add(values)
+                moving, last = averages[-1], data[-1]
+                history.add(np.column_stack([data, averages]))
+                print_summary(legends, columns, last, stats, moving)
+                if live != None:
+                    live.update(history.result())
+            elif args.timeout > 0 and idle >= args.timeout:
+                print("Info -> {} has not grown for {:g} s, stop following".format(args.inputfile, idle))
+                break
+            else:
+                idle += args.interval
+            if live != None:
+                live.pause(args.interval)
+            else:
+                time.sleep(args.interval)
+            data = tail.poll()
+    except KeyboardInterrupt:
+        print("Info -> stop following {}".format(args.inputfile))
+    if last is None:
+        print("Warning -> no frame after time {:g}".format(args.begin))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Follow the xvg file of a running simulation, parse only the appended lines"
+    )
+    parser.add_argument("-f", "--inputfile", help="input your xvg file")
+    parser.add_argument("-c", "--columns", nargs="*", type=int, help="columns to follow, eg. -c 1 2, default all")
+    parser.add_argument("-b", "--begin", type=float, help="frames before this time are left out of statistics")
+    parser.add_argument("-w", "--window", default=10, type=int, help="frames of moving average, default 10")
+    parser.add_argument("-i", "--interval", default=2.0, type=float, help="seconds between polls, default 2")
+    parser.add_argument(
+        "-timeout",
+        default=60.0,
+        type=float,
+        help="stop when the file has not grown for so many seconds, 0 to follow until Ctrl-C, default 60",
+    )
+    parser.add_argument("-plot", action="store_true", help="refresh a matplotlib plot instead of summary only")
+    parser.add_argument(
+        "-maxpoints", default=2000, type=int, help="points kept per line of the plot, default 2000"
+    )
+    args = parser.parse_args()
+
+    if args.inputfile == None:
+        print("ERROR -> specify your xvg file by -f")
+        exit()
+    if args.window < 1 or args.interval <= 0:
+        print("ERROR -> window should be at least 1 and interval positive")
+        exit()
+    follow(args)
+    print("Good Day !")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,25 @@
 # arguements:
 #     filename.xvg : generated by GROMACS
 #     plotMode: '-s' for subplots or '-o' for oneplot (default '-o') (optional)
+#         '-sc' for density scatter of two columns, the first against the second
+#         selected column, '-linear' for linear color scale (default log) (optional)
 #     column number: start with '-n' and split number by ',', like '-n2,3,5' (optional)
+#     time window: '-b' for begin time and '-e' for end time, like '-b1000 -e5000' (optional)
+#     decimation: long lines are reduced to the min and max of each pixel before plotting,
+#         '-lttb' to use largest-triangle-three-buckets instead, '-raw' to plot all points (optional)
 #################################
 
+import os
 import sys
 import seaborn as sns
 from matplotlib import pyplot as plt
 from matplotlib import pylab as pylab
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import readxvg, pop_time_window, column_number
+from decimate import decimate, figure_pixels
+from raster import density_scatter
+
 # 绘图控制参数
 myparams = {
     'axes.labelsize': '12',
@@ -32,11 +43,12 @@ def cols_num_gen(cols):
         yield i
 
 
-def picture_oneplot(title, xlabel, ylabel, data, cols):
+def picture_oneplot(title, xlabel, ylabel, legends, data, cols, method='minmax'):
     legend_lis = []
+    pixels = figure_pixels(plt.gcf())
     for i in cols:
-        legend_lis.append(data[i][0])
-        plt.plot(data[0][1:], data[i][1:])
+        legend_lis.append(legends[i])
+        plt.plot(*decimate(data[:, 0], data[:, i], pixels, method))
 
     plt.title(title)
     plt.xlabel(xlabel)
@@ -45,7 +57,7 @@ def picture_oneplot(title, xlabel, ylabel, data, cols):
     plt.show()
 
 
-def picture_subplot(title, xlabel, ylabel, data, cols):
+def picture_subplot(title, xlabel, ylabel, legends, data, cols, method='minmax'):
     # 传一个可变对象 [] 真是愚蠢至极
     ylabel_li = ylabel.split(',')
     ylabel_use = []
@@ -55,17 +67,18 @@ def picture_subplot(title, xlabel, ylabel, data, cols):
         ylabel_use = ylabel_li
 
     plot_num = cols_num_gen(cols)
-    print(len(data[0]))
+    print(data.shape[0])
+    pixels = figure_pixels(plt.gcf())
     for i in cols:
         ax = plt.subplot(len(cols), 1, next(plot_num))
-        ax.plot(data[0][1:], data[i][1:])
+        ax.plot(*decimate(data[:, 0], data[:, i], pixels, method))
         if i == cols[-1]:
             plt.xlabel(xlabel)
         ax.set_ylabel(ylabel_use[i-1])
         if i != cols[-1]:
             ax.set_xticks([])
         legend_lis = []
-        legend_lis.append(data[i][0])
+        legend_lis.append(legends[i])
         ax.legend(labels=legend_lis, loc='best').get_frame().set_linewidth(0.0)
         if i == cols[0]:
             plt.title(title)
@@ -73,51 +86,28 @@ def picture_subplot(title, xlabel, ylabel, data, cols):
     plt.show()
 
 
-def xvg_deal(filename):
-    with open(filename, 'r') as fo:
-        content = fo.read()
-    line_list = content.strip('\n').split('\n')
-    column_num = len(line_list[-1].split())
-    data = []
-    for i in range(column_num):
-        data.append([])
-    data[0].append('time')
-    title = "Null"
-    xlabel = "Null"
-    ylabel = "Null"
-    for line in line_list:
-        if line[0] == "@":
-            if "title" in line:
-                title_line = line.strip('"')
-                if '"' in title_line:
-                    title = title_line.split('"')[-1]
-            elif "xaxis" in line:
-                xlabel_line = line.strip('"')
-                if '"' in xlabel_line:
-                    xlabel = xlabel_line.split('"')[-1]
-            elif "yaxis" in line:
-                ylabel_line = line.strip('"')
-                if '"' in ylabel_line:
-                    ylabel = ylabel_line.split('"')[-1]
-            elif "legend" in line and "@ s" in line:
-                legend = line.strip('"').split('"')[-1]
-                for i in range(1, column_num):
-                    if len(data[i]) == 0:
-                        data[i].append(legend)
-                        break
-
-        elif line[0] != '#' and line[0] != '@' and ('time' not in line):
-            num_list = line.strip().split()
-            for i in range(column_num):
-                if len(data[i]) == 0:
-                    data[i].append('no-legend')
-                data[i].append(float(num_list[i]))
-
-    return title, xlabel, ylabel, data
+def picture_scatter(title, legends, data, cols, scale='log'):
+    # points are counted into the pixels of axes and drawn as one image,
+    # instead of one marker for each of millions of frames
+    if len(cols) < 2:
+        print("== two columns are needed for '-sc', like '-n1,2' ")
+        return
+    fig, ax = plt.subplots()
+    image = density_scatter(ax, data[:, cols[0]], data[:, cols[1]], scale)
+    fig.colorbar(image, ax=ax, label='frames')
+    ax.set_xlabel(legends[cols[0]])
+    ax.set_ylabel(legends[cols[1]])
+    plt.title(title)
+    plt.show()
+
+
+def xvg_deal(filename, begin=None, end=None, cols=None):
+    title, xlabel, ylabel, legends, data = readxvg(filename, begin, end, cols)
+    return title, xlabel, ylabel, legends, data
 
 
 def main():
-    command = [i for i in sys.argv]
+    begin, end, command = pop_time_window(sys.argv)
     command.append(" ")
     command.reverse()
     command.pop()
@@ -133,22 +123,29 @@ def main():
 '-o' for oneplot (default '-o') (optional)")
         print("    column number: start with '-n' and split \
 number by ',', like '-n2,3,5' (optional)")
+        print("    time window: '-b' for begin time and '-e' for end \
+time, like '-b1000 -e5000' (optional)")
+        print("    decimation: '-lttb' for largest-triangle-three-buckets, \
+'-raw' to plot all points (default min-max per pixel) (optional)")
+        print("    scatter: '-sc' for density scatter of the first two selected \
+columns, '-linear' for linear color scale (default log) (optional)")
         print("e.g. python3 xvgshow.py filename.xvg -s -n1,2,3")
         return
 
     filename = filename.strip()
-    title, xlabel, ylabel, data = xvg_deal(filename)
-    try:
-        title, xlabel, ylabel, data = xvg_deal(filename)
-    except:
-        print("== Wrong filename ==")
 
     plot_func = '-o'
-    cols = [i for i in range(1, len(data))]
+    method = 'minmax'
+    scale = 'log'
+    cols = [i for i in range(1, column_number(filename))]
     for cm in command:
         if cm[0] == '-':
-            if cm == '-s' or cm == '-o':
+            if cm == '-s' or cm == '-o' or cm == '-sc':
                 plot_func = cm
+            elif cm == '-linear':
+                scale = 'linear'
+            elif cm == '-raw' or cm == '-lttb':
+                method = cm[1:]
             elif cm[0:2] == '-n':
                 cols_ori = [int(column)
                             for column in cm[2:].strip(',').split(',')]
@@ -162,17 +159,16 @@ number by ',', like '-n2,3,5' (optional)")
                 cols = col
             else:
                 print(" Wrong arguements which has been ignored ! ")
-    
-    ## data check block
-    # for i in range(len(data[0])):
-    #    for j in range(len(data)):
-    #        print(data[j][i], end = '')
-    #    print('')
-
-    if plot_func == '-s' and  len(cols) > 1:
-        picture_subplot(title, xlabel, ylabel, data, cols)
+
+    # only the selected columns are read, as column 1, 2, ... of data
+    title, xlabel, ylabel, legends, data = xvg_deal(filename, begin, end, cols)
+    cols = [i for i in range(1, data.shape[1])]
+    if plot_func == '-sc':
+        picture_scatter(title, legends, data, cols, scale)
+    elif plot_func == '-s' and  len(cols) > 1:
+        picture_subplot(title, xlabel, ylabel, legends, data, cols, method)
     else:
-        picture_oneplot(title, xlabel, ylabel, data, cols)
+        picture_oneplot(title, xlabel, ylabel, legends, data, cols, method)
 
 
 if __name__ == '__main__':
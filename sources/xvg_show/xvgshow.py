@@ -6,27 +6,42 @@
 # arguements:
 #     filename.xvg : generated by GROMACS
 #     column number: start with '-n', like '-n235' (optional)
+#     time window: '-b' for begin time and '-e' for end time, like '-b1000 -e5000' (optional)
+#     '-mm' to show min and max of each terminal column besides the mean (optional)
 #################################
 
 
+import os
 import sys
+import shutil
 import plotille
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import read_header, iter_xvg, time_range, pop_time_window, column_number
+from decimate import Bins
+
+# width of plot in characters, every character has 2 dots in x; the
+# terminal width less the y axis labels and borders (about 22 characters)
+WIDTH = max(20, shutil.get_terminal_size((84, 24)).columns - 24)
+
 
 def cols_num_gen(cols):
     for i in range(1, len(cols)+1):
         yield i
 
 
-def picture_oneplot(title, xlabel, ylabel, data, cols):
+def picture_oneplot(title, xlabel, ylabel, legends, data, cols, low, high, minmax=False):
+    centers, ymin, ymean, ymax = data
     for i in cols:
         fig = plotille.Figure()
         fig.color_mode = 'byte'
-        fig.set_x_limits(min_=0)
-        fig.width = 60
+        fig.set_x_limits(min_=low, max_=high)
+        fig.width = WIDTH
         fig.height= 20
         #fig.background = 0
-        fig.plot(data[0][1:], data[i][1:],label=data[i][0])
+        fig.plot(centers, ymean[:, i - 1], label=legends[i])
+        if minmax:
+            fig.scatter(list(centers) * 2, list(ymin[:, i - 1]) + list(ymax[:, i - 1]), label='min/max')
         print()
         print(fig.show(legend=True))
         print("title = ", title)
@@ -35,52 +50,18 @@ def picture_oneplot(title, xlabel, ylabel, data, cols):
         print()
 
 
-def xvg_deal(filename):
-    with open(filename, 'r') as fo:
-        content = fo.read()
-    line_list = content.strip('\n').split('\n')
-    column_num = len(line_list[-1].split())
-    data = []
-    for i in range(column_num):
-        data.append([])
-    data[0].append('time')
-    title = "Null"
-    xlabel = "Null"
-    ylabel = "Null"
-    for line in line_list:
-        if line[0] == "@":
-            if "title" in line:
-                title_line = line.strip('"')
-                if '"' in title_line:
-                    title = title_line.split('"')[-1]
-            elif "xaxis" in line:
-                xlabel_line = line.strip('"')
-                if '"' in xlabel_line:
-                    xlabel = xlabel_line.split('"')[-1]
-            elif "yaxis" in line:
-                ylabel_line = line.strip('"')
-                if '"' in ylabel_line:
-                    ylabel = ylabel_line.split('"')[-1]
-            elif "legend" in line and "@ s" in line:
-                legend = line.strip('"').split('"')[-1]
-                for i in range(1, column_num):
-                    if len(data[i]) == 0:
-                        data[i].append(legend)
-                        break
-
-        elif line[0] != '#' and line[0] != '@' and ('time' not in line):
-            num_list = line.strip().split()
-            for i in range(column_num):
-                if len(data[i]) == 0:
-                    data[i].append('no-legend')
-                # data[i].append( round( float(num_list[i]), 2) )
-                data[i].append(float(num_list[i]))
-
-    return title, xlabel, ylabel, data
+def xvg_deal(filename, begin=None, end=None, cols=None, low=0, high=1, chunk=100000):
+    # the file is read chunk by chunk into min, mean and max of 2 bins per
+    # character, so plotille only draws a few hundred points for any file
+    title, xlabel, ylabel, legends = read_header(filename)
+    binned = Bins(low, high, WIDTH * 2, len(cols))
+    for data in iter_xvg(filename, begin, end, cols, chunk):
+        binned.add(data[:, 0], data[:, 1:])
+    return title, xlabel, ylabel, [legends[c] for c in [0] + cols], binned.result()
 
 
 def main():
-    command = [i for i in sys.argv]
+    begin, end, command = pop_time_window(sys.argv)
     command.append(" ")
     command.reverse()
     command.pop()
@@ -94,20 +75,22 @@ def main():
         print("arguements:\n    filename.xvg : generated by GROMACS")
         print("    column number: start with '-n' and split \
 number by ',', like '-n2,3,5' (optional)")
+        print("    time window: '-b' for begin time and '-e' for end \
+time, like '-b1000 -e5000' (optional)")
+        print("    min and max: '-mm' to show min and max of each \
+terminal column besides the mean (optional)")
         print("e.g. python3 xvgshow.py filename.xvg -n1,2,3")
         return
 
     filename = filename.strip()
-    title, xlabel, ylabel, data = xvg_deal(filename)
-    try:
-        title, xlabel, ylabel, data = xvg_deal(filename)
-    except:
-        print("== Wrong filename ==")
 
-    cols = [i for i in range(1, len(data))]
+    cols = [i for i in range(1, column_number(filename))]
+    minmax = False
     for cm in command:
         if cm[0] == '-':
-            if cm[0:2] == '-n':
+            if cm == '-mm':
+                minmax = True
+            elif cm[0:2] == '-n':
                 cols_ori = [int(cm[2:][m]) for m in range(len(cm[2:]))]
                 col = []
                 for c in cols_ori:
@@ -119,12 +102,13 @@ number by ',', like '-n2,3,5' (optional)")
                 cols = col
             else:
                 print(" Wrong arguements which has been ignored ! ")
-    ## data check block
-    #for i in range(len(data[0])):
-        #for j in range(len(data)):
-            #print(data[j][i], end = ' ')
-        #print(' ')
-    picture_oneplot(title, xlabel, ylabel, data, cols)
+    first, last = time_range(filename)
+    low = first if begin is None else begin
+    high = last if end is None else end
+    # only the selected columns are read, as column 1, 2, ... of data
+    title, xlabel, ylabel, legends, data = xvg_deal(filename, begin, end, cols, low, high)
+    cols = [i for i in range(1, len(legends))]
+    picture_oneplot(title, xlabel, ylabel, legends, data, cols, low, high, minmax)
 
 
 if __name__ == '__main__':
@@ -4,130 +4,158 @@
 #       After run this script, a formmatted xvg/csv file will be generated.
 # command : python xvg_format.py inputfile1.xvg inputfile2.xvg
 #   add '-c' could make it generate csv data file more.
+#   add '-b1000 -e5000' to keep only the data from 1000 to 5000 (time unit).
+#   add '-oxvg,csv,tsv,npy,npz' to choose the output formats, all formats
+#       are written in one pass of the input file, chunk by chunk, so memory
+#       does not grow with the size of the file.
+#   add '-d4' to keep 4 decimals in text output, default 2.
+#   add '-j4' to format 4 files at the same time, default one process per file.
 
 
+import os
 import sys
 import time
+import struct
+import zipfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from xvgio import pop_time_window, read_header, iter_xvg
 
-def write_standard(line, file_output):
-    with open(file_output, 'a', encoding='utf-8') as fo:
-        line = line.strip(",")
-        fo.write(line + '\n')
-
-
-def format_style(file_input):
-    file_output = file_input + '_formatted.xvg'
-    with open(file_input, 'r', encoding='utf-8') as fo:
-        content = fo.read()
-    lines = content.split('\n')
-    # write_standard("## standard -> " + lines[0], file_output)
-    title_origin = lines[1].split()
-    title_deal = []
-    for title_o in title_origin:
-        if '(' == title_o[0]:
-            title_deal[-1] += title_o.strip()
-        elif '.' == title_o.strip()[-1] and '.' == title_deal[-1][-1]:
-            # print(title_o)
-            title_deal[-1] += title_o.strip()
-            # print(title_deal)
-        else:
-            title_deal.append(title_o)
-    title_line = ""
-    for title in title_deal:
-        title_line += "{:>20},".format(title)
-    write_standard(title_line, file_output)
-    for line in lines[2:]:
-        line_lis = line.split()
-        write_content = ""
-        for li in line_lis:
-            write_content += "{:>20.2f},".format(float(li))
-        write_standard(write_content, file_output)
-
-    print(file_output + " done ~")
-
-
-def format_xvg(file_input):
-    file_output = file_input.split('.')[0] + '_formatted.xvg'
-    with open(file_input, 'r', encoding='utf-8') as fo:
-        content = fo.read()
-    lines = content.strip().strip('\n').split('\n')
-    data = []
-    title_line = []
-    xaxis = ''
-    yaxis = ''
-    for line in lines:
-        if line[0] == '#':
-            pass
-        elif line[0] == '@':
-            if '@' in line and 'xaxis' in line:
-                xaxis = line.strip('"').split('"')[-1].replace(' ', '')
-                title_line.append(xaxis)
-            elif '@' in line and 'yaxis' in line:
-                yaxis = line.strip('"').split('"')[-1].replace(' ', '')
-            elif '@ s' in line and 'legend' in line:
-                title_line.append(
-                    line.strip('"').split('"')[-1].replace(' ', ''))
-        else:
-            try:
-                float(line.split()[0])
-            except:
-                # 针对行首非数字的情况，以two spaces作为间隔split并构建title_line
-                title_line = [item.replace(' ', '')
-                              for item in line.split('  ') if item != '']
-            else:
-                data.append(line.split())
-    if len(title_line) == 1:
-        title_line.append(yaxis)
-    # print(title_line)
-    with open(file_output, 'w', encoding='utf-8') as fo:
-        fo.write(
-            '# this file is generated by xvg_format.py from {} at {}\n'.format(
-                file_input, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())))
-        fo.write('# xaxis : {0}   yaxis : {1}\n'.format(xaxis, yaxis))
-        title_write = ""
-        for title in title_line:
-            title_write += "{:>16}".format(title)
-        fo.write(title_write + '\n')
-        for cols in data:
-            cols_write = ""
-            for col in cols:
-                cols_write += "{:>16.2f}".format(float(col))
-            fo.write(cols_write + '\n')
-    print(" {} Write done~ ".format(file_input))
+FORMATS = ['xvg', 'csv', 'tsv', 'npy', 'npz']
+# bytes kept for the npy header, written when the number of rows is known
+NPY_HEADER = 128
+
+
+class NpyWriter:
+    """2D float64 array written into a npy file row chunk by row chunk
+
+    The header is written last over the space kept at the beginning of the
+    file, once the number of rows is known.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.fo = open(path, 'wb')
+        self.fo.write(b' ' * NPY_HEADER)
+
+    def add(self, data):
+        self.fo.write(np.ascontiguousarray(data, dtype='<f8').tobytes())
+        self.rows += data.shape[0]
 
+    def close(self):
+        header = "{{'descr': '<f8', 'fortran_order': False, 'shape': ({}, {}), }}".format(self.rows, self.columns)
+        # magic string, version 1.0 and the 2 bytes of header length come first
+        header = header.ljust(NPY_HEADER - 10 - 1) + '\n'
+        self.fo.seek(0)
+        self.fo.write(np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header.encode('latin1'))
+        self.fo.close()
 
-def format_csv(file_input):
-    format_xvg(file_input)
-    file_output = file_input.split('.')[0] + '_formatted.xvg'
-    with open(file_output, 'r', encoding='utf-8') as fo:
-        content = fo.read()
-    lines = content.strip('\n').split('\n')
-    content_output = ""
-    for line in lines:
-        if line[0] == '#':
-            content_output += line + '\n'
+    def to_npz(self, npzfile, names, chunk=1 << 16):
+        """one array per column in npzfile, the rows are read back chunk by chunk"""
+        size = 8 * self.columns
+        with zipfile.ZipFile(npzfile, 'w', allowZip64=True) as zf, open(self.path, 'rb') as fi:
+            for c, name in enumerate(names):
+                with zf.open(name + '.npy', 'w', force_zip64=True) as fo:
+                    np.lib.format.write_array_header_1_0(
+                        fo, {'descr': '<f8', 'fortran_order': False, 'shape': (self.rows,)})
+                    fi.seek(NPY_HEADER)
+                    for start in range(0, self.rows, chunk):
+                        block = np.frombuffer(fi.read(min(chunk, self.rows - start) * size), dtype='<f8')
+                        fo.write(block[c::self.columns].tobytes())
+
+
+def convert(file_input, formats, begin=None, end=None, decimals=2):
+    base = os.path.splitext(file_input)[0] + '_formatted'
+    _, xlabel, ylabel, legends = read_header(file_input)
+    xaxis = xlabel.replace(' ', '') if xlabel != 'Null' else legends[0]
+    yaxis = ylabel.replace(' ', '') if ylabel != 'Null' else ''
+    title_line = [xaxis] + [legend.replace(' ', '') for legend in legends[1:]]
+    comments = [
+        '# this file is generated by xvgformat.py from {} at {}\n'.format(
+            file_input, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())),
+        '# xaxis : {0}   yaxis : {1}\n'.format(xaxis, yaxis)]
+
+    # text outputs : (output file, format of value, separator)
+    texts = []
+    if 'xvg' in formats:
+        texts.append((base + '.xvg', '%16.{}f'.format(decimals), ''))
+    if 'csv' in formats:
+        texts.append((base + '.csv', '%.{}f'.format(decimals), ','))
+    if 'tsv' in formats:
+        texts.append((base + '.tsv', '%.{}f'.format(decimals), '\t'))
+    outs = []
+    for file_output, fmt, sep in texts:
+        fo = open(file_output, 'w', encoding='utf-8')
+        fo.writelines(comments)
+        if sep == '':
+            fo.write(''.join(["{:>16}".format(title) for title in title_line]) + '\n')
         else:
-            content_output += ','.join(line.split()) + '\n'
-    with open(file_output.split('.')[0] + '.csv', 'w', encoding='utf-8') as fo:
-        fo.write(content_output)
+            fo.write(sep.join(title_line) + '\n')
+        outs.append((fo, fmt, sep))
+
+    # rows are appended to the npy file as they are read, npz is then written
+    # column by column from it, so no format keeps the whole file in memory
+    npy = None
+    if 'npy' in formats or 'npz' in formats:
+        npy = NpyWriter(base + '.npy' if 'npy' in formats else base + '.npy.tmp', len(title_line))
+    for data in iter_xvg(file_input, begin, end):
+        for fo, fmt, sep in outs:
+            np.savetxt(fo, data, fmt=fmt, delimiter=sep)
+        if npy is not None:
+            npy.add(data)
+    for fo, _, _ in outs:
+        fo.close()
+
+    if npy is not None:
+        npy.close()
+        if 'npz' in formats:
+            # one array per column, named by its number and legend, so that
+            # columns of the same legend (e.g. several no-legend) are all kept
+            npy.to_npz(base + '.npz', ['{}_{}'.format(c, title) for c, title in enumerate(title_line)])
+            if 'npy' not in formats:
+                os.remove(npy.path)
+    print(" {} Write done~ ".format(file_input))
 
 
 def main():
-    cmds = [i for i in sys.argv]
+    begin, end, cmds = pop_time_window(sys.argv[1:])
     file2format = []
-    format2 = 0
-    for cmd in cmds[1:]:
+    formats = ['xvg']
+    decimals = 2
+    workers = None
+    for cmd in cmds:
         if cmd == '-c':
-            format2 = 1
+            formats.append('csv')
+        elif cmd[:2] == '-o':
+            formats = cmd[2:].split(',')
+        elif cmd[:2] == '-d':
+            decimals = int(cmd[2:])
+        elif cmd[:2] == '-j':
+            workers = int(cmd[2:])
         else:
             file2format.append(cmd)
-    if format2 == 0:
+    for fmt in formats:
+        if fmt not in FORMATS:
+            print("ERROR -> unknown format {}, choose from {}".format(fmt, ','.join(FORMATS)))
+            exit()
+    for file in file2format:
+        if not os.path.exists(file):
+            print("ERROR -> no {} in current directory".format(file))
+            exit()
+
+    if workers is None:
+        workers = min(len(file2format), os.cpu_count() or 1)
+    if workers <= 1:
         for file in file2format:
-            format_xvg(file)
+            convert(file, formats, begin, end, decimals)
     else:
-        for file in file2format:
-            format_csv(file)
+        num = len(file2format)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(convert, file2format, [formats] * num, [begin] * num, [end] * num, [decimals] * num))
     print("--> ALL DONE ! ")
 
 